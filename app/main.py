@@ -1,23 +1,80 @@
-from fastapi import FastAPI, HTTPException, Request as FastAPIRequest
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request as FastAPIRequest, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import os
-from google.auth import default
-from google.auth.transport.requests import Request
 import logging
-import requests
-from typing import Dict, Optional
-from google.cloud import speech_v1 as speech
+import httpx
+import orjson
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.services.auth import credential_refresher
+from app.services.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    channel_deadline,
+    deadline_scope,
+    deadline_stats,
+    stage_timeout,
+    within_deadline
+)
+from app.services.dedup_cache import whatsapp_deduplicator
+from app.services.http_client import http_client_pool
+from app.services.logging_config import configure_logging, summarize
+from app.services.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    MetricsMiddleware,
+    registry as metrics_registry,
+    stage_metrics
+)
+from app.services.reasoning_engine import ReasoningEngineClient, agent_text
+from app.services.resilience import EngineUnavailable, engine_guard
+from app.services.response_cache import QUERY_CACHE_ENABLED, CacheControl, canonical_query_key, query_cache
+from app.services.session_pool import SessionPool, session_pool_config
+from app.services.session_store import session_store
+from app.services.single_flight import SingleFlight
 from app.services.speech_service import speech_service
+from app.services.startup import startup_timer
+from app.services.sse import format_sse, iter_text_deltas
+from app.services.text_chunker import WHATSAPP_MAX_BODY_LENGTH, SentenceChunker
+from app.services.warmup import WarmUp, warmup_config
+from app.services.whatsapp_sender import whatsapp_sender
+from app.services.work_queue import LaneWorkQueue
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging (cola con writer en background, ver LOG_* en el README)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre los recursos compartidos al arrancar y los libera al apagar"""
+    async with startup_timer.phase("http_client"):
+        await http_client_pool.start()
+    async with startup_timer.phase("whatsapp_queue"):
+        await whatsapp_queue.start()
+    # Token, conexiones y canal gRPC se calientan en background; /readyz
+    # responde 200 recién cuando terminan
+    warmup.start(on_ready=startup_timer.mark_warm)
+    startup_timer.mark_ready()
+    try:
+        yield
+    finally:
+        await warmup.stop()
+        await session_pool.stop()
+        await whatsapp_queue.stop(drain_timeout=WHATSAPP_QUEUE_DRAIN_TIMEOUT)
+        await session_store.close()
+        await http_client_pool.close()
+        await credential_refresher.stop()
+
+
 app = FastAPI(
     title="Agent BFF Service",
     version="1.0.1",
-    description="Backend for Frontend service para comunicación con Vertex AI Agent - CI/CD with WIF enabled"
+    description="Backend for Frontend service para comunicación con Vertex AI Agent - CI/CD with WIF enabled",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
@@ -29,34 +86,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Conteo de requests por endpoint/status para /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Configuración del agente
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", "spotgenai")
 LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
 REASONING_ENGINE_ID = os.getenv("REASONING_ENGINE_ID")
+# Endpoint de Vertex AI (se puede apuntar a un doble local, ver bench/)
+VERTEX_API_ENDPOINT = os.getenv("VERTEX_API_ENDPOINT", f"https://{LOCATION}-aiplatform.googleapis.com")
+
+# Chat por lotes (/chat/batch)
+CHAT_BATCH_MAX_PARALLELISM = int(os.getenv("CHAT_BATCH_MAX_PARALLELISM", "8"))
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "500"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 # Configuración de WhatsApp
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "mi_token_secreto_12345")
-WHATSAPP_API_URL = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
+GRAPH_API_BASE_URL = os.getenv("GRAPH_API_BASE_URL", "https://graph.facebook.com/v18.0")
+
+# Respuestas progresivas: enviar la respuesta del agente oración por oración
+WHATSAPP_PROGRESSIVE_REPLIES = os.getenv("WHATSAPP_PROGRESSIVE_REPLIES", "false").lower() == "true"
+WHATSAPP_PROGRESSIVE_MIN_CHARS = int(os.getenv("WHATSAPP_PROGRESSIVE_MIN_CHARS", "80"))
 
-# Almacenamiento en memoria de sesiones por usuario de WhatsApp
-whatsapp_sessions: Dict[str, str] = {}
+# Transcribir los audios mientras se descargan (streaming_recognize)
+WHATSAPP_STREAMING_STT = os.getenv("WHATSAPP_STREAMING_STT", "true").lower() == "true"
+AUDIO_STREAM_CHUNK_BYTES = int(os.getenv("AUDIO_STREAM_CHUNK_BYTES", "16384"))
 
-# Obtener credenciales (se refrescarán según sea necesario)
-credentials, _ = default()
+# Cola de procesamiento de mensajes entrantes
+WHATSAPP_WORKERS = int(os.getenv("WHATSAPP_WORKERS", "8"))
+WHATSAPP_QUEUE_MAX_SIZE = int(os.getenv("WHATSAPP_QUEUE_MAX_SIZE", "1000"))
+WHATSAPP_QUEUE_OVERFLOW = os.getenv("WHATSAPP_QUEUE_OVERFLOW", "reject")
+WHATSAPP_QUEUE_BLOCK_TIMEOUT = float(os.getenv("WHATSAPP_QUEUE_BLOCK_TIMEOUT", "2"))
+WHATSAPP_QUEUE_DRAIN_TIMEOUT = float(os.getenv("WHATSAPP_QUEUE_DRAIN_TIMEOUT", "8"))
+
+# Respuesta cuando el engine está saturado o con el circuito abierto
+ENGINE_BUSY_MESSAGE = os.getenv(
+    "ENGINE_BUSY_MESSAGE",
+    "Estoy recibiendo muchas consultas en este momento. Por favor intenta de nuevo en unos minutos."
+)
+
+# Respuesta cuando se agota el presupuesto de tiempo del mensaje
+DEADLINE_FALLBACK_MESSAGE = os.getenv(
+    "DEADLINE_FALLBACK_MESSAGE",
+    "Lo siento, tu mensaje está tardando más de lo esperado. Por favor intenta de nuevo en unos minutos."
+)
+
+# Una sola creación de sesión en curso por usuario
+session_creation_flight = SingleFlight("session-creation")
+
+# Métricas por etapa del pipeline
+MEDIA_LOOKUP_STAGE = stage_metrics("media_lookup")
+DOWNLOAD_STAGE = stage_metrics("download")
+SEND_STAGE = stage_metrics("send")
 
 # URLs de la API
-BASE_API_URL = f"https://{LOCATION}-aiplatform.googleapis.com/v1/projects/{PROJECT_ID}/locations/{LOCATION}/reasoningEngines/{REASONING_ENGINE_ID}"
+BASE_API_URL = f"{VERTEX_API_ENDPOINT}/v1/projects/{PROJECT_ID}/locations/{LOCATION}/reasoningEngines/{REASONING_ENGINE_ID}"
+
+# Todas las llamadas al Reasoning Engine (payloads precompilados, orjson)
+reasoning_engine = ReasoningEngineClient(BASE_API_URL)
 
-def get_auth_headers():
-    """Obtiene headers con token actualizado"""
-    if not credentials.valid:
-        credentials.refresh(Request())
-    return {
-        "Authorization": f"Bearer {credentials.token}",
-        "Content-Type": "application/json"
-    }
+
+async def create_agent_session(user_id: str) -> str:
+    """
+    Crea una sesión nueva en el Reasoning Engine.
+
+    Args:
+        user_id: Identificador del usuario dueño de la sesión
+
+    Returns:
+        ID de la sesión creada
+    """
+    return await reasoning_engine.create_session(user_id)
+
+
+# Sesiones pre-creadas para /chat sin session_id
+session_pool = SessionPool(create_agent_session, **session_pool_config())
+
+
+async def acquire_chat_session(user_id: str) -> str:
+    """
+    Toma una sesión pre-creada del pool o, si está vacío, crea una inline.
+    """
+    session_id = session_pool.take(user_id)
+    if session_id:
+        logger.info("Using pre-warmed session: %s", session_id)
+        return session_id
+
+    logger.info("Creating new session")
+    session_id = await create_agent_session(user_id)
+    logger.info("Created session: %s", session_id)
+    return session_id
 
 # Modelos de datos
 class ChatMessage(BaseModel):
@@ -67,6 +189,11 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str | None = None
 
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatMessage]
+    # Turnos simultáneos; nunca más que CHAT_BATCH_MAX_PARALLELISM
+    parallelism: int | None = None
+
 class QueryRequest(BaseModel):
     query: str
     context: dict | None = None
@@ -75,6 +202,16 @@ class Echo(BaseModel):
     message: str
 
 
+def engine_unavailable_error(e: EngineUnavailable) -> HTTPException:
+    """503 con Retry-After para cuando el engine no acepta más llamadas"""
+    logger.warning("⛔ %s", e)
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(e.retry_after + 0.5))}
+    )
+
+
 @app.get("/")
 def root():
     return {
@@ -93,168 +230,398 @@ def healthz():
     return {"status": "healthy"}
 
 
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness para el startup probe de Cloud Run: 503 mientras se calientan
+    los upstreams, 200 cuando la instancia puede recibir tráfico.
+    """
+    if not warmup.ready:
+        return JSONResponse(status_code=503, content=warmup.stats())
+    return warmup.stats()
+
+
+@app.get("/startup")
+async def startup_status():
+    """
+    Tiempos de arranque de esta instancia: import de la app, fases del
+    lifespan y pasos del calentamiento.
+    """
+    return {**startup_timer.stats(), "warmup": warmup.stats()}
+
+
 @app.get("/ping")
 def ping():
     return "pong"
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Métricas en formato de exposición de Prometheus.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/echo")
 def echo(body: Echo):
     return {"echo": body.message}
 
 
 @app.post("/chat", response_model=ChatResponse)
+@channel_deadline("chat")
 async def chat(message: ChatMessage):
     """
     Endpoint principal para chatear con el agente de Vertex AI.
     Usa async_stream_query para enviar mensajes en una sesión.
+    Todo el turno (sesión + agente) tiene el presupuesto DEADLINE_CHAT_SECONDS.
     """
     try:
-        logger.info(f"Received chat message: {message.message[:50]}...")
-        
-        # Obtener headers con token actualizado
-        headers = get_auth_headers()
-        
-        # Crear o obtener sesión
-        session_id = message.session_id
-        
-        if not session_id:
-            # Crear nueva sesión
-            create_session_url = f"{BASE_API_URL}:query"
-            
-            payload = {
-                "class_method": "async_create_session",
-                "input": {
-                    "user_id": "default_user"
-                }
-            }
-            
-            logger.info("Creating new session")
-            session_response = requests.post(
-                create_session_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            logger.info(f"Session response status: {session_response.status_code}")
-            logger.info(f"Session response: {session_response.text}")
-            
-            session_response.raise_for_status()
-            session_result = session_response.json()
-            # El session_id está en output.id
-            session_id = session_result.get("output", {}).get("id")
-            logger.info(f"Created session: {session_id}")
-        
-        # Enviar mensaje usando async_stream_query
-        stream_query_url = f"{BASE_API_URL}:streamQuery?alt=sse"
-        
-        payload = {
-            "class_method": "async_stream_query",
-            "input": {
-                "user_id": "default_user",
-                "session_id": session_id,
-                "message": message.message
-            }
-        }
-        
-        logger.info(f"Sending message with session: {session_id}")
-        response = requests.post(
-            stream_query_url,
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        
-        logger.info(f"Stream query response status: {response.status_code}")
-        response.raise_for_status()
-        result = response.json()
-        
-        logger.info(f"Received response from agent: {result}")
-        
-        # Extraer la respuesta del texto del modelo
-        agent_response = result.get("content", {}).get("parts", [{}])[0].get("text", str(result))
-        
-        return ChatResponse(
-            response=agent_response,
-            session_id=session_id
-        )
-        
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error calling agent: {e.response.text}", exc_info=True)
-        raise HTTPException(
+        logger.info("Received chat message: %.50s...", message.message)
+        # Serializada directo con orjson, sin pasar por la validación de ChatResponse
+        return ORJSONResponse(await run_chat_turn(message))
+    except Exception as e:
+        raise chat_turn_error(e)
+
+
+async def run_chat_turn(message: ChatMessage, user_id: str = "default_user") -> Dict[str, Any]:
+    """
+    Un turno de chat: toma o crea la sesión y envía el mensaje con
+    async_stream_query. Corre con el deadline del contexto.
+
+    Returns:
+        ``{"response": ..., "session_id": ...}``
+
+    Raises:
+        httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+        EngineUnavailable: Si el engine está saturado o con el circuito abierto
+        DeadlineExceeded: Si se agota el presupuesto del turno
+    """
+    # Crear o obtener sesión
+    session_id = message.session_id
+    
+    if not session_id:
+        # Tomar una sesión pre-creada o crear una nueva
+        session_id = await acquire_chat_session(user_id)
+    
+    # Enviar mensaje usando async_stream_query
+    logger.info("Sending message with session: %s", session_id)
+    result = await reasoning_engine.stream_query(user_id, session_id, message.message)
+    
+    # Extraer la respuesta del texto del modelo
+    agent_response = agent_text(result)
+    if agent_response is None:
+        agent_response = str(result)
+    
+    return {"response": agent_response, "session_id": session_id}
+
+
+def chat_turn_error(e: Exception) -> HTTPException:
+    """Traduce el error de un turno de chat al HTTPException con que responde /chat"""
+    if isinstance(e, EngineUnavailable):
+        return engine_unavailable_error(e)
+    if isinstance(e, DeadlineExceeded):
+        logger.warning("⏱️  %s", e)
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, httpx.HTTPStatusError):
+        logger.error("HTTP error calling agent: %s", e.response.text, exc_info=e)
+        return HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from Reasoning Engine: {e.response.text}"
         )
-    except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+    logger.error("Error in chat endpoint: %s", e, exc_info=e)
+    return HTTPException(
+        status_code=500,
+        detail=f"Error communicating with agent: {str(e)}"
+    )
+
+
+async def run_chat_batch_item(index: int, message: ChatMessage) -> Dict[str, Any]:
+    """
+    Un ítem de /chat/batch. Tiene su propio presupuesto DEADLINE_CHAT_SECONDS,
+    que corre desde que el ítem obtiene turno, y nunca lanza: los errores
+    vuelven como resultado del ítem.
+    """
+    with deadline_scope(Deadline.for_channel("chat")):
+        try:
+            return {"index": index, "success": True, **await run_chat_turn(message)}
+        except Exception as e:
+            error = chat_turn_error(e)
+            item = {
+                "index": index,
+                "success": False,
+                "status_code": error.status_code,
+                "error": error.detail,
+                "session_id": message.session_id
+            }
+            if isinstance(e, EngineUnavailable):
+                item["retry_after"] = e.retry_after
+            return item
+
+
+async def iter_chat_batch(messages: List[ChatMessage], parallelism: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Corre los ítems con ``parallelism`` workers y entrega cada resultado
+    apenas termina (en orden de finalización, con su ``index``). Si el
+    consumidor deja de iterar (cliente desconectado) se cancela lo pendiente.
+
+    Los ítems de una misma sesión forman un carril que un solo worker corre
+    en orden de entrada, como los carriles por número de WhatsApp: dos turnos
+    de una sesión nunca llegan juntos ni invertidos al engine. Cada ítem sin
+    ``session_id`` es un carril propio.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    lanes: Dict[Any, List[Tuple[int, ChatMessage]]] = {}
+    for index, message in enumerate(messages):
+        lanes.setdefault(message.session_id or index, []).append((index, message))
+    pending = iter(lanes.values())
+
+    async def worker():
+        # Los workers comparten el iterador: cada uno toma el siguiente carril libre
+        for lane in pending:
+            for index, message in lane:
+                results.put_nowait(await run_chat_batch_item(index, message))
+
+    workers = [
+        asyncio.create_task(worker(), name=f"chat-batch-{i}")
+        for i in range(min(parallelism, len(lanes)))
+    ]
+    try:
+        for _ in range(len(messages)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+@app.post("/chat/batch")
+async def chat_batch(batch: ChatBatchRequest, http_request: FastAPIRequest):
+    """
+    Varios turnos de chat en un solo request, en sesiones iguales o
+    distintas. Las sesiones distintas corren en paralelo (hasta
+    CHAT_BATCH_MAX_PARALLELISM); los ítems de una misma sesión, uno tras otro
+    en orden de entrada. Los que no traen session_id toman o crean una
+    sesión, como en /chat.
+
+    Responde ``{"results": [...], "succeeded": n, "failed": m}`` con un
+    resultado por ítem en el orden de entrada; un ítem fallido trae
+    ``status_code`` y ``error`` en lugar de ``response``. Con
+    ``Accept: application/x-ndjson`` cada resultado se envía como una línea
+    apenas termina, con su ``index``, sin esperar a los más lentos.
+    """
+    messages = batch.messages
+    if len(messages) > CHAT_BATCH_MAX_ITEMS:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error communicating with agent: {str(e)}"
+            status_code=413,
+            detail=f"El lote tiene {len(messages)} mensajes; el máximo es {CHAT_BATCH_MAX_ITEMS}"
         )
+    parallelism = max(min(batch.parallelism or CHAT_BATCH_MAX_PARALLELISM, CHAT_BATCH_MAX_PARALLELISM), 1)
+    logger.info("Received chat batch: %s messages, parallelism %s", len(messages), parallelism)
+
+    if NDJSON_MEDIA_TYPE in http_request.headers.get("accept", ""):
+        async def ndjson_stream():
+            async for item in iter_chat_batch(messages, parallelism):
+                yield orjson.dumps(item) + b"\n"
+
+        return StreamingResponse(ndjson_stream(), media_type=NDJSON_MEDIA_TYPE)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+    async for item in iter_chat_batch(messages, parallelism):
+        results[item["index"]] = item
+    succeeded = sum(1 for item in results if item["success"])
+    return ORJSONResponse({"results": results, "succeeded": succeeded, "failed": len(results) - succeeded})
+
+
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Chat con el agente en modo streaming (text/event-stream).
+
+    Reenvía cada fragmento de texto apenas lo emite el Reasoning Engine.
+    El primer evento (``session``) trae el session_id; luego llegan eventos
+    ``data`` con ``{"text": ...}`` y al final un evento ``done``.
+    """
+    logger.info("Received streaming chat message: %.50s...", message.message)
+
+    session_id = message.session_id
+    if not session_id:
+        # La sesión se crea antes de abrir el stream para poder devolver un
+        # código HTTP de error si falla
+        try:
+            session_id = await acquire_chat_session("default_user")
+        except EngineUnavailable as e:
+            raise engine_unavailable_error(e)
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error creating session: %s", e.response.text, exc_info=True)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Error from Reasoning Engine: {e.response.text}"
+            )
+        except Exception as e:
+            logger.error("Error creating session: %s", e, exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error communicating with agent: {str(e)}"
+            )
+
+    async def event_stream():
+        yield format_sse({"session_id": session_id}, event="session")
+        try:
+            events = reasoning_engine.stream_events("default_user", session_id, message.message)
+            async for text in iter_text_deltas(events):
+                yield format_sse({"text": text})
+            yield format_sse({"session_id": session_id}, event="done")
+        except EngineUnavailable as e:
+            logger.warning("⛔ %s", e)
+            yield format_sse(
+                {"status_code": 503, "detail": str(e), "retry_after": e.retry_after},
+                event="error"
+            )
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error streaming from agent: %s", e.response.text)
+            yield format_sse(
+                {"status_code": e.response.status_code, "detail": e.response.text},
+                event="error"
+            )
+        except Exception as e:
+            logger.error("Error in chat stream: %s", e, exc_info=True)
+            yield format_sse({"status_code": 500, "detail": str(e)}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Evitar buffering en proxies intermedios
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@app.get("/chat/session-pool")
+async def chat_session_pool_status():
+    """
+    Estado del pool de sesiones pre-creadas (hits, misses, antigüedad).
+    """
+    return session_pool.stats()
+
+
+async def run_agent_query(request: QueryRequest) -> bytes:
+    """
+    Ejecuta una consulta genérica contra el agente usando streamQuery.
+
+    Returns:
+        Cuerpo JSON de la respuesta, ya serializado: los llamadores
+        coalescidos y la caché comparten los mismos bytes
+
+    Raises:
+        httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+        EngineUnavailable: Si el engine está saturado o con el circuito abierto
+    """
+    # Preparar el input
+    input_data = {"prompt": request.query}
+    
+    if request.context:
+        input_data.update(request.context)
+    
+    # Ejecutar la consulta usando streamQuery
+    logger.info("Querying reasoning engine with streamQuery")
+    result = await reasoning_engine.query(input_data)
+    
+    # Extraer la respuesta del formato de streaming
+    if "output" in result:
+        response_text = result["output"]
+    else:
+        response_text = result
+    
+    return orjson.dumps({
+        "success": True,
+        "response": response_text
+    })
+
+
+def json_bytes_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Respuesta con un cuerpo JSON ya serializado (sin volver a codificarlo)"""
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Consultas idénticas en curso comparten una sola llamada al engine
+query_flight = SingleFlight("query")
+
+
+async def coalesced_agent_query(request: QueryRequest, query_key: str) -> bytes:
+    """
+    Ejecuta run_agent_query una sola vez por clave canónica en curso: los
+    llamadores concurrentes con la misma consulta reciben el mismo resultado
+    o el mismo error. Cancelar a un llamador no cancela la llamada compartida.
+    """
+    return await query_flight.do(query_key, lambda: run_agent_query(request))
 
 
 @app.post("/query")
-async def query_agent(request: QueryRequest):
+async def query_agent(request: QueryRequest, http_request: FastAPIRequest):
     """
     Endpoint genérico para consultas al agente usando streamQuery.
+
+    Las consultas idénticas simultáneas se coalescen en una sola llamada al
+    agente. Con QUERY_CACHE_ENABLED las respuestas además se cachean por consulta normalizada
+    y contexto. El header ``Cache-Control`` del request permite ``no-cache``
+    (consultar al agente y refrescar la caché), ``no-store`` (no usar la
+    caché) y ``max-age=N``. La respuesta indica ``X-Cache: HIT|MISS|BYPASS``.
     """
     try:
-        logger.info(f"Received query: {request.query[:50]}...")
-        
-        # Obtener headers con token actualizado
-        headers = get_auth_headers()
-        
-        # Preparar el input
-        input_data = {"prompt": request.query}
-        
-        if request.context:
-            input_data.update(request.context)
-        
-        # Preparar el payload para streamQuery usando class_method
-        payload = {
-            "class_method": "async_stream_query",
-            "input": input_data
-        }
+        logger.info("Received query: %.50s...", request.query)
         
-        # Ejecutar la consulta usando streamQuery
-        logger.info(f"Querying reasoning engine with streamQuery")
-        query_url = f"{BASE_API_URL}:streamQuery"
-        response = requests.post(
-            query_url,
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        cache_control = CacheControl.parse(http_request.headers.get("cache-control"))
+        cache_key = canonical_query_key(request.query, request.context)
+        if not QUERY_CACHE_ENABLED or cache_control.no_store:
+            if QUERY_CACHE_ENABLED:
+                query_cache.bypasses += 1
+            return json_bytes_response(await coalesced_agent_query(request, cache_key), {"X-Cache": "BYPASS"})
         
-        # Extraer la respuesta del formato de streaming
-        if "output" in result:
-            response_text = result["output"]
-        else:
-            response_text = result
+        if not cache_control.no_cache:
+            cached = query_cache.get(cache_key, max_age=cache_control.max_age)
+            if cached is not None:
+                return json_bytes_response(cached, {"X-Cache": "HIT"})
         
-        return {
-            "success": True,
-            "response": response_text
-        }
+        body = await coalesced_agent_query(request, cache_key)
+        query_cache.put(cache_key, body)
+        return json_bytes_response(body, {"X-Cache": "MISS"})
         
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error calling agent: {e.response.text}", exc_info=True)
+    except EngineUnavailable as e:
+        raise engine_unavailable_error(e)
+    except httpx.HTTPStatusError as e:
+        logger.error("HTTP error calling agent: %s", e.response.text, exc_info=True)
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from Reasoning Engine: {e.response.text}"
         )
     except Exception as e:
-        logger.error(f"Error in query endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in query endpoint: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error querying agent: {str(e)}"
         )
 
 
+@app.get("/query/cache")
+async def query_cache_status():
+    """
+    Contadores de la caché de respuestas de /query.
+    """
+    return {"enabled": QUERY_CACHE_ENABLED, **query_cache.stats()}
+
+
+@app.get("/query/coalescing")
+async def query_coalescing_status():
+    """
+    Consultas coalescidas: llamadas al engine ejecutadas vs. requests que
+    esperaron una llamada idéntica en curso.
+    """
+    return query_flight.stats()
+
+
 @app.get("/agent/info")
 async def agent_info():
     """
@@ -266,6 +633,7 @@ async def agent_info():
         "location": LOCATION,
         "reasoning_engine_id": REASONING_ENGINE_ID,
         "api_base_url": BASE_API_URL,
+        "auth": credential_refresher.stats(),
         "available_methods": [
             "async_create_session",
             "async_search_memory",
@@ -275,8 +643,66 @@ async def agent_info():
     }
 
 
+@app.get("/agent/resilience")
+async def agent_resilience_status():
+    """
+    Límite de concurrencia adaptativo, estado del circuit breaker del engine
+    y presupuestos de tiempo agotados por etapa.
+    """
+    return {**engine_guard.stats(), "deadlines": deadline_stats()}
+
+
 # ==================== WhatsApp Integration ====================
 
+async def get_whatsapp_media_url(media_id: str) -> Optional[str]:
+    """
+    Obtiene la URL de descarga de un archivo multimedia de WhatsApp.
+    
+    Raises:
+        httpx.HTTPError: Si falla la consulta a la Graph API
+        DeadlineExceeded: Si se agota el presupuesto del mensaje
+    """
+    logger.info("🔍 Obteniendo URL del audio: %s", media_id)
+    started = MEDIA_LOOKUP_STAGE.start()
+    try:
+        response = await within_deadline("media_lookup", http_client_pool.client.get(
+            f"{GRAPH_API_BASE_URL}/{media_id}",
+            headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"},
+            timeout=10
+        ))
+    finally:
+        MEDIA_LOOKUP_STAGE.finish(started)
+    response.raise_for_status()
+    
+    audio_url = response.json().get("url")
+    if not audio_url:
+        logger.error("❌ No se obtuvo URL del audio")
+    return audio_url
+
+
+async def stream_whatsapp_audio(audio_url: str) -> AsyncIterator[bytes]:
+    """
+    Descarga un audio de WhatsApp por fragmentos, sin cargarlo entero en memoria.
+    
+    Raises:
+        httpx.HTTPError: Si falla la descarga
+    """
+    logger.info("⬇️  Descargando audio en streaming desde: %s", audio_url)
+    started = DOWNLOAD_STAGE.start()
+    try:
+        async with http_client_pool.client.stream(
+            "GET",
+            audio_url,
+            headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"},
+            timeout=stage_timeout("download", 30)
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(AUDIO_STREAM_CHUNK_BYTES):
+                yield chunk
+    finally:
+        DOWNLOAD_STAGE.finish(started)
+
+
 async def download_whatsapp_audio(audio_id: str) -> Optional[bytes]:
     """
     Descarga audio desde WhatsApp Business API.
@@ -286,108 +712,173 @@ async def download_whatsapp_audio(audio_id: str) -> Optional[bytes]:
         
     Returns:
         Bytes del audio o None si falla
+
+    Raises:
+        DeadlineExceeded: Si se agota el presupuesto del mensaje
     """
     try:
         # 1. Obtener URL del audio
-        headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-        
-        media_url = f"https://graph.facebook.com/v18.0/{audio_id}"
-        logger.info(f"🔍 Obteniendo URL del audio: {audio_id}")
-        
-        response = requests.get(media_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        audio_url = response.json().get("url")
+        audio_url = await get_whatsapp_media_url(audio_id)
         
         if not audio_url:
-            logger.error("❌ No se obtuvo URL del audio")
             return None
         
         # 2. Descargar el audio
-        logger.info(f"⬇️  Descargando audio desde: {audio_url}")
-        audio_response = requests.get(audio_url, headers=headers, timeout=30)
+        logger.info("⬇️  Descargando audio desde: %s", audio_url)
+        started = DOWNLOAD_STAGE.start()
+        try:
+            audio_response = await within_deadline("download", http_client_pool.client.get(
+                audio_url,
+                headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"},
+                timeout=30
+            ))
+        finally:
+            DOWNLOAD_STAGE.finish(started)
         audio_response.raise_for_status()
         
         audio_bytes = audio_response.content
-        logger.info(f"✅ Audio descargado: {len(audio_bytes)} bytes")
+        logger.info("✅ Audio descargado: %s bytes", len(audio_bytes))
         
         return audio_bytes
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Error de red descargando audio: {e}")
+    except DeadlineExceeded:
+        raise
+    except httpx.HTTPError as e:
+        logger.error("❌ Error de red descargando audio: %s", e)
         return None
     except Exception as e:
-        logger.error(f"❌ Error inesperado descargando audio: {e}", exc_info=True)
+        logger.error("❌ Error inesperado descargando audio: %s", e, exc_info=True)
         return None
 
 
-def send_whatsapp_message(phone_number: str, message: str):
+async def transcribe_whatsapp_audio(audio_id: str, source_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
-    Envía un mensaje a través de WhatsApp Business API.
+    Descarga y transcribe un mensaje de voz de WhatsApp.
+    
+    Con WHATSAPP_STREAMING_STT la descarga se envía a Speech-to-Text por
+    fragmentos mientras llega; si el streaming falla se reintenta con la
+    descarga completa y transcribe_audio.
+    
+    La caché de transcripciones se consulta por ``source_id`` antes de pedir
+    la URL del media: un audio reenviado no se descarga ni se reconoce.
+    
+    Args:
+        audio_id: ID del media en WhatsApp
+        source_id: Identificador del contenido (el ``sha256`` del webhook);
+            por defecto ``audio_id``
+    
+    Returns:
+        Dict de transcripción (ver SpeechService.transcribe_audio) o None si
+        no se pudo descargar el audio
+
+    Raises:
+        DeadlineExceeded: Si se agota el presupuesto del mensaje
     """
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json"
-    }
+    source_id = source_id or audio_id
+    cached = await speech_service.cached_transcription(
+        source_id,
+        language_code="es-US",
+        encoding="OGG_OPUS",
+        sample_rate_hertz=16000
+    )
+    if cached is not None:
+        return cached
     
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": phone_number,
-        "type": "text",
-        "text": {
-            "body": message
-        }
-    }
+    if WHATSAPP_STREAMING_STT:
+        try:
+            audio_url = await get_whatsapp_media_url(audio_id)
+            if audio_url:
+                return await within_deadline("transcription", speech_service.atranscribe_stream(
+                    stream_whatsapp_audio(audio_url),
+                    language_code="es-US",  # Español de Estados Unidos
+                    encoding="OGG_OPUS",
+                    sample_rate_hertz=16000,
+                    source_id=source_id
+                ))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("⚠️  Transcripción en streaming falló, usando descarga completa: %s", e)
+    
+    # Descarga completa + transcripción de una sola vez
+    audio_bytes = await download_whatsapp_audio(audio_id)
+    if not audio_bytes:
+        return None
     
+    return await within_deadline("transcription", speech_service.atranscribe_audio(
+        audio_content=audio_bytes,
+        language_code="es-US",  # Español de Estados Unidos
+        encoding="OGG_OPUS",
+        sample_rate_hertz=16000,
+        source_id=source_id
+    ))
+
+
+async def send_whatsapp_message(phone_number: str, message: str):
+    """
+    Envía un mensaje a través de WhatsApp Business API.
+    El envío pasa por whatsapp_sender: rate limiting por número emisor,
+    reintentos ante 429/5xx y orden garantizado por destinatario. Con un
+    deadline en el contexto el envío (reintentos incluidos) se corta al agotarse.
+    """
+    started = SEND_STAGE.start()
     try:
-        response = requests.post(WHATSAPP_API_URL, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-        logger.info(f"WhatsApp message sent to {phone_number}")
-        return response.json()
+        result = await within_deadline("send", whatsapp_sender.send_text(phone_number, message))
+        logger.info("WhatsApp message sent to %s", phone_number)
+        return result
     except Exception as e:
-        logger.error(f"Error sending WhatsApp message: {str(e)}")
+        logger.error("Error sending WhatsApp message: %s", e)
         raise
+    finally:
+        SEND_STAGE.finish(started)
 
 
-def get_or_create_whatsapp_session(user_phone: str) -> str:
+async def get_or_create_whatsapp_session(user_phone: str) -> str:
     """
     Obtiene o crea una sesión del agente para un usuario de WhatsApp.
+
+    Si llegan varios mensajes del mismo usuario a la vez, todos esperan una
+    única creación de sesión en lugar de crear una cada uno.
     """
-    if user_phone in whatsapp_sessions:
-        return whatsapp_sessions[user_phone]
+    session_id = await session_store.get(user_phone)
+    if session_id:
+        return session_id
     
+    # Cada llamador espera solo su propio presupuesto; la creación compartida sigue
+    return await within_deadline("session", session_creation_flight.do(
+        user_phone,
+        lambda: _create_whatsapp_session(user_phone)
+    ))
+
+
+async def _create_whatsapp_session(user_phone: str) -> str:
+    """Crea y guarda la sesión de un usuario (ejecutada una vez por clave)"""
+    # Otro llamador pudo haberla creado mientras esperábamos el store
+    session_id = await session_store.get(user_phone)
+    if session_id:
+        return session_id
+
     # Crear nueva sesión
-    headers = get_auth_headers()
-    create_session_url = f"{BASE_API_URL}:query"
-    
-    payload = {
-        "class_method": "async_create_session",
-        "input": {
-            "user_id": f"whatsapp_{user_phone}"
-        }
-    }
-    
     try:
-        session_response = requests.post(
-            create_session_url,
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
-        session_response.raise_for_status()
-        session_result = session_response.json()
-        session_id = session_result.get("output", {}).get("id")
+        session_id = await create_agent_session(f"whatsapp_{user_phone}")
         
         # Guardar sesión
-        whatsapp_sessions[user_phone] = session_id
-        logger.info(f"Created WhatsApp session for {user_phone}: {session_id}")
+        await session_store.set(user_phone, session_id)
+        logger.info("Created WhatsApp session for %s: %s", user_phone, session_id)
         
         return session_id
     except Exception as e:
-        logger.error(f"Error creating WhatsApp session: {str(e)}")
+        logger.error("Error creating WhatsApp session: %s", e)
         raise
 
 
+def annotate_transcription(message_text: str, is_transcription: bool, confidence: float) -> str:
+    """Si es transcripción con baja confianza, agrega contexto para el agente"""
+    if is_transcription and confidence < 0.8:
+        return f"[Audio transcrito - confianza {confidence:.0%}] {message_text}"
+    return message_text
+
+
 async def process_whatsapp_message(phone_number: str, message_text: str, is_transcription: bool = False, confidence: float = 1.0):
     """
     Procesa un mensaje de WhatsApp y obtiene respuesta del agente.
@@ -400,48 +891,117 @@ async def process_whatsapp_message(phone_number: str, message_text: str, is_tran
     """
     try:
         # Obtener o crear sesión
-        session_id = get_or_create_whatsapp_session(phone_number)
-        
-        # Obtener headers con token actualizado
-        headers = get_auth_headers()
+        session_id = await get_or_create_whatsapp_session(phone_number)
         
-        # Si es transcripción con baja confianza, agregar contexto
-        if is_transcription and confidence < 0.8:
-            message_text = f"[Audio transcrito - confianza {confidence:.0%}] {message_text}"
+        message_text = annotate_transcription(message_text, is_transcription, confidence)
         
         # Enviar mensaje al agente
-        stream_query_url = f"{BASE_API_URL}:streamQuery?alt=sse"
-        
-        payload = {
-            "class_method": "async_stream_query",
-            "input": {
-                "user_id": f"whatsapp_{phone_number}",
-                "session_id": session_id,
-                "message": message_text
-            }
-        }
-        
-        logger.info(f"Sending WhatsApp message to agent: {message_text[:50]}...")
-        response = requests.post(
-            stream_query_url,
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        logger.info("Sending WhatsApp message to agent: %.50s...", message_text)
+        result = await reasoning_engine.stream_query(f"whatsapp_{phone_number}", session_id, message_text)
         
         # Extraer respuesta del agente
-        agent_response = result.get("content", {}).get("parts", [{}])[0].get("text", "Lo siento, no pude procesar tu mensaje.")
-        
-        return agent_response
+        return agent_text(result, "Lo siento, no pude procesar tu mensaje.")
         
+    except DeadlineExceeded:
+        raise
+    except EngineUnavailable as e:
+        logger.warning("⛔ %s", e)
+        return ENGINE_BUSY_MESSAGE
     except Exception as e:
-        logger.error(f"Error processing WhatsApp message: {str(e)}", exc_info=True)
+        logger.error("Error processing WhatsApp message: %s", e, exc_info=True)
         return "Lo siento, ocurrió un error procesando tu mensaje. Por favor intenta de nuevo."
 
 
+async def reply_whatsapp_progressively(
+    phone_number: str,
+    message_text: str,
+    is_transcription: bool = False,
+    confidence: float = 1.0
+):
+    """
+    Envía la respuesta del agente por WhatsApp a medida que se genera.
+
+    Consume el stream SSE del agente, corta el texto en límites de oración o
+    párrafo y envía cada fragmento como un mensaje propio apenas se completa.
+
+    Args:
+        phone_number: Número de teléfono del usuario
+        message_text: Texto del mensaje (puede ser texto directo o transcripción de audio)
+        is_transcription: Si es True, el mensaje proviene de una transcripción de audio
+        confidence: Nivel de confianza de la transcripción (0.0 a 1.0)
+    """
+    chunker = SentenceChunker(
+        max_length=WHATSAPP_MAX_BODY_LENGTH,
+        min_length=WHATSAPP_PROGRESSIVE_MIN_CHARS
+    )
+    sent = 0
+
+    try:
+        session_id = await get_or_create_whatsapp_session(phone_number)
+        message_text = annotate_transcription(message_text, is_transcription, confidence)
+
+        logger.info("Streaming WhatsApp message to agent: %.50s...", message_text)
+        events = reasoning_engine.stream_events(f"whatsapp_{phone_number}", session_id, message_text)
+        async for text in iter_text_deltas(events):
+            for chunk in chunker.feed(text):
+                await send_whatsapp_message(phone_number, chunk)
+                sent += 1
+
+        for chunk in chunker.flush():
+            await send_whatsapp_message(phone_number, chunk)
+            sent += 1
+
+        if not sent:
+            await send_whatsapp_message(
+                phone_number,
+                "Lo siento, no pude procesar tu mensaje."
+            )
+
+        logger.info("📤 Respuesta progresiva enviada a %s en %s mensajes", phone_number, sent)
+
+    except DeadlineExceeded:
+        raise
+    except EngineUnavailable as e:
+        logger.warning("⛔ %s", e)
+        await send_whatsapp_message(phone_number, ENGINE_BUSY_MESSAGE)
+    except Exception as e:
+        logger.error("Error in progressive WhatsApp reply: %s", e, exc_info=True)
+        await send_whatsapp_message(
+            phone_number,
+            "Lo siento, ocurrió un error procesando tu mensaje. Por favor intenta de nuevo."
+        )
+
+
+async def reply_to_whatsapp(
+    phone_number: str,
+    message_text: str,
+    is_transcription: bool = False,
+    confidence: float = 1.0
+):
+    """
+    Obtiene la respuesta del agente y la entrega por WhatsApp.
+
+    No hace falta serializar por número: se ejecuta en el carril de
+    whatsapp_queue de ``phone_number``, que procesa un mensaje a la vez.
+    """
+    if WHATSAPP_PROGRESSIVE_REPLIES:
+        await reply_whatsapp_progressively(
+            phone_number,
+            message_text,
+            is_transcription=is_transcription,
+            confidence=confidence
+        )
+        return
+
+    agent_response = await process_whatsapp_message(
+        phone_number,
+        message_text,
+        is_transcription=is_transcription,
+        confidence=confidence
+    )
+    await send_whatsapp_message(phone_number, agent_response)
+
+
 @app.get("/webhook")
 async def verify_webhook(request: FastAPIRequest):
     """
@@ -451,7 +1011,7 @@ async def verify_webhook(request: FastAPIRequest):
     token = request.query_params.get("hub.verify_token")
     challenge = request.query_params.get("hub.challenge")
     
-    logger.info(f"Webhook verification request: mode={mode}, token={token}")
+    logger.info("Webhook verification request: mode=%s, token=%s", mode, token)
     
     if mode == "subscribe" and token == WHATSAPP_VERIFY_TOKEN:
         logger.info("✅ Webhook verified successfully")
@@ -465,151 +1025,313 @@ async def verify_webhook(request: FastAPIRequest):
         raise HTTPException(status_code=403, detail="Verification failed")
 
 
+async def handle_whatsapp_message(message: Dict[str, Any]):
+    """
+    Procesa un mensaje de WhatsApp: descarga y transcribe el audio si es
+    necesario, consulta al agente y envía la respuesta.
+    Se ejecuta en los workers de whatsapp_queue, fuera del request del webhook.
+    Si se agota el presupuesto del mensaje se responde con DEADLINE_FALLBACK_MESSAGE.
+    """
+    try:
+        # Obtener datos del mensaje
+        phone_number = message.get("from")
+        message_type = message.get("type")
+        
+        logger.info("📱 Mensaje de %s, tipo: %s", phone_number, message_type)
+        
+        # Procesar mensajes de TEXTO
+        if message_type == "text":
+            message_text = message.get("text", {}).get("body", "")
+            
+            logger.info("💬 Procesando mensaje de texto: %.50s...", message_text)
+            
+            # Procesar con el agente y enviar respuesta por WhatsApp
+            await reply_to_whatsapp(phone_number, message_text)
+        
+        # Procesar mensajes de AUDIO (voz)
+        elif message_type == "audio":
+            audio = message.get("audio", {})
+            audio_id = audio.get("id")
+            
+            if not audio_id:
+                logger.error("❌ No se encontró ID de audio en el mensaje")
+                await send_whatsapp_message(
+                    phone_number,
+                    "❌ No pude procesar el audio. Por favor, intenta de nuevo."
+                )
+                return
+            
+            logger.info("🎤 Procesando mensaje de audio: %s", audio_id)
+            
+            # Sin engine disponible no tiene sentido pagar la transcripción
+            if engine_guard.circuit_open:
+                logger.warning("⛔ Circuito del engine abierto, se omite la transcripción")
+                await send_whatsapp_message(phone_number, ENGINE_BUSY_MESSAGE)
+                return
+            
+            # 1-2. Descargar audio desde WhatsApp y transcribir con Speech-to-Text
+            logger.info("🎯 Transcribiendo audio de %s...", phone_number)
+            transcription = await transcribe_whatsapp_audio(audio_id, audio.get("sha256"))
+            
+            if transcription is None:
+                await send_whatsapp_message(
+                    phone_number,
+                    "❌ No pude descargar el audio. Por favor, intenta enviar otro mensaje de voz."
+                )
+                return
+            
+            if not transcription["success"]:
+                error_msg = transcription.get("error", "Error desconocido")
+                logger.error("❌ Error en transcripción: %s", error_msg)
+                await send_whatsapp_message(
+                    phone_number,
+                    "❌ No pude entender el audio. ¿Podrías hablar más claro o escribir tu mensaje?"
+                )
+                return
+            
+            # 3. Extraer transcripción y confianza
+            transcript = transcription["transcript"]
+            confidence = transcription["confidence"]
+            
+            logger.info(
+                "✅ Audio transcrito exitosamente:\n"
+                "   Texto: '%.200s'\n"
+                "   Confianza: %.2f%%",
+                transcript, confidence * 100
+            )
+            
+            # 4. Notificar al usuario sobre la transcripción (opcional)
+            if confidence < 0.7:  # Confianza baja
+                await send_whatsapp_message(
+                    phone_number,
+                    f"🎤 Entendí: \"{transcript}\"\n\n"
+                    f"⚠️ No estoy muy seguro. ¿Es correcto?"
+                )
+            
+            # 5. Procesar transcripción con el agente y enviar respuesta
+            await reply_to_whatsapp(
+                phone_number,
+                transcript,
+                is_transcription=True,
+                confidence=confidence
+            )
+        
+        # Otros tipos de mensaje
+        else:
+            logger.info("ℹ️  Tipo de mensaje no soportado: %s", message_type)
+            await send_whatsapp_message(
+                phone_number,
+                f"ℹ️ Solo puedo procesar mensajes de texto y audio de voz. "
+                f"Tipo recibido: {message_type}"
+            )
+
+    except DeadlineExceeded as e:
+        logger.warning("⏱️  %s para %s", e, phone_number)
+        # Si lo que se agotó fue el envío, un segundo envío tampoco llegaría a tiempo
+        if e.stage != "send":
+            # El fallback se envía fuera del presupuesto, que ya está agotado
+            with deadline_scope(None):
+                try:
+                    await send_whatsapp_message(phone_number, DEADLINE_FALLBACK_MESSAGE)
+                except Exception:
+                    pass  # send_whatsapp_message ya registró el error
+    except Exception as e:
+        logger.error("❌ Error procesando mensaje de WhatsApp: %s", e, exc_info=True)
+
+
+async def run_queued_whatsapp_message(item: Tuple[Dict[str, Any], Deadline]):
+    """Procesa un mensaje encolado con el deadline fijado al recibirlo en el webhook"""
+    message, deadline = item
+    with deadline_scope(deadline):
+        await handle_whatsapp_message(message)
+
+
+def forget_dropped_whatsapp_message(phone_number: str, item: Tuple[Dict[str, Any], Deadline]):
+    """
+    Con drop_oldest, olvida el ID del mensaje descartado para que un
+    reenvío de Meta no se tome como duplicado de algo que nunca se procesó.
+    """
+    message, _ = item
+    message_id = message.get("id")
+    if message_id:
+        whatsapp_deduplicator.discard(message_id)
+    logger.warning("🗑️  Mensaje %s de %s descartado sin procesar (cola llena)", message_id, phone_number)
+
+
+# Cola de mensajes entrantes: un carril serial por número de teléfono
+whatsapp_queue = LaneWorkQueue(
+    handler=run_queued_whatsapp_message,
+    workers=WHATSAPP_WORKERS,
+    max_size=WHATSAPP_QUEUE_MAX_SIZE,
+    overflow_policy=WHATSAPP_QUEUE_OVERFLOW,
+    block_timeout=WHATSAPP_QUEUE_BLOCK_TIMEOUT,
+    name="whatsapp",
+    on_drop=forget_dropped_whatsapp_message
+)
+
+
+
+async def warm_up_graph() -> str:
+    """Abre la conexión a la Graph API con un GET del número de WhatsApp"""
+    if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_NUMBER_ID:
+        return "sin WHATSAPP_TOKEN/WHATSAPP_PHONE_NUMBER_ID"
+    response = await http_client_pool.client.get(
+        f"{GRAPH_API_BASE_URL}/{WHATSAPP_PHONE_NUMBER_ID}",
+        headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
+    )
+    return f"HTTP {response.status_code}"
+
+
+# Calentamiento del lifespan. Las credenciales y el pool de sesiones
+# corren siempre; los upstreams se eligen con WARMUP_UPSTREAMS
+warmup = WarmUp(**warmup_config())
+warmup.add("credentials", credential_refresher.start, required=True)
+warmup.add("session_pool", session_pool.start, after="credentials", required=True)
+warmup.add("vertex", reasoning_engine.warm_up, after="credentials")
+warmup.add("graph", warm_up_graph)
+warmup.add("speech", speech_service.warm_up)
+
+# Gauges leídos al exportar /metrics
+metrics_registry.gauge_callback(
+    "bff_engine_calls_in_flight", "Llamadas al Reasoning Engine en curso",
+    lambda: engine_guard.limiter.in_flight
+)
+metrics_registry.gauge_callback(
+    "bff_engine_concurrency_limit", "Límite adaptativo de llamadas concurrentes al engine",
+    lambda: engine_guard.limiter.limit
+)
+metrics_registry.gauge_callback(
+    "bff_engine_circuit_open", "1 si el circuit breaker del engine está abierto",
+    lambda: engine_guard.circuit_open
+)
+metrics_registry.gauge_callback(
+    "bff_whatsapp_queue_depth", "Mensajes de WhatsApp esperando en la cola",
+    lambda: whatsapp_queue.depth
+)
+metrics_registry.gauge_callback(
+    "bff_whatsapp_queue_oldest_age_seconds", "Segundos que lleva esperando el mensaje de WhatsApp más antiguo en la cola",
+    whatsapp_queue.oldest_age
+)
+metrics_registry.gauge_callback(
+    "bff_startup_seconds", "Segundos desde el arranque del proceso hasta terminar el calentamiento",
+    lambda: startup_timer.ready_seconds
+)
+metrics_registry.gauge_callback(
+    "bff_ready", "1 si la instancia terminó el calentamiento (/readyz)",
+    lambda: warmup.ready
+)
+
+
 @app.post("/webhook")
 async def whatsapp_webhook(request: FastAPIRequest):
     """
-    Recibe mensajes de WhatsApp y los procesa con el agente.
+    Recibe mensajes de WhatsApp y los encola para procesarlos con el agente.
     Soporta mensajes de texto y audio (voz).
+
+    Responde de inmediato para que Meta no reintente por timeout; el
+    procesamiento ocurre en los workers de whatsapp_queue.
     """
     try:
         body = await request.json()
-        logger.info(f"📩 WhatsApp webhook received: {body}")
+        logger.info("📩 WhatsApp webhook received: %s", summarize(body))
         
         # Verificar que sea un mensaje
         if body.get("object") != "whatsapp_business_account":
             return {"status": "ok"}
         
+        # El presupuesto de cada mensaje corre desde que llega, incluida la espera en cola
+        deadline = Deadline.for_channel("whatsapp")
+        rejected = 0
         entries = body.get("entry", [])
         for entry in entries:
             changes = entry.get("changes", [])
             for change in changes:
                 value = change.get("value", {})
                 
-                # Procesar mensajes
+                # Encolar mensajes
                 messages = value.get("messages", [])
                 for message in messages:
-                    # Obtener datos del mensaje
                     phone_number = message.get("from")
-                    message_type = message.get("type")
-                    
-                    logger.info(f"📱 Mensaje de {phone_number}, tipo: {message_type}")
-                    
-                    # Procesar mensajes de TEXTO
-                    if message_type == "text":
-                        message_text = message.get("text", {}).get("body", "")
-                        
-                        logger.info(f"💬 Procesando mensaje de texto: {message_text[:50]}...")
-                        
-                        # Procesar con el agente
-                        agent_response = await process_whatsapp_message(
-                            phone_number, 
-                            message_text
-                        )
-                        
-                        # Enviar respuesta por WhatsApp
-                        send_whatsapp_message(phone_number, agent_response)
-                    
-                    # Procesar mensajes de AUDIO (voz)
-                    elif message_type == "audio":
-                        audio_id = message.get("audio", {}).get("id")
-                        
-                        if not audio_id:
-                            logger.error("❌ No se encontró ID de audio en el mensaje")
-                            send_whatsapp_message(
-                                phone_number,
-                                "❌ No pude procesar el audio. Por favor, intenta de nuevo."
-                            )
-                            continue
-                        
-                        logger.info(f"🎤 Procesando mensaje de audio: {audio_id}")
-                        
-                        # 1. Descargar audio desde WhatsApp
-                        audio_bytes = await download_whatsapp_audio(audio_id)
-                        
-                        if not audio_bytes:
-                            send_whatsapp_message(
-                                phone_number,
-                                "❌ No pude descargar el audio. Por favor, intenta enviar otro mensaje de voz."
-                            )
-                            continue
-                        
-                        # 2. Transcribir con Speech-to-Text
-                        logger.info(f"🎯 Transcribiendo audio de {phone_number}...")
-                        transcription = speech_service.transcribe_audio(
-                            audio_content=audio_bytes,
-                            language_code="es-US",  # Español de Estados Unidos
-                            encoding=speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
-                            sample_rate_hertz=16000
-                        )
-                        
-                        if not transcription["success"]:
-                            error_msg = transcription.get("error", "Error desconocido")
-                            logger.error(f"❌ Error en transcripción: {error_msg}")
-                            send_whatsapp_message(
-                                phone_number,
-                                "❌ No pude entender el audio. ¿Podrías hablar más claro o escribir tu mensaje?"
-                            )
-                            continue
-                        
-                        # 3. Extraer transcripción y confianza
-                        transcript = transcription["transcript"]
-                        confidence = transcription["confidence"]
-                        
-                        logger.info(
-                            f"✅ Audio transcrito exitosamente:\n"
-                            f"   Texto: '{transcript}'\n"
-                            f"   Confianza: {confidence:.2%}"
-                        )
-                        
-                        # 4. Notificar al usuario sobre la transcripción (opcional)
-                        if confidence < 0.7:  # Confianza baja
-                            send_whatsapp_message(
-                                phone_number,
-                                f"🎤 Entendí: \"{transcript}\"\n\n"
-                                f"⚠️ No estoy muy seguro. ¿Es correcto?"
-                            )
-                        
-                        # 5. Procesar transcripción con el agente
-                        agent_response = await process_whatsapp_message(
-                            phone_number, 
-                            transcript,
-                            is_transcription=True,
-                            confidence=confidence
-                        )
-                        
-                        # 6. Enviar respuesta del agente
-                        send_whatsapp_message(phone_number, agent_response)
-                    
-                    # Otros tipos de mensaje
-                    else:
-                        logger.info(f"ℹ️  Tipo de mensaje no soportado: {message_type}")
-                        send_whatsapp_message(
-                            phone_number,
-                            f"ℹ️ Solo puedo procesar mensajes de texto y audio de voz. "
-                            f"Tipo recibido: {message_type}"
-                        )
+                    message_id = message.get("id")
+
+                    # Reintentos de Meta: descartar antes de cualquier I/O
+                    if message_id and whatsapp_deduplicator.check_and_add(message_id):
+                        logger.info("♻️  Mensaje duplicado ignorado: %s", message_id)
+                        continue
+
+                    logger.info("📥 Encolando mensaje de %s, tipo: %s", phone_number, message.get('type'))
+
+                    if not await whatsapp_queue.submit(phone_number, (message, deadline)):
+                        rejected += 1
+                        # Se olvida el ID para que el reintento de Meta sí se procese
+                        if message_id:
+                            whatsapp_deduplicator.discard(message_id)
         
+        if rejected:
+            # Cola llena: pedir a Meta que reintente más tarde
+            return JSONResponse(
+                status_code=503,
+                content={"status": "busy", "rejected": rejected}
+            )
+
         return {"status": "ok"}
         
     except Exception as e:
-        logger.error(f"❌ Error procesando webhook de WhatsApp: {str(e)}", exc_info=True)
+        logger.error("❌ Error procesando webhook de WhatsApp: %s", e, exc_info=True)
         # Siempre devolver 200 para evitar que WhatsApp reintente
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/whatsapp/queue")
+async def whatsapp_queue_status():
+    """
+    Estado de la cola de mensajes de WhatsApp (profundidad, antigüedad, contadores).
+    """
+    return whatsapp_queue.stats()
+
+
+@app.get("/whatsapp/delivery")
+async def whatsapp_delivery_status():
+    """
+    Métricas de envío de mensajes salientes (latencia, fallos, reintentos).
+    """
+    return whatsapp_sender.stats()
+
+
+@app.get("/whatsapp/dedup")
+async def whatsapp_dedup_status():
+    """
+    Contadores del índice de deduplicación (reintentos de Meta absorbidos).
+    """
+    return whatsapp_deduplicator.stats()
+
+
+@app.get("/speech/cache")
+async def speech_cache_status():
+    """
+    Contadores de la caché de transcripciones (hits, misses, ocupación).
+    """
+    if speech_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **speech_service.cache.stats()}
+
+
 @app.get("/whatsapp/sessions")
 async def list_whatsapp_sessions():
     """
     Lista todas las sesiones activas de WhatsApp.
     """
+    sessions = await session_store.items()
     return {
-        "total_sessions": len(whatsapp_sessions),
+        "total_sessions": len(sessions),
+        "store": session_store.stats(),
+        "creation": session_creation_flight.stats(),
         "sessions": [
             {
                 "phone_number": phone,
                 "session_id": session_id
             }
-            for phone, session_id in whatsapp_sessions.items()
+            for phone, session_id in sessions
         ]
     }
 
@@ -619,8 +1341,7 @@ async def delete_whatsapp_session(phone_number: str):
     """
     Elimina una sesión de WhatsApp (para reiniciar la conversación).
     """
-    if phone_number in whatsapp_sessions:
-        del whatsapp_sessions[phone_number]
+    if await session_store.delete(phone_number):
         return {"status": "deleted", "phone_number": phone_number}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -628,13 +1349,14 @@ async def delete_whatsapp_session(phone_number: str):
 # ==================== Dialogflow CX Integration ====================
 
 @app.post("/dialogflow/webhook")
+@channel_deadline("dialogflow")
 async def dialogflow_webhook(request: FastAPIRequest):
     """
     Webhook para recibir mensajes desde Dialogflow CX y pasarlos al Agente Vertex AI.
     """
     try:
         body = await request.json()
-        logger.info(f"🤖 Dialogflow Request: {body}")
+        logger.info("🤖 Dialogflow Request: %s", summarize(body))
 
         # 1. Extraer información clave del request de Dialogflow
         # El texto del usuario suele venir en 'text' o dentro de 'intentInfo'
@@ -648,7 +1370,7 @@ async def dialogflow_webhook(request: FastAPIRequest):
         full_session = body.get("sessionInfo", {}).get("session", "")
         dialogflow_session_id = full_session.split("/")[-1] if full_session else "default_df_session"
 
-        logger.info(f"💬 Dialogflow User: {dialogflow_session_id} says: {user_text}")
+        logger.info("💬 Dialogflow User: %s says: %s", dialogflow_session_id, user_text)
 
         if not user_text:
             return {
@@ -662,38 +1384,17 @@ async def dialogflow_webhook(request: FastAPIRequest):
         
         # A. Obtener o crear sesión en Vertex AI
         # Usamos un prefijo 'df_' para distinguir estas sesiones
-        vertex_session_id = get_or_create_whatsapp_session(f"df_{dialogflow_session_id}")
-        
-        # B. Preparar headers
-        headers = get_auth_headers()
+        vertex_session_id = await get_or_create_whatsapp_session(f"df_{dialogflow_session_id}")
 
-        # C. Enviar al Reasoning Engine
-        stream_query_url = f"{BASE_API_URL}:streamQuery?alt=sse"
-        
-        payload = {
-            "class_method": "async_stream_query",
-            "input": {
-                "user_id": f"df_{dialogflow_session_id}",
-                "session_id": vertex_session_id,
-                "message": user_text
-            }
-        }
+        # B. Enviar al Reasoning Engine
+        result = await reasoning_engine.stream_query(f"df_{dialogflow_session_id}", vertex_session_id, user_text)
 
-        response = requests.post(
-            stream_query_url,
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        # D. Extraer respuesta
-        agent_response = result.get("content", {}).get("parts", [{}])[0].get("text", "Error procesando respuesta.")
+        # C. Extraer respuesta
+        agent_response = agent_text(result, "Error procesando respuesta.")
 
         # 3. Formatear respuesta para Dialogflow CX
         # Dialogflow espera un JSON específico con 'fulfillment_response'
-        return {
+        return ORJSONResponse({
             "fulfillment_response": {
                 "messages": [
                     {
@@ -703,10 +1404,24 @@ async def dialogflow_webhook(request: FastAPIRequest):
                     }
                 ]
             }
-        }
+        })
 
+    except (EngineUnavailable, DeadlineExceeded) as e:
+        logger.warning("⛔ %s", e)
+        fallback = ENGINE_BUSY_MESSAGE if isinstance(e, EngineUnavailable) else DEADLINE_FALLBACK_MESSAGE
+        return {
+            "fulfillment_response": {
+                "messages": [
+                    {
+                        "text": {
+                            "text": [fallback]
+                        }
+                    }
+                ]
+            }
+        }
     except Exception as e:
-        logger.error(f"❌ Error en Dialogflow Webhook: {str(e)}", exc_info=True)
+        logger.error("❌ Error en Dialogflow Webhook: %s", e, exc_info=True)
         # Devolver un mensaje de error amigable al chat de Dialogflow
         return {
             "fulfillment_response": {
@@ -718,4 +1433,8 @@ async def dialogflow_webhook(request: FastAPIRequest):
                     }
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+
+# Fin del import de la app (ver /startup)
+startup_timer.mark_imported()
@@ -0,0 +1,213 @@
+"""Renovación de credenciales de Google en background con headers cacheados"""
+
+import asyncio
+import datetime
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fracción máxima de la vida del token que se usa como margen de renovación
+MAX_MARGIN_FRACTION = 0.5
+
+
+class CredentialRefresher:
+    """
+    Mantiene un access token vigente y los headers HTTP ya construidos.
+
+    Una tarea de fondo renueva el token ``refresh_margin`` segundos antes de
+    que expire (como mucho la mitad de su vida, y nunca antes de
+    ``retry_interval`` desde el refresh anterior), bajo un lock para que nunca haya dos refresh en paralelo. El
+    camino de cada request usa ``get_headers()``, que con el token vigente
+    devuelve un mapping inmutable sin I/O; si el token venció o todavía no
+    existe, espera el refresh en curso (o lanza uno en un thread) sin
+    bloquear el event loop. ``headers`` es la variante síncrona para código
+    fuera del event loop y cae a un refresh bloqueante como último recurso.
+
+    Las credenciales por defecto se resuelven en el primer uso y no al
+    importar: ``google.auth.default()`` puede consultar el metadata server y
+    no debe sumarse al cold start de requests que no llaman a Vertex.
+    """
+
+    def __init__(self, credentials: Any = None, refresh_margin: float = 300.0, retry_interval: float = 10.0):
+        """
+        Args:
+            credentials: Credenciales de google-auth (default: google.auth.default() en el primer uso)
+            refresh_margin: Segundos antes de la expiración en que se renueva el token
+            retry_interval: Segundos entre reintentos si falla un refresh
+        """
+        self._credentials = credentials
+        self._credentials_lock = threading.Lock()
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+
+        self._headers: Optional[Mapping[str, str]] = None
+        self._valid_until = 0.0
+        # Próximo refresh de la tarea de fondo (0: ya mismo)
+        self._refresh_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._sync_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Contadores
+        self.refreshes = 0
+        self.failures = 0
+        self.refresh_waits = 0
+        self.sync_fallbacks = 0
+
+    @property
+    def credentials(self) -> Any:
+        """
+        Credenciales de google-auth. Se resuelven una sola vez, aunque el
+        primer uso llegue desde varios threads a la vez.
+        """
+        if self._credentials is None:
+            with self._credentials_lock:
+                if self._credentials is None:
+                    import google.auth
+
+                    self._credentials, _ = google.auth.default()
+        return self._credentials
+
+    async def start(self) -> None:
+        """
+        Obtiene el primer token y lanza la tarea de renovación. La tarea se
+        lanza aunque el primer refresh falle o se cancele, para que siga
+        reintentando.
+        """
+        if self._task is not None:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        try:
+            await self.refresh()
+        finally:
+            self._task = asyncio.create_task(self._refresh_loop(), name="credential-refresher")
+
+    async def stop(self) -> None:
+        """Detiene la tarea de renovación"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def refresh(self) -> None:
+        """Renueva el token en un thread, sin bloquear el event loop"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await asyncio.to_thread(self._refresh_blocking)
+
+    def _valid(self) -> bool:
+        return self._headers is not None and time.monotonic() < self._valid_until
+
+    def _refresh_blocking(self) -> None:
+        """Refresh síncrono; reconstruye los headers cacheados"""
+        with self._sync_lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        """Refresh con ``_sync_lock`` ya tomado"""
+        from google.auth.transport.requests import Request
+
+        try:
+            self.credentials.refresh(Request())
+        except Exception:
+            self.failures += 1
+            raise
+
+        self.refreshes += 1
+        lifetime = self._seconds_to_expiry()
+        now = time.monotonic()
+        self._valid_until = now + lifetime
+        # Con tokens de vida corta (o reloj desfasado) el margen no puede
+        # dejar el próximo refresh en el pasado: eso renovaría en un lazo
+        margin = min(self.refresh_margin, lifetime * MAX_MARGIN_FRACTION)
+        self._refresh_at = now + max(lifetime - margin, self.retry_interval)
+        self._headers = MappingProxyType({
+            "Authorization": f"Bearer {self.credentials.token}",
+            "Content-Type": "application/json"
+        })
+        logger.info("🔑 Token renovado (expira en %.0fs)", lifetime)
+
+    def _seconds_to_expiry(self) -> float:
+        """Segundos de vida que le quedan al token actual"""
+        expiry = getattr(self.credentials, "expiry", None)
+        if expiry is None:
+            # Credenciales sin expiración conocida: renovar cada hora
+            return 3600.0
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds()
+
+    async def _refresh_loop(self) -> None:
+        """Duerme hasta el margen previo a la expiración y renueva"""
+        while True:
+            await asyncio.sleep(max(self._refresh_at - time.monotonic(), 0.0))
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("❌ Error renovando credenciales: %s", e)
+                await asyncio.sleep(self.retry_interval)
+
+    async def get_headers(self) -> Mapping[str, str]:
+        """
+        Headers de autorización vigentes (inmutables), para el event loop.
+
+        Con el token vigente no hay I/O. Si venció o todavía no existe,
+        espera el refresh en curso de la tarea de fondo o lanza uno en un
+        thread; los requests que llegan a la vez comparten ese único refresh.
+        """
+        if self._valid():
+            return self._headers
+
+        self.refresh_waits += 1
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # El refresh que estaba en curso pudo dejar el token vigente
+            if not self._valid():
+                logger.warning("⚠️  Token vencido o ausente, el request espera un refresh")
+                await asyncio.to_thread(self._refresh_blocking)
+        return self._headers
+
+    @property
+    def headers(self) -> Mapping[str, str]:
+        """
+        Headers de autorización vigentes (inmutables), para código síncrono.
+        En el event loop usar ``get_headers()``.
+        """
+        if self._valid():
+            return self._headers
+
+        # Último recurso: el refresher no corrió a tiempo
+        self.sync_fallbacks += 1
+        with self._sync_lock:
+            # Otro thread pudo renovarlo mientras esperábamos el lock
+            if not self._valid():
+                logger.warning("⚠️  Token vencido o ausente, refresh síncrono")
+                self._refresh_locked()
+        return self._headers
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del token y contadores de refresh"""
+        return {
+            "running": self._task is not None,
+            "seconds_to_expiry": round(self._valid_until - time.monotonic(), 1) if self._headers else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "refresh_waits": self.refresh_waits,
+            "sync_fallbacks": self.sync_fallbacks
+        }
+
+
+# Instancia global con las credenciales por defecto del entorno
+credential_refresher = CredentialRefresher(
+    refresh_margin=float(os.getenv("AUTH_REFRESH_MARGIN", "300"))
+)
@@ -0,0 +1,171 @@
+"""Presupuestos de tiempo por request propagados entre las etapas del pipeline"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Presupuesto por canal de entrada, en segundos
+CHANNEL_BUDGETS: Dict[str, float] = {
+    "chat": float(os.getenv("DEADLINE_CHAT_SECONDS", "60")),
+    "whatsapp": float(os.getenv("DEADLINE_WHATSAPP_SECONDS", "45")),
+    # Dialogflow CX corta el webhook a los 30s como máximo
+    "dialogflow": float(os.getenv("DEADLINE_DIALOGFLOW_SECONDS", "25")),
+}
+
+# Deadline del request en curso; se copia a las tareas que este lance
+_current: ContextVar[Optional["Deadline"]] = ContextVar("deadline", default=None)
+
+# Etapa -> veces que se agotó el presupuesto en ella
+_exceeded_by_stage: Dict[str, int] = {}
+
+
+class DeadlineExceeded(Exception):
+    """Se agotó el presupuesto del request antes o durante una etapa"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Presupuesto de tiempo agotado en la etapa '{stage}'")
+        self.stage = stage
+
+
+class Deadline:
+    """Instante límite de un request, fijado al entrar al servicio"""
+
+    def __init__(self, budget: float, channel: str = "default"):
+        """
+        Args:
+            budget: Segundos disponibles desde ahora
+            channel: Canal de entrada (para logs)
+        """
+        self.budget = budget
+        self.channel = channel
+        self.expires_at = time.monotonic() + budget
+        # Primera etapa en la que se agotó (None mientras quede presupuesto)
+        self.exceeded_in: Optional[str] = None
+
+    @classmethod
+    def for_channel(cls, channel: str) -> "Deadline":
+        """Deadline con el presupuesto configurado para ``channel``"""
+        return cls(CHANNEL_BUDGETS[channel], channel=channel)
+
+    def remaining(self) -> float:
+        """Segundos que quedan (negativo si ya venció)"""
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def _exceeded(stage: str) -> DeadlineExceeded:
+    """Crea la excepción y cuenta la etapa una sola vez por deadline"""
+    deadline = _current.get()
+    if deadline is not None and deadline.exceeded_in is None:
+        deadline.exceeded_in = stage
+        _exceeded_by_stage[stage] = _exceeded_by_stage.get(stage, 0) + 1
+    return DeadlineExceeded(stage)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline del request en curso, si hay uno"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Fija el deadline del contexto actual (None lo quita, por ejemplo para
+    enviar un mensaje de fallback cuando el presupuesto ya se agotó).
+    """
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def channel_deadline(channel: str) -> Callable:
+    """
+    Decorador para endpoints: cada request corre con un deadline nuevo con
+    el presupuesto de ``channel``, fijado al entrar al handler.
+    """
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with deadline_scope(Deadline.for_channel(channel)):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_timeout(stage: str, cap: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout para una etapa: el menor entre ``cap`` y lo que queda del
+    presupuesto. Sin deadline en el contexto devuelve ``cap``.
+
+    Raises:
+        DeadlineExceeded: Si el presupuesto ya se agotó
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise _exceeded(stage)
+    return remaining if cap is None else min(cap, remaining)
+
+
+@contextmanager
+def deadline_stage(stage: str) -> Iterator[None]:
+    """
+    Convierte en DeadlineExceeded los timeouts causados por el presupuesto
+    (y no por la etapa en sí), para no confundirlos con fallas del upstream.
+    """
+    try:
+        yield
+    except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+        deadline = _current.get()
+        if deadline is not None and deadline.expired:
+            raise _exceeded(stage) from e
+        raise
+
+
+async def within_deadline(stage: str, awaitable: Awaitable[T], cap: Optional[float] = None) -> T:
+    """
+    Espera ``awaitable`` como mucho lo que queda del presupuesto (y ``cap``).
+
+    Raises:
+        DeadlineExceeded: Si el presupuesto se agota antes de terminar
+    """
+    try:
+        timeout = stage_timeout(stage, cap)
+    except DeadlineExceeded:
+        # No dejar la corrutina sin esperar
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        # Solo es falta de presupuesto si el timeout lo fijó el deadline y no ``cap``
+        if _current.get() is not None and (cap is None or timeout < cap):
+            raise _exceeded(stage) from e
+        raise
+
+
+def deadline_stats() -> Dict[str, Any]:
+    """Presupuestos configurados y etapas donde se agotaron"""
+    return {
+        "budgets_seconds": dict(CHANNEL_BUDGETS),
+        "exceeded_by_stage": dict(_exceeded_by_stage)
+    }
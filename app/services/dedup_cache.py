@@ -0,0 +1,88 @@
+"""Índice en memoria de IDs ya vistos, con TTL y tamaño acotado"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class MessageDeduplicator:
+    """
+    Recuerda los IDs de mensaje recibidos durante ``ttl`` segundos.
+
+    Los IDs se guardan en orden de llegada y el TTL es igual para todos, así
+    que el más antiguo siempre está al principio: expirar y desalojar es
+    sacar del frente, y consultar o insertar es O(1).
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_size: int = 100_000):
+        """
+        Args:
+            ttl: Segundos que se recuerda cada ID
+            max_size: Máximo de IDs recordados; al superarlo se olvida el más antiguo
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def check_and_add(self, message_id: str) -> bool:
+        """
+        Registra un ID y dice si ya se había visto.
+
+        Returns:
+            True si es un duplicado (ya visto dentro del TTL)
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        if message_id in self._seen:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        self._seen[message_id] = now
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def discard(self, message_id: str) -> None:
+        """Olvida un ID (por ejemplo, si al final no se pudo procesar)"""
+        self._seen.pop(message_id, None)
+
+    def _expire(self, now: float) -> None:
+        """Elimina desde el frente los IDs cuyo TTL venció"""
+        cutoff = now - self.ttl
+        while self._seen:
+            seen_at = next(iter(self._seen.values()))
+            if seen_at > cutoff:
+                break
+            self._seen.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del índice"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._seen),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted
+        }
+
+
+# Instancia global para los mensajes entrantes de WhatsApp
+whatsapp_deduplicator = MessageDeduplicator(
+    ttl=float(os.getenv("WHATSAPP_DEDUP_TTL", "3600")),
+    max_size=int(os.getenv("WHATSAPP_DEDUP_MAX_SIZE", "100000"))
+)
@@ -0,0 +1,83 @@
+"""Cliente HTTP asíncrono compartido (httpx) con pool de conexiones keep-alive"""
+
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientPool:
+    """
+    Administra un único httpx.AsyncClient para todo el proceso.
+
+    El cliente se abre en el arranque de la aplicación (lifespan) y se cierra
+    al apagarla, de modo que todas las llamadas reutilizan conexiones TLS
+    abiertas en lugar de hacer un handshake nuevo por request.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True
+    ):
+        """
+        Args:
+            max_connections: Máximo de conexiones simultáneas en el pool
+            max_keepalive_connections: Conexiones ociosas que se mantienen abiertas
+            keepalive_expiry: Segundos que una conexión ociosa permanece abierta
+            http2: Negociar HTTP/2 cuando el servidor lo soporte
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Crea el cliente compartido (idempotente)"""
+        if self._client is not None:
+            return
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️  Paquete 'h2' no instalado, usando HTTP/1.1")
+                http2 = False
+
+        self._client = httpx.AsyncClient(limits=self.limits, http2=http2)
+        logger.info(
+            "✅ Cliente HTTP inicializado (http2=%s, max_connections=%s, max_keepalive=%s)",
+            http2, self.limits.max_connections, self.limits.max_keepalive_connections
+        )
+
+    async def close(self) -> None:
+        """Cierra el cliente y todas sus conexiones"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("🔌 Cliente HTTP cerrado")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente compartido; requiere que start() se haya ejecutado"""
+        if self._client is None:
+            raise RuntimeError("HTTPClientPool no inicializado: falta ejecutar start()")
+        return self._client
+
+
+# Instancia global del pool
+http_client_pool = HTTPClientPool(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    http2=os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+)
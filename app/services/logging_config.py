@@ -0,0 +1,225 @@
+"""Logging sin bloquear el event loop: cola con writer en background, muestreo y JSON"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Any, Dict, Optional
+
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+# Caracteres máximos por string dentro de un payload resumido
+_MAX_STRING_CHARS = 200
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+def _bounded_repr(payload: Any, max_chars: int) -> str:
+    """
+    Representación de dicts/listas/strings que se detiene al llegar a
+    ``max_chars``: el costo depende del límite, no del tamaño del payload.
+    """
+    parts = []
+    remaining = max_chars
+
+    def emit(text: str) -> None:
+        nonlocal remaining
+        parts.append(text)
+        remaining -= len(text)
+        if remaining <= 0:
+            raise _BudgetExhausted
+
+    def walk(value: Any) -> None:
+        if isinstance(value, dict):
+            emit("{")
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    emit(", ")
+                walk(key)
+                emit(": ")
+                walk(item)
+            emit("}")
+        elif isinstance(value, (list, tuple)):
+            emit("[")
+            for i, item in enumerate(value):
+                if i:
+                    emit(", ")
+                walk(item)
+            emit("]")
+        elif isinstance(value, str):
+            limit = min(_MAX_STRING_CHARS, remaining)
+            emit(repr(value[:limit]) + ("…" if len(value) > limit else ""))
+        elif isinstance(value, (bytes, bytearray)):
+            emit(f"<{len(value)} bytes>")
+        else:
+            emit(repr(value)[:remaining])
+
+    try:
+        walk(payload)
+    except _BudgetExhausted:
+        return "".join(parts)[:max_chars] + "…"
+    return "".join(parts)
+
+
+class PayloadSummary:
+    """
+    Resumen perezoso de un payload: se calcula solo si el registro se emite,
+    y su tamaño está acotado (niveles, elementos y caracteres), así que
+    loguear un body enorme cuesta lo mismo que uno chico.
+    """
+
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload: Any, max_chars: int):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return _bounded_repr(self.payload, self.max_chars)
+
+
+def summarize(payload: Any, max_chars: Optional[int] = None) -> PayloadSummary:
+    """
+    Argumento para logs con formato ``%``::
+
+        logger.info("📩 Webhook recibido: %s", summarize(body))
+
+    El payload no se copia: no mutarlo después de loguearlo.
+    """
+    return PayloadSummary(payload, max_chars if max_chars is not None else LOG_PAYLOAD_MAX_CHARS)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo por logger para registros por debajo de WARNING.
+
+    ``rates`` asocia prefijos de logger (``app.main``, ``httpx``) a la
+    fracción de registros que se conserva; gana el prefijo más largo.
+    WARNING y superiores nunca se descartan.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class CloudLoggingFormatter(logging.Formatter):
+    """
+    Una línea JSON por registro con los campos que Cloud Logging reconoce
+    (``severity``, ``message``, ``time`` y ``sourceLocation``).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        entry = {
+            "severity": record.levelname,
+            "message": message,
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "logger": record.name,
+            "logging.googleapis.com/sourceLocation": {
+                "file": record.pathname,
+                "line": record.lineno,
+                "function": record.funcName
+            }
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# Argumentos que se copian al encolar el registro (copia superficial)
+_MUTABLE_ARGS = (dict, list, set, bytearray)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el thread que loguea: el registro se
+    encola tal cual y el mensaje se arma en el thread del QueueListener.
+
+    Los argumentos que son contenedores mutables (dict, list, set) se
+    copian al encolar, así el mensaje muestra su valor al momento de
+    loguear y no el del momento en que el listener lo escribe.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if isinstance(args, dict):
+            record.args = dict(args)
+        elif args and any(isinstance(arg, _MUTABLE_ARGS) for arg in args):
+            record.args = tuple(copy.copy(arg) if isinstance(arg, _MUTABLE_ARGS) else arg for arg in args)
+        return record
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parsea ``"app.main=0.1,httpx=0"`` en {prefijo: fracción}"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, value = item.strip().partition("=")
+        if name and value:
+            rates[name.strip()] = min(max(float(value), 0.0), 1.0)
+    return rates
+
+
+def configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """
+    Configura el logger raíz según LOG_LEVEL, LOG_FORMAT (text|json),
+    LOG_ASYNC y LOG_SAMPLING.
+
+    Returns:
+        El QueueListener en modo asíncrono (se detiene al salir del proceso)
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format = os.getenv("LOG_FORMAT", "text").lower()
+    async_mode = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    sampling = parse_sampling(os.getenv("LOG_SAMPLING", ""))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        stream_handler.setFormatter(CloudLoggingFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    listener = None
+    if async_mode:
+        handler: logging.Handler = DeferredQueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+    else:
+        handler = stream_handler
+
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+    root.addHandler(handler)
+    return listener
@@ -0,0 +1,356 @@
+"""Métricas en formato Prometheus: contadores, gauges e histogramas sin locks"""
+
+import bisect
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Buckets de latencia en segundos (de 5 ms a 2 minutos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Buckets de tamaño de audio en bytes (de 4 KiB a 16 MiB)
+SIZE_BUCKETS = tuple(4096 * 4 ** i for i in range(7))
+
+# Buckets de confianza de transcripción (0-1)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # Un contador por bucket (no acumulado) más el de +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def observe_since(self, started: float) -> None:
+        """Observa los segundos transcurridos desde ``started`` (time.perf_counter())"""
+        self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    """Métrica con labels; cada combinación de valores es un hijo independiente"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[Any, ...], Any] = {}
+        # Sin labels la métrica es su propio único hijo
+        self._default = self._new_child() if not self.labelnames else None
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Hijo para una combinación de valores de labels.
+        Conviene guardarlo en una variable: registrar sobre el hijo no asigna memoria.
+        """
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[Tuple[Tuple[Any, ...], Any]]:
+        if self._default is not None:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.append(f"{self.name}{_label_str(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class CallbackGauge(_Metric):
+    """Gauge cuyo valor se lee al exportar: cero costo en el camino caliente"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.callback = callback
+        super().__init__(name, documentation)
+
+    def _new_child(self) -> None:
+        return None
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.callback())
+        except Exception:
+            value = math.nan
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(value) if not math.isnan(value) else 'NaN'}"
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in self._samples():
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), list(child.counts)):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}")
+            labels = _label_str(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas exportadas en /metrics.
+
+    Registrar un valor es una suma sobre un atributo: sin locks ni
+    asignaciones. Todo el registro ocurre en el event loop, así que no hay
+    carreras; desde threads (to_thread) la escritura sigue protegida por el
+    GIL salvo por algún incremento perdido muy ocasional, aceptable para
+    monitoreo. El costo de formatear se paga solo al exportar.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], float]) -> CallbackGauge:
+        return self._register(CallbackGauge(name, documentation, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Texto en formato de exposición de Prometheus"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageMetrics:
+    """
+    Latencia y ejecuciones en curso de una etapa del pipeline.
+
+    Uso (sin asignaciones por llamada)::
+
+        started = DOWNLOAD.start()
+        try:
+            ...
+        finally:
+            DOWNLOAD.finish(started)
+    """
+
+    __slots__ = ("seconds", "in_flight")
+
+    def __init__(self, seconds: _HistogramChild, in_flight: _GaugeChild):
+        self.seconds = seconds
+        self.in_flight = in_flight
+
+    def start(self) -> float:
+        self.in_flight.inc()
+        return time.perf_counter()
+
+    def finish(self, started: float) -> None:
+        self.in_flight.dec()
+        self.seconds.observe_since(started)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: cuenta requests por endpoint, método y status, mide su
+    duración y mantiene el gauge de requests en curso.
+
+    El endpoint es la plantilla de la ruta (``/whatsapp/sessions/{phone_number}``)
+    para no crear una serie por cada valor de path.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            http_requests_total.labels(endpoint, scope["method"], status).inc()
+            http_request_duration_seconds.labels(endpoint).observe_since(started)
+
+
+# Registro global y métricas compartidas por los servicios
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "bff_http_requests_total",
+    "Requests HTTP por endpoint, método y status",
+    ("endpoint", "method", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "bff_http_request_duration_seconds",
+    "Duración de los requests HTTP por endpoint",
+    ("endpoint",)
+)
+http_requests_in_flight = registry.gauge(
+    "bff_http_requests_in_flight",
+    "Requests HTTP en curso"
+)
+stage_duration_seconds = registry.histogram(
+    "bff_stage_duration_seconds",
+    "Latencia de cada etapa del pipeline (lookup de media, descarga, STT, sesión, agente, envío)",
+    ("stage",)
+)
+stage_in_flight = registry.gauge(
+    "bff_stage_in_flight",
+    "Ejecuciones en curso de cada etapa del pipeline",
+    ("stage",)
+)
+audio_size_bytes = registry.histogram(
+    "bff_audio_size_bytes",
+    "Tamaño de los audios transcritos",
+    buckets=SIZE_BUCKETS
+)
+transcription_confidence = registry.histogram(
+    "bff_transcription_confidence",
+    "Confianza de las transcripciones exitosas",
+    buckets=CONFIDENCE_BUCKETS
+)
+
+
+def stage_metrics(stage: str) -> StageMetrics:
+    """Métricas de una etapa; crear una vez por etapa a nivel de módulo"""
+    return StageMetrics(stage_duration_seconds.labels(stage), stage_in_flight.labels(stage))
@@ -0,0 +1,195 @@
+"""Lectura de páginas OGG/Opus: duración y partición sin decodificar el audio"""
+
+import struct
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Opus siempre expresa la granule position en muestras a 48 kHz
+OPUS_GRANULE_RATE = 48000
+
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+_CAPTURE_PATTERN = b"OggS"
+
+# Flags del header de página
+_FLAG_CONTINUED = 0x01
+_FLAG_BOS = 0x02
+_FLAG_EOS = 0x04
+
+
+def _crc_table() -> List[int]:
+    """Tabla del CRC-32 de Ogg (polinomio 0x04C11DB7, sin reflexión)"""
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    """CRC-32 de una página Ogg (con el campo de CRC en cero)"""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+@dataclass
+class OggPage:
+    """Una página Ogg: header parseado y bytes completos"""
+    header_type: int
+    granule: int
+    serial: int
+    sequence: int
+    data: bytes
+
+    @property
+    def continued(self) -> bool:
+        """La página continúa un paquete empezado en la anterior"""
+        return bool(self.header_type & _FLAG_CONTINUED)
+
+    def rewrite(self, sequence: int, granule: int, eos: bool = False) -> bytes:
+        """Bytes de la página con nuevo número de secuencia, granule y flag EOS"""
+        header_type = (self.header_type | _FLAG_EOS) if eos else (self.header_type & ~_FLAG_EOS)
+        page = bytearray(self.data)
+        page[5] = header_type
+        struct.pack_into("<qII", page, 6, granule, self.serial, sequence)
+        struct.pack_into("<I", page, 22, 0)
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        return bytes(page)
+
+
+def parse_pages(data: bytes) -> List[OggPage]:
+    """
+    Recorre las páginas de un stream Ogg.
+
+    Raises:
+        ValueError: Si los bytes no son un stream Ogg válido
+    """
+    pages = []
+    pos = 0
+    size = len(data)
+
+    while pos < size:
+        if size - pos < _PAGE_HEADER.size:
+            raise ValueError(f"Página Ogg truncada en el byte {pos}")
+
+        capture, version, header_type, granule, serial, sequence, _, n_segments = _PAGE_HEADER.unpack_from(data, pos)
+        if capture != _CAPTURE_PATTERN or version != 0:
+            raise ValueError(f"Capture pattern Ogg inválido en el byte {pos}")
+
+        table_start = pos + _PAGE_HEADER.size
+        body_size = sum(data[table_start:table_start + n_segments])
+        end = table_start + n_segments + body_size
+        if end > size:
+            raise ValueError(f"Página Ogg truncada en el byte {pos}")
+
+        pages.append(OggPage(header_type, granule, serial, sequence, data[pos:end]))
+        pos = end
+
+    return pages
+
+
+def _header_page_count(pages: List[OggPage]) -> int:
+    """
+    Páginas de cabecera: OpusHead y las de OpusTags.
+    La última página de OpusTags es la primera (después de OpusHead) con granule 0.
+    """
+    for i in range(1, len(pages)):
+        if pages[i].granule == 0:
+            return i + 1
+    return min(2, len(pages))
+
+
+def _pre_skip(pages: List[OggPage]) -> int:
+    """Muestras de pre-skip declaradas en OpusHead"""
+    head = pages[0].data
+    body_start = _PAGE_HEADER.size + head[_PAGE_HEADER.size - 1]
+    payload = head[body_start:]
+    if not payload.startswith(b"OpusHead") or len(payload) < 12:
+        raise ValueError("El stream no es Opus (falta OpusHead)")
+    return struct.unpack_from("<H", payload, 10)[0]
+
+
+def opus_duration(data: bytes) -> float:
+    """
+    Duración en segundos de un archivo OGG/Opus leyendo solo las páginas.
+
+    Raises:
+        ValueError: Si no es un OGG/Opus válido
+    """
+    pages = parse_pages(data)
+    if not pages:
+        raise ValueError("Stream Ogg vacío")
+    last_granule = max((p.granule for p in pages if p.granule > 0), default=0)
+    return max(last_granule - _pre_skip(pages), 0) / OPUS_GRANULE_RATE
+
+
+def split_opus(data: bytes, max_segment_seconds: float) -> List[Tuple[bytes, float]]:
+    """
+    Parte un OGG/Opus en segmentos independientes en límites de página.
+
+    Cada segmento es un stream Ogg válido: lleva las páginas de cabecera
+    originales, sus páginas de audio con secuencia y granule renumerados, y
+    la última marcada con EOS. Nunca se corta antes de una página que
+    continúa un paquete de la anterior.
+
+    Args:
+        data: Bytes del archivo OGG/Opus
+        max_segment_seconds: Duración objetivo de cada segmento
+
+    Returns:
+        Lista de (bytes del segmento, duración en segundos), en orden
+
+    Raises:
+        ValueError: Si no es un OGG/Opus válido
+    """
+    pages = parse_pages(data)
+    if not pages:
+        raise ValueError("Stream Ogg vacío")
+
+    n_headers = _header_page_count(pages)
+    headers = pages[:n_headers]
+    audio_pages = pages[n_headers:]
+    pre_skip = _pre_skip(pages)
+    max_samples = int(max_segment_seconds * OPUS_GRANULE_RATE)
+
+    # Agrupar páginas de audio en segmentos
+    groups: List[List[OggPage]] = []
+    current: List[OggPage] = []
+    segment_start = 0
+    last_granule = 0
+    for page in audio_pages:
+        if current and not page.continued and last_granule - segment_start >= max_samples:
+            groups.append(current)
+            current = []
+            segment_start = last_granule
+        current.append(page)
+        if page.granule > 0:
+            last_granule = page.granule
+    if current:
+        groups.append(current)
+
+    segments = []
+    offset = 0
+    for group in groups:
+        out = [page.data for page in headers]
+        sequence = n_headers
+        end_granule = offset
+        for i, page in enumerate(group):
+            granule = page.granule - offset if page.granule > 0 else page.granule
+            if page.granule > 0:
+                end_granule = page.granule
+            out.append(page.rewrite(sequence, granule, eos=(i == len(group) - 1)))
+            sequence += 1
+
+        start = offset + pre_skip if offset == 0 else offset
+        duration = max(end_granule - start, 0) / OPUS_GRANULE_RATE
+        segments.append((b"".join(out), duration))
+        offset = end_granule
+
+    return segments
@@ -0,0 +1,255 @@
+"""Cliente del Reasoning Engine con payloads precompilados y JSON vía orjson"""
+
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import orjson
+
+from app.services.auth import CredentialRefresher, credential_refresher
+from app.services.deadline import deadline_stage, stage_timeout, within_deadline
+from app.services.http_client import HTTPClientPool, http_client_pool
+from app.services.logging_config import summarize
+from app.services.metrics import StageMetrics, stage_metrics
+from app.services.resilience import EngineGuard, engine_guard
+from app.services.sse import iter_sse_events
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadTemplate:
+    """
+    Cuerpo ``{"class_method": ..., "input": {...}}`` precompilado en bytes.
+
+    Las partes fijas (método y nombres de los campos) se serializan una sola
+    vez; en cada llamada solo se codifican los valores y se concatenan, sin
+    armar el dict anidado.
+    """
+
+    __slots__ = ("class_method", "fields", "_prefix", "_keys")
+
+    def __init__(self, class_method: str, *fields: str):
+        """
+        Args:
+            class_method: Método del agente (``async_stream_query``, ...)
+            fields: Campos de ``input``, en el orden en que render() recibe los valores
+        """
+        self.class_method = class_method
+        self.fields = fields
+        self._prefix = b'{"class_method":' + orjson.dumps(class_method) + b',"input":'
+        self._keys = tuple(
+            (b"{" if i == 0 else b",") + orjson.dumps(name) + b":"
+            for i, name in enumerate(fields)
+        )
+
+    def render(self, *values: Any) -> bytes:
+        """
+        Payload con un valor por campo, en el orden de ``fields``.
+
+        Raises:
+            ValueError: Si la cantidad de valores no coincide con la de campos
+        """
+        if len(values) != len(self._keys):
+            raise ValueError(
+                f"{self.class_method} espera {len(self._keys)} valores ({', '.join(self.fields)}), recibió {len(values)}"
+            )
+        if not self._keys:
+            return self._prefix + b"{}}"
+        parts = [self._prefix]
+        for key, value in zip(self._keys, values):
+            parts.append(key)
+            parts.append(orjson.dumps(value))
+        parts.append(b"}}")
+        return b"".join(parts)
+
+    def render_input(self, input_data: Dict[str, Any]) -> bytes:
+        """Payload con un ``input`` arbitrario, serializado entero"""
+        return b"".join((self._prefix, orjson.dumps(input_data), b"}"))
+
+
+# Un template por class_method
+CREATE_SESSION = PayloadTemplate("async_create_session", "user_id")
+STREAM_QUERY = PayloadTemplate("async_stream_query", "user_id", "session_id", "message")
+
+
+def agent_text(result: Any, default: Optional[str] = None) -> Optional[str]:
+    """
+    Texto de la primera parte de contenido de una respuesta de
+    async_stream_query, o ``default`` si no trae texto.
+    """
+    if not isinstance(result, dict):
+        return default
+    parts = (result.get("content") or {}).get("parts") or [{}]
+    first = parts[0] if isinstance(parts[0], dict) else {}
+    return first.get("text", default)
+
+
+class ReasoningEngineClient:
+    """
+    Todas las llamadas al Reasoning Engine pasan por aquí.
+
+    Los cuerpos se arman con PayloadTemplate y se envían ya serializados;
+    las respuestas se decodifican con orjson directo desde los bytes. Cada
+    llamada pasa por el guard del engine (límite adaptativo y circuit
+    breaker, con su tipo de llamada), el presupuesto de tiempo de su etapa y
+    las métricas por etapa.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        http_pool: HTTPClientPool = http_client_pool,
+        credentials: CredentialRefresher = credential_refresher,
+        guard: EngineGuard = engine_guard
+    ):
+        """
+        Args:
+            base_url: URL del recurso ``.../reasoningEngines/{id}``
+            http_pool: Pool con el cliente HTTP compartido
+            credentials: Proveedor de los headers de autorización
+            guard: Guard de concurrencia y circuit breaker del engine
+        """
+        self.base_url = base_url
+        self.query_url = f"{base_url}:query"
+        self.stream_query_url = f"{base_url}:streamQuery"
+        self.stream_query_sse_url = f"{base_url}:streamQuery?alt=sse"
+        self.http_pool = http_pool
+        self.credentials = credentials
+        self.guard = guard
+
+        self._session_stage = stage_metrics("session")
+        self._agent_stage = stage_metrics("agent")
+        self._agent_stream_stage = stage_metrics("agent_stream")
+
+    async def _post(
+        self,
+        url: str,
+        body: bytes,
+        kind: str,
+        stage: str,
+        metrics: StageMetrics,
+        timeout: float
+    ) -> Any:
+        """POST con guard, deadline y métricas; devuelve el cuerpo decodificado"""
+        # Fuera del guard: esperar un refresh del token no es latencia del engine
+        headers = await self.credentials.get_headers()
+        started = metrics.start()
+        try:
+            async with self.guard.call(kind):
+                response = await within_deadline(stage, self.http_pool.client.post(
+                    url,
+                    content=body,
+                    headers=headers,
+                    timeout=timeout
+                ))
+                logger.info("Reasoning Engine %s response status: %s", stage, response.status_code)
+                response.raise_for_status()
+        finally:
+            metrics.finish(started)
+        return orjson.loads(response.content)
+
+    async def create_session(self, user_id: str, timeout: float = 30) -> Optional[str]:
+        """
+        Crea una sesión nueva (async_create_session).
+
+        Returns:
+            ID de la sesión creada (viene en ``output.id``)
+
+        Raises:
+            httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+            EngineUnavailable: Si el engine está saturado o con el circuito abierto
+            DeadlineExceeded: Si se agota el presupuesto del request
+        """
+        result = await self._post(
+            self.query_url, CREATE_SESSION.render(user_id),
+            "session", "session", self._session_stage, timeout
+        )
+        logger.info("Session response: %s", summarize(result))
+        return (result.get("output") or {}).get("id")
+
+    async def stream_query(self, user_id: str, session_id: str, message: str, timeout: float = 60) -> Any:
+        """
+        Envía un mensaje con async_stream_query y espera la respuesta completa.
+
+        Raises:
+            httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+            EngineUnavailable: Si el engine está saturado o con el circuito abierto
+            DeadlineExceeded: Si se agota el presupuesto del request
+        """
+        result = await self._post(
+            self.stream_query_sse_url, STREAM_QUERY.render(user_id, session_id, message),
+            "query", "agent", self._agent_stage, timeout
+        )
+        logger.info("Received response from agent: %s", summarize(result))
+        return result
+
+    async def query(self, input_data: Dict[str, Any], timeout: float = 60) -> Any:
+        """
+        Consulta genérica con async_stream_query e ``input`` libre (sin SSE).
+
+        Raises:
+            httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+            EngineUnavailable: Si el engine está saturado o con el circuito abierto
+            DeadlineExceeded: Si se agota el presupuesto del request
+        """
+        return await self._post(
+            self.stream_query_url, STREAM_QUERY.render_input(input_data),
+            "query", "agent", self._agent_stage, timeout
+        )
+
+    async def stream_events(
+        self,
+        user_id: str,
+        session_id: str,
+        message: str,
+        timeout: float = 60
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Envía un mensaje con async_stream_query y entrega los eventos SSE del
+        agente a medida que llegan, sin esperar la respuesta completa.
+
+        La llamada ocupa su lugar en el guard mientras la conexión está
+        abierta, pero el tiempo que el consumidor tiene cada evento (por
+        ejemplo, enviándolo por WhatsApp) no cuenta como latencia del engine
+        ni de la etapa ``agent_stream``.
+
+        Raises:
+            httpx.HTTPStatusError: Si el Reasoning Engine responde con error
+            EngineUnavailable: Si el engine está saturado o con el circuito abierto
+            DeadlineExceeded: Si se agota el presupuesto del request
+        """
+        body = STREAM_QUERY.render(user_id, session_id, message)
+        headers = await self.credentials.get_headers()
+        timeout = stage_timeout("agent", timeout)
+        started = self._agent_stream_stage.start()
+        call = None
+        try:
+            async with self.guard.call("stream") as call:
+                with deadline_stage("agent"):
+                    async with self.http_pool.client.stream(
+                        "POST",
+                        self.stream_query_sse_url,
+                        content=body,
+                        headers=headers,
+                        timeout=timeout
+                    ) as response:
+                        if response.is_error:
+                            # Leer el cuerpo para que el error incluya el detalle del engine
+                            await response.aread()
+                            response.raise_for_status()
+
+                        async for event in iter_sse_events(response.aiter_lines()):
+                            with call.paused():
+                                yield event
+                            # Cortar el stream si el presupuesto se agotó entre eventos
+                            stage_timeout("agent")
+        finally:
+            self._agent_stream_stage.finish(started + (call.paused_seconds if call is not None else 0.0))
+
+    async def warm_up(self) -> str:
+        """
+        Abre la conexión al endpoint de Vertex con un GET de los metadatos
+        del Reasoning Engine: no crea sesiones ni invoca al agente. Cualquier
+        respuesta HTTP sirve, lo que importa es la conexión TLS establecida.
+        """
+        response = await self.http_pool.client.get(self.base_url, headers=await self.credentials.get_headers())
+        return f"HTTP {response.status_code}"
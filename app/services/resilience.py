@@ -0,0 +1,430 @@
+"""Límite de concurrencia adaptativo y circuit breaker para las llamadas al Reasoning Engine"""
+
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+import httpx
+
+from app.services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class EngineUnavailable(Exception):
+    """
+    El engine no acepta más llamadas por ahora (circuito abierto o límite
+    de concurrencia alcanzado). Se falla de inmediato en lugar de encolar.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Reasoning Engine no disponible ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_engine_failure(exc: BaseException) -> bool:
+    """
+    Errores que indican un engine degradado: timeouts, errores de red,
+    429 y 5xx. Los 4xx restantes son errores del request, no del engine.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class AdaptiveLimiter:
+    """
+    Límite de concurrencia que se ajusta según la latencia observada.
+
+    Compara una latencia reciente (EWMA rápida) con una de referencia (EWMA
+    lenta): mientras la reciente no supere a la de referencia por más de
+    ``tolerance`` el límite crece; cuando la latencia sube, el límite se
+    reduce en proporción (gradiente). Los errores del engine recortan el
+    límite multiplicativamente (``backoff_ratio``), al estilo AIMD. No hay
+    cola: si el límite está ocupado la llamada se rechaza.
+
+    Las latencias se siguen por tipo de llamada (``kind``): crear una sesión
+    tarda mucho menos que una consulta, y mezclarlas haría que una ráfaga de
+    consultas pareciera una degradación del engine.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        tolerance: float = 1.5,
+        backoff_ratio: float = 0.9,
+        smoothing: float = 0.2
+    ):
+        """
+        Args:
+            initial_limit: Límite de llamadas concurrentes al arrancar
+            min_limit: Límite mínimo
+            max_limit: Límite máximo
+            tolerance: Cuánto puede exceder la latencia reciente a la de referencia antes de reducir
+            backoff_ratio: Factor aplicado al límite ante un error del engine
+            smoothing: Peso de cada ajuste sobre el límite actual (0-1)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        # Tipo de llamada -> [latencia reciente, latencia de referencia]
+        self._rtts: Dict[str, List[float]] = {}
+
+        # Contadores
+        self.rejected = 0
+
+    @property
+    def limit(self) -> int:
+        """Llamadas concurrentes permitidas ahora"""
+        return max(self.min_limit, int(self._limit))
+
+    def try_acquire(self) -> bool:
+        """Ocupa un lugar si hay capacidad; no espera"""
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: Optional[float], failed: bool = False, kind: str = "default") -> None:
+        """
+        Libera el lugar y ajusta el límite.
+
+        Args:
+            latency: Segundos que tardó la llamada (None si no hay muestra válida)
+            failed: Si la llamada falló por un problema del engine
+            kind: Tipo de llamada; cada tipo tiene sus propias latencias de referencia
+        """
+        in_flight = self.in_flight
+        self.in_flight -= 1
+
+        rtts = None
+        if latency is not None:
+            rtts = self._rtts.get(kind)
+            if rtts is None:
+                rtts = self._rtts[kind] = [latency, latency]
+            else:
+                rtts[0] = 0.5 * rtts[0] + 0.5 * latency
+                rtts[1] = 0.98 * rtts[1] + 0.02 * latency
+
+        if failed:
+            self._set_limit(self._limit * self.backoff_ratio)
+            return
+        if rtts is None:
+            return
+        short_rtt, long_rtt = rtts
+
+        gradient = max(0.5, min(1.0, self.tolerance * long_rtt / short_rtt))
+        # Solo crecer si el límite se está usando; con poca carga no hay señal
+        headroom = math.sqrt(self._limit) if in_flight * 2 >= self.limit else 0.0
+        target = self._limit * gradient + headroom
+        self._set_limit(self._limit * (1 - self.smoothing) + target * self.smoothing)
+
+        # La referencia decae hacia la reciente cuando esta baja, para no
+        # quedar anclada a un pico pasado
+        if short_rtt < long_rtt:
+            rtts[1] = short_rtt
+
+    def is_slow(self, latency: float, kind: str = "default") -> bool:
+        """La latencia supera en más de ``tolerance`` a la de referencia de su tipo"""
+        rtts = self._rtts.get(kind)
+        return rtts is not None and latency > rtts[1] * self.tolerance
+
+    def _set_limit(self, value: float) -> None:
+        self._limit = min(float(self.max_limit), max(float(self.min_limit), value))
+
+    def stats(self) -> Dict[str, Any]:
+        """Límite actual, ocupación y latencias de referencia"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "latency_seconds": {
+                kind: {"recent": round(short_rtt, 4), "baseline": round(long_rtt, 4)}
+                for kind, (short_rtt, long_rtt) in self._rtts.items()
+            },
+            "rejected": self.rejected
+        }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de errores en una ventana de llamadas recientes.
+
+    - ``closed``: las llamadas pasan; si en las últimas ``window_size``
+      llamadas (con al menos ``min_calls``) la tasa de errores alcanza
+      ``failure_threshold`` el circuito se abre.
+    - ``open``: toda llamada falla de inmediato durante ``reset_timeout``.
+    - ``half_open``: pasan hasta ``half_open_max_calls`` llamadas de prueba;
+      un éxito cierra el circuito y un error lo vuelve a abrir.
+
+    allow() entrega un ticket con la época del breaker (cambia en cada
+    transición de estado). record() y cancel() ignoran los tickets de una
+    época anterior: una llamada lenta admitida antes de abrir el circuito
+    que termina bien durante half-open no es una prueba y no lo cierra.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 10,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        """
+        Args:
+            failure_threshold: Fracción de errores que abre el circuito (0-1)
+            window_size: Llamadas recientes consideradas
+            min_calls: Llamadas mínimas en la ventana antes de evaluar
+            reset_timeout: Segundos que el circuito queda abierto
+            half_open_max_calls: Llamadas de prueba simultáneas en half-open
+        """
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._epoch = 0
+
+        # Contadores
+        self.opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        """Estado actual; pasa de open a half_open al vencer reset_timeout"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._epoch += 1
+            self._probes = 0
+            logger.info("🟡 Circuit breaker del engine en half-open, probando")
+        return self._state
+
+    def retry_after(self) -> float:
+        """Segundos hasta el próximo intento permitido"""
+        if self._state != self.OPEN:
+            return 1.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 1.0)
+
+    def allow(self) -> Optional[int]:
+        """
+        Indica si una llamada puede pasar (y reserva la prueba en half-open).
+
+        Returns:
+            Ticket para record()/cancel(), o None si la llamada se rechaza
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return self._epoch
+        if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return self._epoch
+        self.short_circuited += 1
+        return None
+
+    def record(self, ticket: int, failed: bool) -> None:
+        """Registra el resultado de una llamada admitida con ``ticket``"""
+        if ticket != self._epoch:
+            # Admitida antes del último cambio de estado: no describe al engine actual
+            return
+
+        if self._state == self.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            if failed:
+                self._open()
+            else:
+                self._state = self.CLOSED
+                self._epoch += 1
+                self._outcomes.clear()
+                logger.info("🟢 Circuit breaker del engine cerrado")
+            return
+
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_threshold:
+                self._open()
+
+    def cancel(self, ticket: int) -> None:
+        """Libera una llamada admitida con ``ticket`` sin aportar resultado"""
+        if ticket == self._epoch and self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._epoch += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning("🔴 Circuit breaker del engine abierto por %.0fs", self.reset_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado y contadores del breaker"""
+        failures = sum(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_failures": failures,
+            "failure_rate": round(failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "times_opened": self.opened,
+            "short_circuited": self.short_circuited
+        }
+
+
+class CallTimer:
+    """
+    Duración de una llamada al engine sin contar los tramos en pausa (por
+    ejemplo, mientras el consumidor de un stream procesa un evento).
+    """
+
+    __slots__ = ("_started", "paused_seconds")
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self.paused_seconds = 0.0
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Excluye de la duración el tiempo dentro del bloque"""
+        paused_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.paused_seconds += time.monotonic() - paused_at
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos de la llamada, sin las pausas"""
+        return time.monotonic() - self._started - self.paused_seconds
+
+
+class EngineGuard:
+    """
+    Punto único por el que pasan las llamadas al Reasoning Engine:
+    primero el circuit breaker, después el límite adaptativo.
+
+    Si el presupuesto del request se agota con la llamada en curso, el
+    tiempo transcurrido se registra como muestra de latencia (es una cota
+    inferior de la real). La llamada cuenta como falla del engine si para
+    entonces ya tardaba más de lo normal para su tipo o más de
+    ``hung_call_seconds``: los presupuestos de WhatsApp y Dialogflow son más
+    cortos que el timeout del engine, y sin esto un engine colgado nunca
+    abriría el circuito en esos canales.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter, breaker: CircuitBreaker, hung_call_seconds: float = 20.0):
+        """
+        Args:
+            limiter: Límite de concurrencia adaptativo
+            breaker: Circuit breaker
+            hung_call_seconds: Segundos en curso a partir de los cuales una
+                llamada cortada por el deadline cuenta como falla aunque no
+                haya latencia de referencia
+        """
+        self.limiter = limiter
+        self.breaker = breaker
+        self.hung_call_seconds = hung_call_seconds
+
+    @asynccontextmanager
+    async def call(self, kind: str = "query") -> AsyncIterator[CallTimer]:
+        """
+        Envuelve una llamada al engine.
+
+        Entrega un CallTimer: quien consume un stream dentro del bloque pone
+        en pausa el tiempo que el consumidor tiene cada evento, para que la
+        latencia registrada sea solo la de leer del engine.
+
+        Args:
+            kind: Tipo de llamada (``session``, ``query``, ``stream``) para
+                comparar su latencia solo con llamadas del mismo tipo
+
+        Raises:
+            EngineUnavailable: Si el circuito está abierto o no hay capacidad
+        """
+        ticket = self.breaker.allow()
+        if ticket is None:
+            raise EngineUnavailable("circuit_open", self.breaker.retry_after())
+        if not self.limiter.try_acquire():
+            # La llamada no llegó al engine: no cuenta para el breaker
+            self.breaker.cancel(ticket)
+            raise EngineUnavailable("overloaded", 1.0)
+
+        timer = CallTimer()
+        try:
+            yield timer
+        except BaseException as e:
+            if isinstance(e, DeadlineExceeded):
+                elapsed = timer.elapsed
+                hung = elapsed >= self.hung_call_seconds or self.limiter.is_slow(elapsed, kind)
+                if hung:
+                    self.breaker.record(ticket, True)
+                else:
+                    self.breaker.cancel(ticket)
+                self.limiter.release(elapsed, failed=hung, kind=kind)
+                raise
+            failed = is_engine_failure(e)
+            if failed or isinstance(e, httpx.HTTPStatusError):
+                self.breaker.record(ticket, failed)
+                self.limiter.release(None if failed else timer.elapsed, failed=failed, kind=kind)
+            else:
+                # Cancelaciones y errores propios no dicen nada de la salud del engine
+                self.breaker.cancel(ticket)
+                self.limiter.release(None)
+            raise
+        else:
+            self.breaker.record(ticket, False)
+            self.limiter.release(timer.elapsed, kind=kind)
+
+    @property
+    def circuit_open(self) -> bool:
+        """El breaker rechaza llamadas (para evitar trabajo previo inútil)"""
+        return self.breaker.state == CircuitBreaker.OPEN
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del límite de concurrencia y del breaker"""
+        return {
+            "limiter": self.limiter.stats(),
+            "breaker": self.breaker.stats()
+        }
+
+
+# Instancia global para todas las llamadas al engine
+engine_guard = EngineGuard(
+    limiter=AdaptiveLimiter(
+        initial_limit=int(os.getenv("ENGINE_CONCURRENCY_INITIAL", "20")),
+        min_limit=int(os.getenv("ENGINE_CONCURRENCY_MIN", "2")),
+        max_limit=int(os.getenv("ENGINE_CONCURRENCY_MAX", "200")),
+        tolerance=float(os.getenv("ENGINE_LATENCY_TOLERANCE", "1.5"))
+    ),
+    breaker=CircuitBreaker(
+        failure_threshold=float(os.getenv("ENGINE_BREAKER_FAILURE_RATE", "0.5")),
+        window_size=int(os.getenv("ENGINE_BREAKER_WINDOW", "20")),
+        min_calls=int(os.getenv("ENGINE_BREAKER_MIN_CALLS", "10")),
+        reset_timeout=float(os.getenv("ENGINE_BREAKER_RESET_TIMEOUT", "30"))
+    ),
+    hung_call_seconds=float(os.getenv("ENGINE_HUNG_CALL_SECONDS", "20"))
+)
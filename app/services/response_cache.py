@@ -0,0 +1,141 @@
+"""Caché de respuestas del agente con claves canónicas, TTL y desalojo LRU"""
+
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza el texto de una consulta para que variantes triviales
+    (mayúsculas, espacios repetidos, formas Unicode) compartan entrada.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).split()).casefold()
+
+
+def canonical_query_key(query: str, context: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Hash canónico de una consulta: texto normalizado más el contexto con
+    claves ordenadas, de modo que el orden de las claves no cambie la entrada.
+    """
+    blob = json.dumps(
+        {"q": normalize_query(query), "c": context or {}},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CacheControl:
+    """Directivas de ``Cache-Control`` relevantes para la caché de respuestas"""
+    no_cache: bool = False   # No leer de la caché (pero sí guardar la respuesta nueva)
+    no_store: bool = False   # Ni leer ni guardar
+    max_age: Optional[float] = None  # Aceptar solo entradas más nuevas que esto
+
+    @classmethod
+    def parse(cls, header: Optional[str]) -> "CacheControl":
+        if not header:
+            return cls()
+        no_cache = no_store = False
+        max_age = None
+        for directive in header.lower().split(","):
+            name, _, value = directive.strip().partition("=")
+            if name == "no-cache":
+                no_cache = True
+            elif name == "no-store":
+                no_store = True
+            elif name == "max-age":
+                try:
+                    max_age = float(value.strip('" '))
+                except ValueError:
+                    pass
+        return cls(no_cache=no_cache, no_store=no_store, max_age=max_age)
+
+
+class ResponseCache:
+    """
+    Caché LRU en memoria con TTL por entrada.
+
+    Cada entrada guarda su propio vencimiento; al superar ``max_entries`` se
+    desaloja la menos usada recientemente.
+    """
+
+    def __init__(self, max_entries: int = 1000, default_ttl: float = 300.0):
+        """
+        Args:
+            max_entries: Máximo de respuestas guardadas
+            default_ttl: Segundos de validez si put() no indica otro TTL
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (guardada_en, expira_en, valor)
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evicted = 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """
+        Devuelve la respuesta guardada o None.
+
+        Args:
+            key: Clave canónica
+            max_age: Antigüedad máxima aceptable en segundos (Cache-Control: max-age)
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+
+        if entry is not None:
+            stored_at, expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+            elif max_age is None or now - stored_at <= max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Guarda una respuesta con TTL propio (default: default_ttl)"""
+        now = time.monotonic()
+        self._entries[key] = (now, now + (ttl if ttl is not None else self.default_ttl), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "default_ttl_seconds": self.default_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted
+        }
+
+
+# Instancia global para /query (opt-in con QUERY_CACHE_ENABLED)
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "false").lower() == "true"
+query_cache = ResponseCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000")),
+    default_ttl=float(os.getenv("QUERY_CACHE_TTL", "300"))
+)
@@ -0,0 +1,203 @@
+"""Pool de sesiones del agente pre-creadas en background"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolStats:
+    """Contadores de un user_id del pool"""
+
+    __slots__ = ("hits", "misses", "created", "expired", "failures", "age_sum", "age_max")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.expired = 0
+        self.failures = 0
+        self.age_sum = 0.0
+        self.age_max = 0.0
+
+
+class SessionPool:
+    """
+    Mantiene sesiones listas para conversaciones nuevas.
+
+    Por cada user_id configurado se conserva una fila FIFO de sesiones recién
+    creadas. ``take`` entrega la más antigua en O(1); una tarea de fondo
+    repone las sesiones consumidas a ``refill_rate`` sesiones por segundo
+    hasta llegar a ``target_size``. Las sesiones con más de ``max_age``
+    segundos se descartan sin entregarse.
+    """
+
+    def __init__(
+        self,
+        create_session: Callable[[str], Awaitable[str]],
+        user_ids: List[str],
+        target_size: int = 0,
+        refill_rate: float = 1.0,
+        max_age: float = 3600.0,
+        error_backoff: float = 5.0
+    ):
+        """
+        Args:
+            create_session: Corrutina que crea una sesión para un user_id
+            user_ids: user_id para los que se mantiene pool
+            target_size: Sesiones listas por user_id (0 desactiva el pool)
+            refill_rate: Máximo de sesiones creadas por segundo
+            max_age: Antigüedad máxima de una sesión del pool, en segundos
+            error_backoff: Segundos de espera tras un error al crear
+        """
+        self.create_session = create_session
+        self.target_size = target_size
+        self.refill_rate = refill_rate
+        self.max_age = max_age
+        self.error_backoff = error_backoff
+
+        self._pools: Dict[str, Deque[Tuple[float, str]]] = {user_id: deque() for user_id in user_ids}
+        self._stats: Dict[str, _PoolStats] = {user_id: _PoolStats() for user_id in user_ids}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0 and bool(self._pools)
+
+    async def start(self) -> None:
+        """Lanza la tarea de reposición (no hace nada si el pool está desactivado)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._refill_loop(), name="session-pool-refill")
+        logger.info(
+            "✅ Pool de sesiones iniciado (user_ids=%s, target=%s, refill_rate=%s/s)",
+            list(self._pools), self.target_size, self.refill_rate
+        )
+
+    async def stop(self) -> None:
+        """Detiene la reposición"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def take(self, user_id: str) -> Optional[str]:
+        """
+        Toma una sesión lista para ``user_id``.
+
+        Returns:
+            session_id, o None si el pool está vacío (el llamador la crea inline)
+        """
+        pool = self._pools.get(user_id)
+        if pool is None:
+            return None
+
+        stats = self._stats[user_id]
+        now = time.monotonic()
+        self._drop_expired(user_id, now)
+
+        if not pool:
+            stats.misses += 1
+            self._wake()
+            return None
+
+        created_at, session_id = pool.popleft()
+        age = now - created_at
+        stats.hits += 1
+        stats.age_sum += age
+        stats.age_max = max(stats.age_max, age)
+        self._wake()
+        return session_id
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _drop_expired(self, user_id: str, now: float) -> None:
+        """Descarta desde el frente las sesiones más viejas que max_age"""
+        pool = self._pools[user_id]
+        while pool and now - pool[0][0] > self.max_age:
+            pool.popleft()
+            self._stats[user_id].expired += 1
+
+    def _most_depleted(self) -> Optional[str]:
+        """user_id con mayor déficit respecto a target_size"""
+        now = time.monotonic()
+        best, best_deficit = None, 0
+        for user_id, pool in self._pools.items():
+            self._drop_expired(user_id, now)
+            deficit = self.target_size - len(pool)
+            if deficit > best_deficit:
+                best, best_deficit = user_id, deficit
+        return best
+
+    async def _refill_loop(self) -> None:
+        """Crea sesiones de a una, respetando refill_rate, hasta llenar el pool"""
+        interval = 1.0 / self.refill_rate if self.refill_rate > 0 else 1.0
+
+        while True:
+            user_id = self._most_depleted()
+            if user_id is None:
+                # Pool lleno: esperar a que se consuma algo o a que expiren sesiones
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_age / 2)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                session_id = await self.create_session(user_id)
+                if session_id:
+                    self._pools[user_id].append((time.monotonic(), session_id))
+                    self._stats[user_id].created += 1
+                await asyncio.sleep(interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats[user_id].failures += 1
+                logger.warning("⚠️  Error pre-creando sesión para %s: %s", user_id, e)
+                await asyncio.sleep(max(interval, self.error_backoff))
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño, hits/misses y antigüedad de las sesiones por user_id"""
+        now = time.monotonic()
+        pools = {}
+        for user_id, pool in self._pools.items():
+            stats = self._stats[user_id]
+            pools[user_id] = {
+                "ready": len(pool),
+                "oldest_age_seconds": round(now - pool[0][0], 3) if pool else 0.0,
+                "hits": stats.hits,
+                "misses": stats.misses,
+                "created": stats.created,
+                "expired": stats.expired,
+                "failures": stats.failures,
+                "avg_age_at_take_seconds": round(stats.age_sum / stats.hits, 3) if stats.hits else 0.0,
+                "max_age_at_take_seconds": round(stats.age_max, 3)
+            }
+        return {
+            "enabled": self.enabled,
+            "target_size": self.target_size,
+            "refill_rate": self.refill_rate,
+            "max_age_seconds": self.max_age,
+            "pools": pools
+        }
+
+
+def session_pool_config() -> Dict[str, Any]:
+    """Parámetros del pool desde variables de entorno"""
+    user_ids = os.getenv("SESSION_POOL_USER_IDS", "default_user")
+    return {
+        "user_ids": [user_id.strip() for user_id in user_ids.split(",") if user_id.strip()],
+        "target_size": int(os.getenv("SESSION_POOL_SIZE", "0")),
+        "refill_rate": float(os.getenv("SESSION_POOL_REFILL_RATE", "1")),
+        "max_age": float(os.getenv("SESSION_POOL_MAX_AGE", "3600"))
+    }
@@ -0,0 +1,230 @@
+"""Almacenamiento de sesiones del agente por usuario (memoria o Redis)"""
+
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes aproximados que ocupa cada entrada además de sus strings
+# (nodo del OrderedDict, tupla y objetos str)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class SessionStore(ABC):
+    """
+    Mapa usuario -> session_id del Reasoning Engine.
+
+    Las claves son el número de WhatsApp o ``df_<sesión de Dialogflow>``.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Devuelve el session_id de ``key`` o None si no existe o expiró"""
+
+    @abstractmethod
+    async def set(self, key: str, session_id: str) -> None:
+        """Guarda el session_id de ``key``"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Elimina ``key``; devuelve True si existía"""
+
+    @abstractmethod
+    async def items(self) -> List[Tuple[str, str]]:
+        """Lista de pares (key, session_id) vigentes"""
+
+    async def close(self) -> None:
+        """Libera conexiones del backend"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Información del backend para diagnóstico"""
+        return {"backend": type(self).__name__}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Store en el proceso con desalojo LRU, TTL deslizante y tope de memoria.
+
+    Cada lectura renueva el TTL y mueve la entrada al final; al superar
+    ``max_entries`` o ``max_bytes`` se desalojan las menos usadas.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_entries: int = 50_000, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            ttl: Segundos sin uso tras los que una sesión se olvida
+            max_entries: Máximo de sesiones guardadas
+            max_bytes: Memoria aproximada máxima ocupada por las entradas
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self.evicted = 0
+        self.expired = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        session_id, expires_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self._remove(key)
+            self.expired += 1
+            return None
+
+        self._entries[key] = (session_id, now + self.ttl)
+        self._entries.move_to_end(key)
+        return session_id
+
+    async def set(self, key: str, session_id: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (session_id, time.monotonic() + self.ttl)
+        self._bytes += self._entry_size(key, session_id)
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evicted += 1
+
+    async def delete(self, key: str) -> bool:
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    async def items(self) -> List[Tuple[str, str]]:
+        now = time.monotonic()
+        return [
+            (key, session_id)
+            for key, (session_id, expires_at) in self._entries.items()
+            if expires_at > now
+        ]
+
+    def _remove(self, key: str) -> None:
+        session_id, _ = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, session_id)
+
+    @staticmethod
+    def _entry_size(key: str, session_id: str) -> int:
+        return len(key) + len(session_id or "") + _ENTRY_OVERHEAD_BYTES
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evicted": self.evicted,
+            "expired": self.expired
+        }
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store compartido entre instancias sobre el protocolo de Redis.
+
+    Funciona con Redis, Memorystore o cualquier servidor compatible (por
+    ejemplo un ``redis-server`` local para pruebas). El TTL es deslizante:
+    cada lectura lo renueva con GETEX.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        ttl: float = 86400.0,
+        prefix: str = "agent-bff:session:",
+        client: Any = None
+    ):
+        """
+        Args:
+            url: URL del servidor (redis:// o rediss://)
+            ttl: Segundos sin uso tras los que una sesión expira
+            prefix: Prefijo de las claves en Redis
+            client: Cliente redis.asyncio ya construido (opcional, para pruebas)
+        """
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "SESSION_STORE_BACKEND=redis requiere el paquete 'redis'"
+                ) from e
+            client = redis.from_url(url, decode_responses=True)
+
+        self.url = url
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._client = client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.getex(self._key(key), ex=self.ttl)
+
+    async def set(self, key: str, session_id: str) -> None:
+        await self._client.set(self._key(key), session_id, ex=self.ttl)
+
+    async def delete(self, key: str) -> bool:
+        return bool(await self._client.delete(self._key(key)))
+
+    async def items(self) -> List[Tuple[str, str]]:
+        keys = [key async for key in self._client.scan_iter(match=f"{self.prefix}*", count=500)]
+        if not keys:
+            return []
+        values = await self._client.mget(keys)
+        return [
+            (key[len(self.prefix):], value)
+            for key, value in zip(keys, values)
+            if value is not None
+        ]
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "prefix": self.prefix,
+            "ttl_seconds": self.ttl
+        }
+
+
+def create_session_store() -> SessionStore:
+    """Construye el store según SESSION_STORE_BACKEND (memory | redis)"""
+    backend = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL", "86400"))
+
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        logger.info("✅ Sesiones en Redis")
+        return RedisSessionStore(
+            url=url,
+            ttl=ttl,
+            prefix=os.getenv("SESSION_STORE_PREFIX", "agent-bff:session:")
+        )
+
+    if backend != "memory":
+        raise ValueError(f"SESSION_STORE_BACKEND inválido: {backend}")
+
+    return InMemorySessionStore(
+        ttl=ttl,
+        max_entries=int(os.getenv("SESSION_STORE_MAX_ENTRIES", "50000")),
+        max_bytes=int(os.getenv("SESSION_STORE_MAX_BYTES", str(16 * 1024 * 1024)))
+    )
+
+
+# Instancia global del store
+session_store = create_session_store()
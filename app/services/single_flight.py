@@ -0,0 +1,78 @@
+"""Coalescencia de llamadas concurrentes con la misma clave (single-flight)"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez las llamadas concurrentes con la misma clave.
+
+    El primer llamador lanza la operación en una tarea propia; los que llegan
+    mientras sigue en curso esperan esa misma tarea y reciben el mismo
+    resultado o la misma excepción. Cada espera está protegida con
+    ``asyncio.shield``: cancelar a un llamador no cancela la operación
+    compartida que otros siguen esperando.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        """
+        Args:
+            name: Nombre para logs y estadísticas
+        """
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+        # Contadores
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta ``fn`` o se une a la ejecución en curso para ``key``.
+
+        Args:
+            key: Clave que identifica operaciones equivalentes
+            fn: Función sin argumentos que devuelve el awaitable a ejecutar
+
+        Returns:
+            Resultado de la operación compartida
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+            logger.debug("🔗 %s: llamada coalescida para %s", self.name, key)
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Saca la tarea terminada del mapa de llamadas en curso"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marcar la excepción como leída aunque ya no quede nadie esperando
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Operaciones compartidas en curso"""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de ejecución y coalescencia"""
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
@@ -1,30 +1,327 @@
 """Servicio para transcripción de audio usando Google Cloud Speech-to-Text"""
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from google.cloud import speech_v1 as speech
-from google.api_core.exceptions import GoogleAPIError
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Dict, Optional, Tuple, Union
+from app.services.metrics import audio_size_bytes, stage_metrics, transcription_confidence
+from app.services.ogg_opus import opus_duration, split_opus
+from app.services.transcription_cache import TranscriptionCache, create_transcription_cache
+
+if TYPE_CHECKING:
+    from google.cloud import speech_v1 as speech
 
 logger = logging.getLogger(__name__)
 
+# Encoding como enum de RecognitionConfig o por nombre ("OGG_OPUS"), para
+# que los llamadores no necesiten importar speech_v1
+AudioEncoding = Union[str, "speech.RecognitionConfig.AudioEncoding"]
+
+# Tamaño máximo de audio por mensaje de streaming_recognize
+STREAMING_CHUNK_BYTES = 16 * 1024
+
+# Latencia de reconocimiento (sin contar aciertos de caché ni la espera por cupo)
+STT_STAGE = stage_metrics("stt")
+STT_STREAM_STAGE = stage_metrics("stt_stream")
+# Espera por un cupo de SPEECH_MAX_CONCURRENCY antes de reconocer
+STT_WAIT_STAGE = stage_metrics("stt_wait")
+
+
+def _speech() -> Any:
+    """
+    Módulo ``google.cloud.speech_v1``, importado en el primer uso: cargarlo
+    (gRPC, api_core, protos) agrega cientos de ms al cold start y la mayoría
+    de los requests no transcribe audio.
+    """
+    from google.cloud import speech_v1
+
+    return speech_v1
+
+
+def _google_api_error() -> type:
+    """``GoogleAPIError``; se evalúa recién al manejar una excepción"""
+    from google.api_core.exceptions import GoogleAPIError
+
+    return GoogleAPIError
+
+
+def _resolve_encoding(encoding: AudioEncoding) -> "speech.RecognitionConfig.AudioEncoding":
+    """Convierte el nombre del encoding en el enum de RecognitionConfig"""
+    if isinstance(encoding, str):
+        return _speech().RecognitionConfig.AudioEncoding[encoding]
+    return encoding
+
 
 class SpeechService:
     """Servicio para convertir audio a texto usando Google Cloud Speech-to-Text"""
     
-    def __init__(self):
-        """Inicializa el cliente de Speech-to-Text"""
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        cache: Optional[TranscriptionCache] = None,
+        max_sync_seconds: float = 55.0,
+        segment_seconds: float = 50.0
+    ):
+        """
+        Configura el servicio. Los clientes de Speech-to-Text se crean en el
+        primer uso, no al importar.
+        
+        Args:
+            max_concurrency: Máximo de transcripciones asíncronas simultáneas
+            cache: Caché de transcripciones por contenido (None la desactiva)
+            max_sync_seconds: Duración a partir de la cual un OGG/Opus se parte en segmentos
+            segment_seconds: Duración objetivo de cada segmento
+        """
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.max_sync_seconds = max_sync_seconds
+        self.segment_seconds = segment_seconds
+        self._client: Optional["speech.SpeechClient"] = None
+        self._client_lock = threading.Lock()
+        # El cliente asíncrono y el semáforo se crean dentro del event loop
+        self._async_client: Optional["speech.SpeechAsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def client(self) -> "speech.SpeechClient":
+        """
+        Cliente gRPC síncrono (se crea en el primer uso). El lock evita crear
+        dos clientes si el primer uso llega desde varios threads a la vez.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        self._client = _speech().SpeechClient()
+                        logger.info("✅ Speech-to-Text client inicializado correctamente")
+                    except Exception as e:
+                        logger.error("❌ Error al inicializar Speech-to-Text client: %s", e)
+                        raise
+        return self._client
+    
+    @property
+    def async_client(self) -> "speech.SpeechAsyncClient":
+        """
+        Cliente gRPC asíncrono (se crea en el primer uso, dentro del event
+        loop; sin awaits entre la verificación y la asignación, no hace falta lock)
+        """
+        if self._async_client is None:
+            self._async_client = _speech().SpeechAsyncClient()
+            logger.info("✅ Speech-to-Text async client inicializado correctamente")
+        return self._async_client
+    
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limita las transcripciones asíncronas simultáneas"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """
+        Ocupa un cupo del semáforo. La espera se mide en la etapa
+        ``stt_wait``, aparte del reconocimiento: con el cupo saturado la
+        latencia de ``stt`` sigue reflejando solo a Speech-to-Text.
+        """
+        waited = STT_WAIT_STAGE.start()
         try:
-            self.client = speech.SpeechClient()
-            logger.info("✅ Speech-to-Text client inicializado correctamente")
-        except Exception as e:
-            logger.error(f"❌ Error al inicializar Speech-to-Text client: {e}")
-            raise
+            await self.semaphore.acquire()
+        finally:
+            STT_WAIT_STAGE.finish(waited)
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+
+    async def warm_up(self) -> str:
+        """
+        Deja listo el camino de la primera transcripción: importa speech_v1
+        en un thread (para no bloquear el event loop), crea el cliente
+        asíncrono y espera a que su canal gRPC esté conectado.
+
+        Returns:
+            Estado del canal, para el reporte de calentamiento
+        """
+        await asyncio.to_thread(_speech)
+        channel = self.async_client.transport.grpc_channel
+        await channel.channel_ready()
+        return "channel ready"
+
+    @staticmethod
+    def _build_config(
+        language_code: str,
+        encoding: "speech.RecognitionConfig.AudioEncoding",
+        sample_rate_hertz: int
+    ) -> "speech.RecognitionConfig":
+        """Configuración de reconocimiento común a todos los métodos"""
+        return _speech().RecognitionConfig(
+            encoding=encoding,
+            sample_rate_hertz=sample_rate_hertz,
+            language_code=language_code,
+            # Características avanzadas
+            enable_automatic_punctuation=True,  # Puntuación automática
+            enable_word_time_offsets=False,     # No necesitamos timestamps
+            model="default",  # Modelo por defecto
+            use_enhanced=True  # Usar modelo mejorado si está disponible
+        )
+    
+    @staticmethod
+    def _error_result(error: str) -> Dict[str, Any]:
+        """Resultado fallido con la misma forma que uno exitoso"""
+        return {
+            "success": False,
+            "transcript": "",
+            "confidence": 0.0,
+            "error": error
+        }
+    
+    def _cache_lookup(
+        self,
+        audio_content: bytes,
+        language_code: str,
+        encoding: "speech.RecognitionConfig.AudioEncoding",
+        sample_rate_hertz: int,
+        record_miss: bool = True
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Devuelve (clave, resultado cacheado o None); clave None sin caché"""
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.key(audio_content, language_code, encoding, sample_rate_hertz)
+        cached = self.cache.get(cache_key, record_miss=record_miss)
+        if cached is not None:
+            logger.info("♻️  Transcripción servida desde caché (%s bytes)", len(audio_content))
+            return cache_key, {**cached, "cached": True}
+        return cache_key, None
+    
+    async def _acache_lookup(
+        self,
+        audio_content: bytes,
+        language_code: str,
+        encoding: "speech.RecognitionConfig.AudioEncoding",
+        sample_rate_hertz: int,
+        record_miss: bool = True
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Como _cache_lookup, sin bloquear el event loop si la caché lee de disco"""
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.key(audio_content, language_code, encoding, sample_rate_hertz)
+        cached = await self.cache.aget(cache_key, record_miss=record_miss)
+        if cached is not None:
+            logger.info("♻️  Transcripción servida desde caché (%s bytes)", len(audio_content))
+            return cache_key, {**cached, "cached": True}
+        return cache_key, None
+    
+    def _source_key(
+        self,
+        source_id: Optional[str],
+        language_code: str,
+        encoding: "speech.RecognitionConfig.AudioEncoding",
+        sample_rate_hertz: int
+    ) -> Optional[str]:
+        """Clave de caché por identificador del audio; None sin caché o sin identificador"""
+        if self.cache is None or not source_id:
+            return None
+        return self.cache.source_key(source_id, language_code, encoding, sample_rate_hertz)
+    
+    async def cached_transcription(
+        self,
+        source_id: str,
+        language_code: str = "es-US",
+        encoding: AudioEncoding = "OGG_OPUS",
+        sample_rate_hertz: int = 16000
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Transcripción cacheada de un audio identificado por ``source_id`` (el
+        ``sha256`` o el ID del media en WhatsApp), consultada antes de
+        descargarlo o de abrir el stream de reconocimiento.
+        
+        Args:
+            source_id: Identificador estable del contenido del audio
+            language_code: Código de idioma
+            encoding: Formato del audio, enum o nombre
+            sample_rate_hertz: Sample rate del audio
+            
+        Returns:
+            Resultado cacheado (con ``cached=True``) o None
+        """
+        cache_key = self._source_key(source_id, language_code, _resolve_encoding(encoding), sample_rate_hertz)
+        if cache_key is None:
+            return None
+        cached = await self.cache.aget(cache_key)
+        if cached is None:
+            return None
+        logger.info("♻️  Transcripción servida desde caché (audio %s)", source_id)
+        return {**cached, "cached": True}
+    
+    @staticmethod
+    def _observe(audio_bytes: int, result: Dict[str, Any]) -> None:
+        """Registra tamaño del audio y confianza de un reconocimiento real (no de caché)"""
+        audio_size_bytes.observe(audio_bytes)
+        if result["success"]:
+            transcription_confidence.observe(result["confidence"])
+    
+    def _cache_store(self, cache_key: Optional[str], result: Dict[str, Any], source_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Guarda un resultado exitoso en caché (por contenido y, si se conoce,
+        por identificador del audio) y lo marca como no cacheado
+        """
+        if result["success"]:
+            result["cached"] = False
+            for key in (cache_key, source_key):
+                if key is not None:
+                    self.cache.put(key, result)
+        return result
+    
+    async def _acache_store(
+        self,
+        cache_key: Optional[str],
+        result: Dict[str, Any],
+        source_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Como _cache_store, con la escritura a disco fuera del event loop"""
+        if result["success"]:
+            result["cached"] = False
+            for key in (cache_key, source_key):
+                if key is not None:
+                    await self.cache.aput(key, result)
+        return result
+    
+    @staticmethod
+    def _parse_response(response: Any, language_code: str) -> Dict[str, Any]:
+        """Convierte la respuesta de recognize en el dict de resultado"""
+        if not response.results:
+            logger.warning("⚠️  No se obtuvieron resultados de la transcripción")
+            return SpeechService._error_result(
+                "No se pudo transcribir el audio. El audio puede estar en silencio o ser ininteligible."
+            )
+        
+        # Obtener la mejor transcripción
+        result = response.results[0]
+        alternative = result.alternatives[0]
+        
+        transcript = alternative.transcript
+        confidence = alternative.confidence
+        
+        logger.info(
+            "✅ Transcripción exitosa: '%.50s%s' (confianza: %.2f%%)",
+            transcript, "..." if len(transcript) > 50 else "", confidence * 100
+        )
+        
+        return {
+            "success": True,
+            "transcript": transcript,
+            "confidence": confidence,
+            "language": language_code
+        }
     
     def transcribe_audio(
         self,
         audio_content: bytes,
         language_code: str = "es-US",
-        encoding: speech.RecognitionConfig.AudioEncoding = speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+        encoding: AudioEncoding = "OGG_OPUS",
         sample_rate_hertz: int = 16000
     ) -> Dict[str, Any]:
         """
@@ -33,7 +330,7 @@ class SpeechService:
         Args:
             audio_content: Contenido del audio en bytes
             language_code: Código de idioma (es-US, es-MX, en-US, etc.)
-            encoding: Formato del audio (OGG_OPUS para WhatsApp)
+            encoding: Formato del audio, enum o nombre (OGG_OPUS para WhatsApp)
             sample_rate_hertz: Sample rate del audio (16000 Hz para WhatsApp)
             
         Returns:
@@ -50,85 +347,302 @@ class SpeechService:
             # Validar que hay contenido
             if not audio_content or len(audio_content) == 0:
                 logger.error("Audio content vacío")
-                return {
-                    "success": False,
-                    "transcript": "",
-                    "confidence": 0.0,
-                    "error": "Audio vacío"
-                }
+                return self._error_result("Audio vacío")
             
-            # Configurar el audio
-            audio = speech.RecognitionAudio(content=audio_content)
+            encoding = _resolve_encoding(encoding)
             
-            # Configurar la transcripción
-            config = speech.RecognitionConfig(
-                encoding=encoding,
-                sample_rate_hertz=sample_rate_hertz,
-                language_code=language_code,
-                # Características avanzadas
-                enable_automatic_punctuation=True,  # Puntuación automática
-                enable_word_time_offsets=False,     # No necesitamos timestamps
-                model="default",  # Modelo por defecto
-                use_enhanced=True  # Usar modelo mejorado si está disponible
-            )
+            # Audio repetido (reenvíos, reintentos): responder desde caché
+            cache_key, cached = self._cache_lookup(audio_content, language_code, encoding, sample_rate_hertz)
+            if cached is not None:
+                return cached
+            
+            # Configurar el audio y la transcripción
+            audio = _speech().RecognitionAudio(content=audio_content)
+            config = self._build_config(language_code, encoding, sample_rate_hertz)
             
             # Realizar la transcripción
-            logger.info(f"🎤 Transcribiendo audio ({len(audio_content)} bytes, idioma: {language_code})...")
-            response = self.client.recognize(config=config, audio=audio)
+            logger.info("🎤 Transcribiendo audio (%s bytes, idioma: %s)...", len(audio_content), language_code)
+            started = STT_STAGE.start()
+            try:
+                response = self.client.recognize(config=config, audio=audio)
+            finally:
+                STT_STAGE.finish(started)
             
-            # Procesar resultados
-            if not response.results:
-                logger.warning("⚠️  No se obtuvieron resultados de la transcripción")
-                return {
-                    "success": False,
-                    "transcript": "",
-                    "confidence": 0.0,
-                    "error": "No se pudo transcribir el audio. El audio puede estar en silencio o ser ininteligible."
-                }
-            
-            # Obtener la mejor transcripción
-            result = response.results[0]
-            alternative = result.alternatives[0]
-            
-            transcript = alternative.transcript
-            confidence = alternative.confidence
-            
-            logger.info(
-                f"✅ Transcripción exitosa: '{transcript[:50]}{'...' if len(transcript) > 50 else ''}' "
-                f"(confianza: {confidence:.2%})"
+            result = self._parse_response(response, language_code)
+            self._observe(len(audio_content), result)
+            return self._cache_store(cache_key, result)
+            
+        except _google_api_error() as e:
+            logger.error("❌ Error de Google API al transcribir: %s", e)
+            return self._error_result(f"Error de API: {str(e)}")
+        except Exception as e:
+            logger.error("❌ Error inesperado al transcribir: %s", e, exc_info=True)
+            return self._error_result(f"Error: {str(e)}")
+    
+    async def atranscribe_audio(
+        self,
+        audio_content: bytes,
+        language_code: str = "es-US",
+        encoding: AudioEncoding = "OGG_OPUS",
+        sample_rate_hertz: int = 16000,
+        source_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de transcribe_audio: usa SpeechAsyncClient y no
+        bloquea el event loop. Las llamadas simultáneas se limitan a
+        max_concurrency; el resto espera turno.
+        
+        Args:
+            audio_content: Contenido del audio en bytes
+            language_code: Código de idioma (es-US, es-MX, en-US, etc.)
+            encoding: Formato del audio, enum o nombre (OGG_OPUS para WhatsApp)
+            sample_rate_hertz: Sample rate del audio (16000 Hz para WhatsApp)
+            source_id: Identificador del audio (ver cached_transcription); el
+                resultado también se guarda bajo esa clave. El llamador ya
+                consultó la caché por ``source_id``, así que un fallo por
+                contenido no se vuelve a contar
+            
+        Returns:
+            Dict con la misma forma que transcribe_audio
+        """
+        try:
+            if not audio_content:
+                logger.error("Audio content vacío")
+                return self._error_result("Audio vacío")
+            
+            encoding = _resolve_encoding(encoding)
+            cache_key, cached = await self._acache_lookup(
+                audio_content, language_code, encoding, sample_rate_hertz, record_miss=not source_id
             )
+            if cached is not None:
+                return cached
             
-            return {
-                "success": True,
-                "transcript": transcript,
-                "confidence": confidence,
-                "language": language_code
-            }
+            config = self._build_config(language_code, encoding, sample_rate_hertz)
             
-        except GoogleAPIError as e:
-            logger.error(f"❌ Error de Google API al transcribir: {e}")
-            return {
-                "success": False,
-                "transcript": "",
-                "confidence": 0.0,
-                "error": f"Error de API: {str(e)}"
-            }
+            # recognize rechaza audios de más de ~60s: partirlos en segmentos
+            duration = self._opus_duration(audio_content, encoding)
+            if duration is not None and duration > self.max_sync_seconds:
+                result = await self._atranscribe_segments(audio_content, config, language_code, duration)
+            else:
+                audio = _speech().RecognitionAudio(content=audio_content)
+                
+                async with self._slot():
+                    logger.info("🎤 Transcribiendo audio (%s bytes, idioma: %s)...", len(audio_content), language_code)
+                    started = STT_STAGE.start()
+                    try:
+                        response = await self.async_client.recognize(config=config, audio=audio)
+                    finally:
+                        STT_STAGE.finish(started)
+                result = self._parse_response(response, language_code)
+            
+            self._observe(len(audio_content), result)
+            source_key = self._source_key(source_id, language_code, encoding, sample_rate_hertz)
+            return await self._acache_store(cache_key, result, source_key)
+            
+        except _google_api_error() as e:
+            logger.error("❌ Error de Google API al transcribir: %s", e)
+            return self._error_result(f"Error de API: {str(e)}")
         except Exception as e:
-            logger.error(f"❌ Error inesperado al transcribir: {e}", exc_info=True)
-            return {
-                "success": False,
-                "transcript": "",
-                "confidence": 0.0,
-                "error": f"Error: {str(e)}"
-            }
+            logger.error("❌ Error inesperado al transcribir: %s", e, exc_info=True)
+            return self._error_result(f"Error: {str(e)}")
+    
+    @staticmethod
+    def _opus_duration(audio_content: bytes, encoding: "speech.RecognitionConfig.AudioEncoding") -> Optional[float]:
+        """Duración de un OGG/Opus leída de sus páginas, o None si no aplica"""
+        if encoding != _speech().RecognitionConfig.AudioEncoding.OGG_OPUS:
+            return None
+        try:
+            return opus_duration(audio_content)
+        except ValueError as e:
+            logger.warning("⚠️  No se pudo leer la duración del OGG/Opus: %s", e)
+            return None
+    
+    async def _atranscribe_segments(
+        self,
+        audio_content: bytes,
+        config: "speech.RecognitionConfig",
+        language_code: str,
+        duration: float
+    ) -> Dict[str, Any]:
+        """
+        Transcribe un OGG/Opus largo partiéndolo en segmentos que se reconocen
+        en paralelo (acotados por el semáforo) y se unen en orden. La confianza
+        final es el promedio de la de cada segmento ponderado por su duración.
+        """
+        # Partir en un thread: recalcular CRCs de páginas es CPU puro
+        segments = await asyncio.to_thread(split_opus, audio_content, self.segment_seconds)
+        logger.info(
+            "✂️  Audio largo (%.1fs): transcribiendo %s segmentos en paralelo",
+            duration, len(segments)
+        )
+        
+        async def recognize_segment(segment: bytes) -> Any:
+            async with self._slot():
+                # Cada segmento es una muestra de la etapa stt
+                started = STT_STAGE.start()
+                try:
+                    return await self.async_client.recognize(
+                        config=config,
+                        audio=_speech().RecognitionAudio(content=segment)
+                    )
+                finally:
+                    STT_STAGE.finish(started)
+        
+        responses = await asyncio.gather(*(recognize_segment(segment) for segment, _ in segments))
+        
+        transcripts = []
+        weighted_confidence = 0.0
+        recognized_seconds = 0.0
+        for response, (_, segment_duration) in zip(responses, segments):
+            if not response.results:
+                # Segmento en silencio
+                continue
+            text = " ".join(r.alternatives[0].transcript.strip() for r in response.results if r.alternatives)
+            confidences = [r.alternatives[0].confidence for r in response.results if r.alternatives]
+            transcripts.append(text)
+            weighted_confidence += (sum(confidences) / len(confidences)) * segment_duration
+            recognized_seconds += segment_duration
+        
+        if not transcripts:
+            logger.warning("⚠️  No se obtuvieron resultados de la transcripción")
+            return self._error_result(
+                "No se pudo transcribir el audio. El audio puede estar en silencio o ser ininteligible."
+            )
+        
+        transcript = " ".join(t for t in transcripts if t)
+        confidence = weighted_confidence / recognized_seconds if recognized_seconds else 0.0
+        
+        logger.info(
+            "✅ Transcripción por segmentos exitosa: '%.50s%s' (confianza: %.2f%%)",
+            transcript, "..." if len(transcript) > 50 else "", confidence * 100
+        )
+        
+        return {
+            "success": True,
+            "transcript": transcript,
+            "confidence": confidence,
+            "language": language_code
+        }
     
-    def transcribe_audio_async(
+    async def atranscribe_stream(
+        self,
+        audio_chunks: AsyncIterable[bytes],
+        language_code: str = "es-US",
+        encoding: AudioEncoding = "OGG_OPUS",
+        sample_rate_hertz: int = 16000,
+        source_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Transcribe audio a medida que llega usando streaming_recognize.
+        
+        Los fragmentos se envían a Speech-to-Text apenas se reciben, así el
+        reconocimiento se solapa con la descarga y el archivo completo nunca
+        está en memoria. Apto para audios de hasta ~5 minutos.
+        
+        No hace falta partir audios largos como en atranscribe_audio: el límite
+        de ~60s es de ``recognize``; ``streaming_recognize`` acepta ~5 minutos
+        por stream. Un audio más largo hace fallar el stream y el llamador
+        reintenta con la descarga completa, que sí se segmenta.
+        
+        No consulta la caché: el llamador lo hace con cached_transcription
+        antes de descargar el audio. El resultado se guarda por contenido y,
+        con ``source_id``, también bajo esa clave.
+        
+        Args:
+            audio_chunks: Iterador asíncrono con los bytes del audio
+            language_code: Código de idioma (es-US, es-MX, en-US, etc.)
+            encoding: Formato del audio, enum o nombre (OGG_OPUS para WhatsApp)
+            sample_rate_hertz: Sample rate del audio (16000 Hz para WhatsApp)
+            source_id: Identificador del audio conocido antes de descargarlo
+                (``sha256`` o ID del media en WhatsApp)
+            
+        Returns:
+            Dict con la misma forma que transcribe_audio, más ``audio_bytes``
+            
+        Raises:
+            Exception: Errores de red o de la API se propagan para que el
+                llamador pueda reintentar con transcribe_audio
+        """
+        speech = _speech()
+        encoding = _resolve_encoding(encoding)
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=self._build_config(language_code, encoding, sample_rate_hertz),
+            interim_results=False
+        )
+        total_bytes = 0
+        # El audio se hashea al pasar para que atranscribe_audio con los mismos bytes acierte
+        hasher = None
+        if self.cache is not None:
+            hasher = self.cache.hasher(language_code, encoding, sample_rate_hertz)
+        
+        async def requests() -> AsyncIterator["speech.StreamingRecognizeRequest"]:
+            nonlocal total_bytes
+            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+            async for chunk in audio_chunks:
+                total_bytes += len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                for start in range(0, len(chunk), STREAMING_CHUNK_BYTES):
+                    yield speech.StreamingRecognizeRequest(
+                        audio_content=chunk[start:start + STREAMING_CHUNK_BYTES]
+                    )
+        
+        transcripts = []
+        confidences = []
+        
+        async with self._slot():
+            logger.info("🎤 Transcribiendo audio en streaming (idioma: %s)...", language_code)
+            started = STT_STREAM_STAGE.start()
+            try:
+                responses = await self.async_client.streaming_recognize(requests=requests())
+                async for response in responses:
+                    for result in response.results:
+                        if result.is_final and result.alternatives:
+                            alternative = result.alternatives[0]
+                            transcripts.append(alternative.transcript.strip())
+                            confidences.append(alternative.confidence)
+            finally:
+                STT_STREAM_STAGE.finish(started)
+        
+        if total_bytes == 0:
+            logger.error("Audio content vacío")
+            return self._error_result("Audio vacío")
+        
+        if not transcripts:
+            logger.warning("⚠️  No se obtuvieron resultados de la transcripción")
+            audio_size_bytes.observe(total_bytes)
+            return self._error_result(
+                "No se pudo transcribir el audio. El audio puede estar en silencio o ser ininteligible."
+            )
+        
+        transcript = " ".join(t for t in transcripts if t)
+        confidence = sum(confidences) / len(confidences)
+        
+        logger.info(
+            "✅ Transcripción en streaming exitosa (%s bytes): '%.50s%s' (confianza: %.2f%%)",
+            total_bytes, transcript, "..." if len(transcript) > 50 else "", confidence * 100
+        )
+        
+        result = {
+            "success": True,
+            "transcript": transcript,
+            "confidence": confidence,
+            "language": language_code,
+            "audio_bytes": total_bytes
+        }
+        self._observe(total_bytes, result)
+        source_key = self._source_key(source_id, language_code, encoding, sample_rate_hertz)
+        return await self._acache_store(hasher.hexdigest() if hasher is not None else None, result, source_key)
+    
+    async def transcribe_audio_async(
         self,
         gcs_uri: str,
         language_code: str = "es-US"
     ) -> Dict[str, Any]:
         """
         Transcribe audio largo desde Google Cloud Storage (para audios >1 minuto).
+        La operación de larga duración se espera con polling asíncrono, sin
+        bloquear el event loop.
         
         Args:
             gcs_uri: URI del audio en GCS (gs://bucket/file.ogg)
@@ -138,6 +652,7 @@ class SpeechService:
             Dict con la transcripción y metadata
         """
         try:
+            speech = _speech()
             audio = speech.RecognitionAudio(uri=gcs_uri)
             
             config = speech.RecognitionConfig(
@@ -148,22 +663,19 @@ class SpeechService:
                 use_enhanced=True
             )
             
-            # Operación asíncrona
-            operation = self.client.long_running_recognize(
-                config=config, 
-                audio=audio
-            )
+            # Operación asíncrona (el semáforo solo cubre el lanzamiento;
+            # el polling no ocupa cupo de concurrencia)
+            async with self._slot():
+                operation = await self.async_client.long_running_recognize(
+                    config=config, 
+                    audio=audio
+                )
             
-            logger.info(f"⏳ Esperando transcripción asíncrona de {gcs_uri}...")
-            response = operation.result(timeout=300)  # 5 min timeout
+            logger.info("⏳ Esperando transcripción asíncrona de %s...", gcs_uri)
+            response = await operation.result(timeout=300)  # 5 min timeout
             
             if not response.results:
-                return {
-                    "success": False,
-                    "transcript": "",
-                    "confidence": 0.0,
-                    "error": "No se pudo transcribir el audio largo"
-                }
+                return self._error_result("No se pudo transcribir el audio largo")
             
             # Combinar todos los resultados
             transcript = " ".join([
@@ -178,7 +690,7 @@ class SpeechService:
             ]
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
             
-            logger.info(f"✅ Transcripción asíncrona completada (confianza: {avg_confidence:.2%})")
+            logger.info("✅ Transcripción asíncrona completada (confianza: %.2f%%)", avg_confidence * 100)
             
             return {
                 "success": True,
@@ -188,14 +700,14 @@ class SpeechService:
             }
             
         except Exception as e:
-            logger.error(f"❌ Error en transcripción asíncrona: {e}", exc_info=True)
-            return {
-                "success": False,
-                "transcript": "",
-                "confidence": 0.0,
-                "error": str(e)
-            }
+            logger.error("❌ Error en transcripción asíncrona: %s", e, exc_info=True)
+            return self._error_result(str(e))
 
 
 # Instancia global del servicio
-speech_service = SpeechService()
+speech_service = SpeechService(
+    max_concurrency=int(os.getenv("SPEECH_MAX_CONCURRENCY", "10")),
+    cache=create_transcription_cache(),
+    max_sync_seconds=float(os.getenv("SPEECH_MAX_SYNC_SECONDS", "55")),
+    segment_seconds=float(os.getenv("SPEECH_SEGMENT_SECONDS", "50"))
+)
@@ -0,0 +1,113 @@
+"""Utilidades para decodificar y emitir Server-Sent Events (SSE)"""
+
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_sse_events(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Decodifica eventos SSE de forma incremental a medida que llegan las líneas.
+
+    Cada evento termina con una línea vacía y su payload viene en una o más
+    líneas ``data:``. Si el upstream responde con JSON delimitado por saltos de
+    línea (sin prefijo ``data:``) cada línea se trata como un evento completo.
+
+    Args:
+        lines: Iterador asíncrono de líneas (por ejemplo ``response.aiter_lines()``)
+
+    Yields:
+        Cada evento decodificado como dict
+    """
+    data_lines = []
+
+    async for line in lines:
+        line = line.rstrip("\r")
+
+        if not line:
+            # Línea vacía: fin del evento actual
+            if data_lines:
+                event = _decode_event("\n".join(data_lines))
+                data_lines = []
+                if event is not None:
+                    yield event
+            continue
+
+        if line.startswith(":"):
+            # Comentario / keep-alive
+            continue
+
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+        elif line.startswith(("event:", "id:", "retry:")):
+            continue
+        else:
+            # JSON delimitado por líneas
+            event = _decode_event(line)
+            if event is not None:
+                yield event
+
+    # Evento final sin línea vacía de cierre
+    if data_lines:
+        event = _decode_event("\n".join(data_lines))
+        if event is not None:
+            yield event
+
+
+def _decode_event(data: str) -> Optional[Dict[str, Any]]:
+    """Decodifica el payload JSON de un evento, ignorando basura"""
+    try:
+        event = orjson.loads(data)
+    except ValueError:
+        logger.warning("⚠️  Evento SSE no es JSON válido: %.100s", data)
+        return None
+    return event if isinstance(event, dict) else {"data": event}
+
+
+def extract_text(event: Dict[str, Any]) -> str:
+    """
+    Extrae el texto de las partes de contenido de un evento del agente.
+
+    Los eventos sin texto (llamadas a herramientas, metadata) devuelven "".
+    """
+    parts = (event.get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts if isinstance(part, dict))
+
+
+async def iter_text_deltas(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """
+    Convierte eventos del agente en fragmentos de texto nuevos.
+
+    En modo streaming el agente emite eventos ``partial`` con cada fragmento y
+    luego un evento final con el texto completo. Ese evento agregado se omite
+    para no entregar el mismo texto dos veces.
+    """
+    saw_partial = False
+    async for event in events:
+        text = extract_text(event)
+        if event.get("partial"):
+            saw_partial = True
+        elif saw_partial:
+            # Evento agregado que repite los parciales anteriores
+            saw_partial = False
+            continue
+        if text:
+            yield text
+
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """
+    Serializa un evento en formato SSE para enviarlo al cliente.
+
+    Args:
+        data: Payload del evento (se serializa como JSON)
+        event: Nombre opcional del evento
+
+    Returns:
+        Texto del evento terminado en línea vacía
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {orjson.dumps(data).decode()}\n\n"
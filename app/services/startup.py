@@ -0,0 +1,88 @@
+"""Tiempos de arranque (import y lifespan) para seguir el cold start"""
+
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def process_uptime() -> Optional[float]:
+    """
+    Segundos desde que arrancó el proceso, leídos de /proc (Linux, como en
+    Cloud Run). Incluyen el arranque del intérprete y de uvicorn. None si
+    /proc no está disponible.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # El nombre del proceso (campo 2) puede tener espacios: cortar en el último ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        # starttime es el campo 22, en ticks desde el arranque del sistema
+        return max(system_uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """
+    Registra cuándo terminó el import de la app, cuánto tardó cada fase del
+    lifespan, cuándo terminó el lifespan y cuándo terminó el calentamiento
+    de upstreams (desde ahí /readyz responde 200 y recibe tráfico).
+    """
+
+    def __init__(self):
+        self.imported_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.warm_at: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+
+    def mark_imported(self) -> None:
+        """Llamar al final del módulo de la app, con todo ya importado"""
+        self.imported_at = process_uptime()
+
+    @asynccontextmanager
+    async def phase(self, name: str) -> AsyncIterator[None]:
+        """Mide una fase del lifespan"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 4)
+
+    def mark_ready(self) -> None:
+        """Llamar al terminar el arranque del lifespan"""
+        self.ready_at = process_uptime()
+        logger.info(
+            "🚀 Arranque listo: proceso %s, import %s, lifespan %.3fs %s",
+            f"{self.ready_at:.2f}s" if self.ready_at is not None else "n/d",
+            f"{self.imported_at:.2f}s" if self.imported_at is not None else "n/d",
+            sum(self.phases.values()),
+            self.phases
+        )
+
+    def mark_warm(self) -> None:
+        """Llamar al terminar el calentamiento de upstreams"""
+        self.warm_at = process_uptime()
+
+    @property
+    def ready_seconds(self) -> Optional[float]:
+        """Segundos desde el arranque del proceso hasta recibir tráfico (fin del calentamiento)"""
+        return self.warm_at
+
+    def stats(self) -> Dict[str, Any]:
+        """Reporte de arranque"""
+        return {
+            "process_to_imported_seconds": round(self.imported_at, 3) if self.imported_at is not None else None,
+            "process_to_ready_seconds": round(self.ready_at, 3) if self.ready_at is not None else None,
+            "process_to_warm_seconds": round(self.warm_at, 3) if self.warm_at is not None else None,
+            "lifespan_phases_seconds": dict(self.phases),
+            "lifespan_seconds": round(sum(self.phases.values()), 4)
+        }
+
+
+# Instancia global del proceso
+startup_timer = StartupTimer()
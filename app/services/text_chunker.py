@@ -0,0 +1,92 @@
+"""Corte incremental de texto en fragmentos por oración o párrafo"""
+
+import re
+from typing import List
+
+# Fin de párrafo (línea en blanco) o fin de oración seguido de espacio.
+# Se exige el espacio para no cortar números como "3.5" ni oraciones que
+# todavía no terminaron de llegar.
+_BOUNDARY_RE = re.compile(r"\n[ \t]*\n\s*|[.!?…]+[\"'»)\]]*\s+")
+
+# Límite de caracteres del body de un mensaje de texto de WhatsApp
+WHATSAPP_MAX_BODY_LENGTH = 4096
+
+
+class SentenceChunker:
+    """
+    Acumula texto que llega por partes y entrega fragmentos completos.
+
+    Un fragmento se entrega en el primer límite de oración o párrafo una vez
+    alcanzado ``min_length`` caracteres. Ningún fragmento supera ``max_length``:
+    si no hay límite natural se corta en el último espacio disponible.
+    """
+
+    def __init__(self, max_length: int = WHATSAPP_MAX_BODY_LENGTH, min_length: int = 80):
+        """
+        Args:
+            max_length: Largo máximo de cada fragmento
+            min_length: Largo mínimo antes de cortar en un límite natural
+        """
+        if max_length <= 0:
+            raise ValueError("max_length debe ser positivo")
+        self.max_length = max_length
+        self.min_length = min(min_length, max_length)
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Agrega texto y devuelve los fragmentos que quedaron completos.
+
+        Args:
+            text: Nuevo texto recibido
+
+        Returns:
+            Fragmentos listos para enviar, en orden
+        """
+        self._buffer += text
+        chunks = []
+
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Devuelve el texto pendiente (partido si excede max_length)"""
+        chunks = []
+        while len(self._buffer) > self.max_length:
+            cut = self._hard_cut()
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+
+        rest = self._buffer.strip()
+        self._buffer = ""
+        if rest:
+            chunks.append(rest)
+        return chunks
+
+    def _find_cut(self):
+        """Posición donde cortar el buffer, o None si hay que esperar más texto"""
+        for match in _BOUNDARY_RE.finditer(self._buffer):
+            end = match.end()
+            if end > self.max_length:
+                break
+            if end >= self.min_length:
+                return end
+
+        if len(self._buffer) > self.max_length:
+            return self._hard_cut()
+        return None
+
+    def _hard_cut(self) -> int:
+        """Corte forzado en el último espacio dentro de max_length"""
+        space = self._buffer.rfind(" ", 0, self.max_length)
+        return space + 1 if space > 0 else self.max_length
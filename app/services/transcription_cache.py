@@ -0,0 +1,228 @@
+"""Caché de transcripciones direccionada por contenido del audio"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes aproximados por entrada además del JSON del resultado
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class TranscriptionCache:
+    """
+    Guarda transcripciones exitosas por hash del audio y sus parámetros.
+
+    Un audio reenviado o un reintento del cliente trae los mismos bytes, así
+    que se responde sin volver a llamar a Speech-to-Text. La memoria se
+    limita por bytes con desalojo LRU; cada entrada expira a los ``ttl``
+    segundos. Con ``persist_dir`` las entradas también se escriben a disco
+    y sobreviven reinicios de la instancia.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 86400.0, persist_dir: Optional[str] = None):
+        """
+        Args:
+            max_bytes: Memoria aproximada máxima de las entradas
+            ttl: Segundos de validez de cada transcripción
+            persist_dir: Directorio para persistir entradas (None desactiva disco)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist_dir = persist_dir
+        # key -> (expira_en epoch, tamaño, resultado)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evicted = 0
+
+    @staticmethod
+    def hasher(language_code: str, encoding: int, sample_rate_hertz: int) -> "hashlib.blake2b":
+        """
+        Hash incremental para audio que llega por fragmentos.
+        Los parámetros de reconocimiento forman parte de la clave.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{language_code}|{int(encoding)}|{sample_rate_hertz}|".encode())
+        return h
+
+    @classmethod
+    def key(cls, audio_content: bytes, language_code: str, encoding: int, sample_rate_hertz: int) -> str:
+        """Clave de caché para un audio completo"""
+        h = cls.hasher(language_code, encoding, sample_rate_hertz)
+        h.update(audio_content)
+        return h.hexdigest()
+
+    @classmethod
+    def source_key(cls, source_id: str, language_code: str, encoding: int, sample_rate_hertz: int) -> str:
+        """
+        Clave de caché para un audio identificado antes de descargarlo (por
+        ejemplo el ``sha256`` que WhatsApp manda en el webhook), para poder
+        consultar la caché sin tener los bytes
+        """
+        h = cls.hasher(language_code, encoding, sample_rate_hertz)
+        h.update(b"source|")
+        h.update(source_id.encode())
+        return h.hexdigest()
+
+    def get(self, key: str, record_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Resultado cacheado para ``key`` o None. Lee de disco de forma
+        bloqueante: desde el event loop usar aget().
+
+        Args:
+            key: Clave del audio
+            record_miss: Contar el fallo; False en la segunda consulta de una
+                misma transcripción, que ya contó el suyo
+        """
+        now = time.time()
+        result = self._get_memory(key, now)
+        if result is None and self.persist_dir:
+            result = self._load(key, self._read_disk(key, now))
+        return self._count(result, record_miss)
+
+    async def aget(self, key: str, record_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """Como get(), con la lectura de disco en un thread para no bloquear el event loop"""
+        now = time.time()
+        result = self._get_memory(key, now)
+        if result is None and self.persist_dir:
+            result = self._load(key, await asyncio.to_thread(self._read_disk, key, now))
+        return self._count(result, record_miss)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Guarda un resultado exitoso. Escribe a disco de forma bloqueante: desde el event loop usar aput()"""
+        entry = self._store(key, result)
+        if entry is not None and self.persist_dir:
+            self._write_disk(key, *entry)
+
+    async def aput(self, key: str, result: Dict[str, Any]) -> None:
+        """Como put(), con la escritura a disco en un thread para no bloquear el event loop"""
+        entry = self._store(key, result)
+        if entry is not None and self.persist_dir:
+            await asyncio.to_thread(self._write_disk, key, *entry)
+
+    def _get_memory(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, result = entry
+        if expires_at <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _load(self, key: str, stored: Optional[Tuple[float, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Sube a memoria una entrada leída de disco"""
+        if stored is None:
+            return None
+        expires_at, result = stored
+        self._insert(key, result, expires_at)
+        self.disk_hits += 1
+        return result
+
+    def _count(self, result: Optional[Dict[str, Any]], record_miss: bool) -> Optional[Dict[str, Any]]:
+        if result is not None:
+            self.hits += 1
+        elif record_miss:
+            self.misses += 1
+        return result
+
+    def _store(self, key: str, result: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Guarda en memoria; devuelve (resultado, vencimiento) para persistir o None si no se cachea"""
+        if not result.get("success"):
+            return None
+
+        stored = {k: result[k] for k in ("success", "transcript", "confidence", "language") if k in result}
+        expires_at = time.time() + self.ttl
+        self._insert(key, stored, expires_at)
+        return stored, expires_at
+
+    def _insert(self, key: str, result: Dict[str, Any], expires_at: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = len(json.dumps(result, ensure_ascii=False).encode()) + _ENTRY_OVERHEAD_BYTES
+        self._entries[key] = (expires_at, size, result)
+        self._bytes += size
+
+        while self._entries and self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evicted += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  Entrada de caché ilegible %s: %s", path, e)
+            return None
+
+        if stored.get("expires_at", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored["expires_at"], stored["result"]
+
+    def _write_disk(self, key: str, result: Dict[str, Any], expires_at: float) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "result": result}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("⚠️  No se pudo persistir la transcripción en %s: %s", path, e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y ocupación de la caché"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "persist_dir": self.persist_dir,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted
+        }
+
+
+def create_transcription_cache() -> Optional[TranscriptionCache]:
+    """Construye la caché según SPEECH_CACHE_* (None si está desactivada)"""
+    if os.getenv("SPEECH_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return TranscriptionCache(
+        max_bytes=int(os.getenv("SPEECH_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+        ttl=float(os.getenv("SPEECH_CACHE_TTL", "86400")),
+        persist_dir=os.getenv("SPEECH_CACHE_DIR") or None
+    )
@@ -0,0 +1,144 @@
+"""Calentamiento de upstreams al arrancar: token, conexiones y canales listos antes de recibir tráfico"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUpStep:
+    """Paso de calentamiento y su resultado"""
+
+    def __init__(self, name: str, fn: Callable[[], Awaitable[Any]], after: Optional[str] = None):
+        self.name = name
+        self.fn = fn
+        self.after = after
+        # pending | running | ok | failed | timeout | skipped
+        self.status = "pending"
+        self.seconds: Optional[float] = None
+        self.detail: Optional[str] = None
+
+
+class WarmUp:
+    """
+    Ejecuta en background los pasos de calentamiento de cada upstream.
+
+    Los pasos corren en paralelo salvo los que declaran ``after`` (por
+    ejemplo la llamada a Vertex espera al token). Cada paso tiene
+    ``timeout`` segundos. El calentamiento es best effort: un upstream caído
+    no deja la instancia sin arrancar. ``ready`` pasa a True cuando todos
+    los pasos terminaron, sea cual sea su resultado.
+    """
+
+    def __init__(self, enabled_steps: Optional[List[str]] = None, timeout: float = 10.0):
+        """
+        Args:
+            enabled_steps: Pasos opcionales habilitados (None: todos)
+            timeout: Segundos máximos por paso
+        """
+        self.enabled_steps = enabled_steps
+        self.timeout = timeout
+        self.steps: Dict[str, WarmUpStep] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.ready = False
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[Any]],
+        after: Optional[str] = None,
+        required: bool = False
+    ) -> None:
+        """
+        Registra un paso.
+
+        Args:
+            name: Nombre del paso (el que se usa en WARMUP_UPSTREAMS)
+            fn: Corrutina sin argumentos; su valor de retorno se reporta como detalle
+            after: Paso que debe terminar antes de empezar este
+            required: Corre siempre, aunque no esté en ``enabled_steps``
+        """
+        step = WarmUpStep(name, fn, after)
+        if not required and self.enabled_steps is not None and name not in self.enabled_steps:
+            step.status = "skipped"
+        self.steps[name] = step
+
+    def start(self, on_ready: Optional[Callable[[], None]] = None) -> None:
+        """Lanza el calentamiento en una tarea de fondo"""
+        if self._task is not None:
+            return
+        self._done = {name: asyncio.Event() for name in self.steps}
+        self._started_at = time.perf_counter()
+        self._task = asyncio.create_task(self._run(on_ready), name="warmup")
+
+    async def stop(self) -> None:
+        """Cancela el calentamiento si sigue en curso"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self, on_ready: Optional[Callable[[], None]]) -> None:
+        await asyncio.gather(*(self._run_step(step) for step in self.steps.values()))
+        self.seconds = round(time.perf_counter() - self._started_at, 4)
+        self.ready = True
+        failed = [step.name for step in self.steps.values() if step.status in ("failed", "timeout")]
+        if failed:
+            logger.warning("⚠️  Calentamiento terminado en %.2fs con fallas en: %s", self.seconds, ", ".join(failed))
+        else:
+            logger.info("🔥 Calentamiento terminado en %.2fs", self.seconds)
+        if on_ready is not None:
+            on_ready()
+
+    async def _run_step(self, step: WarmUpStep) -> None:
+        try:
+            if step.status == "skipped":
+                return
+            if step.after is not None and step.after in self._done:
+                await self._done[step.after].wait()
+
+            step.status = "running"
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(step.fn(), self.timeout)
+                step.status = "ok"
+                step.detail = str(result) if result is not None else None
+            except asyncio.TimeoutError:
+                step.status = "timeout"
+            except Exception as e:
+                step.status = "failed"
+                step.detail = str(e)
+                logger.warning("⚠️  Calentamiento de '%s' falló: %s", step.name, e)
+            step.seconds = round(time.perf_counter() - started, 4)
+        finally:
+            self._done[step.name].set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado de cada paso"""
+        return {
+            "ready": self.ready,
+            "seconds": self.seconds,
+            "steps": {
+                name: {"status": step.status, "seconds": step.seconds, "detail": step.detail}
+                for name, step in self.steps.items()
+            }
+        }
+
+
+def warmup_config() -> Dict[str, Any]:
+    """Configuración de WarmUp desde variables de entorno"""
+    if os.getenv("WARMUP_ENABLED", "true").lower() != "true":
+        # Solo corren los pasos obligatorios (credenciales)
+        return {"enabled_steps": [], "timeout": float(os.getenv("WARMUP_TIMEOUT", "10"))}
+    upstreams = os.getenv("WARMUP_UPSTREAMS", "vertex,graph,speech")
+    return {
+        "enabled_steps": [name.strip() for name in upstreams.split(",") if name.strip()],
+        "timeout": float(os.getenv("WARMUP_TIMEOUT", "10"))
+    }
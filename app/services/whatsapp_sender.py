@@ -0,0 +1,239 @@
+"""Envío de mensajes salientes de WhatsApp: rate limiting, reintentos y orden por destinatario"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.services.http_client import HTTPClientPool, http_client_pool
+
+logger = logging.getLogger(__name__)
+
+# Errores de la Graph API que vale la pena reintentar
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """
+    Token bucket asíncrono: ``rate`` permisos por segundo con ráfagas de hasta ``burst``.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: Permisos repuestos por segundo
+            burst: Capacidad máxima del bucket
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Espera hasta obtener un permiso.
+
+        Returns:
+            Segundos esperados
+        """
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class WhatsAppSender:
+    """
+    Entrega mensajes por la Graph API de WhatsApp.
+
+    - Un token bucket por ``phone_number_id`` respeta el throughput de Meta.
+    - Los errores 429/5xx y de red se reintentan con backoff exponencial con
+      jitter completo, respetando ``Retry-After`` si viene.
+    - No ordena por destinatario: los envíos a un número salen del carril de
+      ese número en la cola de WhatsApp, que ya los serializa.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        phone_number_id: Optional[str],
+        http_pool: HTTPClientPool = http_client_pool,
+        api_base_url: str = "https://graph.facebook.com/v18.0",
+        rate: float = 80.0,
+        burst: float = 80.0,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        timeout: float = 10.0
+    ):
+        """
+        Args:
+            token: Token de acceso de WhatsApp Business
+            phone_number_id: Número emisor por defecto
+            http_pool: Pool del cliente HTTP compartido
+            api_base_url: URL base de la Graph API
+            rate: Mensajes por segundo permitidos por número emisor
+            burst: Ráfaga máxima por número emisor
+            max_retries: Reintentos ante errores transitorios
+            base_backoff: Backoff base en segundos
+            max_backoff: Backoff máximo en segundos
+            timeout: Timeout por intento en segundos
+        """
+        self.token = token
+        self.phone_number_id = phone_number_id
+        self.http_pool = http_pool
+        self.api_base_url = api_base_url
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self._buckets: Dict[str, TokenBucket] = {}
+
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.failures_by_status: Dict[str, int] = {}
+
+    def _bucket(self, phone_number_id: str) -> TokenBucket:
+        bucket = self._buckets.get(phone_number_id)
+        if bucket is None:
+            bucket = self._buckets[phone_number_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def send_text(self, to: str, body: str, phone_number_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Envía un mensaje de texto y espera la confirmación de la Graph API.
+
+        Args:
+            to: Número del destinatario
+            body: Texto del mensaje
+            phone_number_id: Número emisor (default: el configurado)
+
+        Returns:
+            Respuesta JSON de la Graph API
+
+        Raises:
+            httpx.HTTPError: Si el envío falla tras agotar los reintentos
+        """
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {
+                "body": body
+            }
+        }
+        return await self._deliver(payload, phone_number_id or self.phone_number_id)
+
+    async def _deliver(self, payload: Dict[str, Any], phone_number_id: str) -> Dict[str, Any]:
+        url = f"{self.api_base_url}/{phone_number_id}/messages"
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+        bucket = self._bucket(phone_number_id)
+        started = time.monotonic()
+
+        for attempt in range(self.max_retries + 1):
+            self.throttled_seconds += await bucket.acquire()
+            retry_after = None
+
+            try:
+                response = await self.http_pool.client.post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                if response.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                    response.raise_for_status()
+                    self._record_success(started)
+                    return response.json()
+                status = str(response.status_code)
+                retry_after = self._retry_after(response)
+            except httpx.HTTPStatusError as e:
+                self._record_failure(str(e.response.status_code))
+                raise
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    self._record_failure(type(e).__name__)
+                    raise
+                status = type(e).__name__
+
+            self.retries += 1
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            logger.warning(
+                "⚠️  Envío de WhatsApp falló (%s), reintento %s/%s en %.2fs",
+                status, attempt + 1, self.max_retries, delay
+            )
+            await asyncio.sleep(delay)
+
+        raise RuntimeError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return min(float(value), self.max_backoff) if value is not None else None
+        except ValueError:
+            return None
+
+    def _record_success(self, started: float) -> None:
+        latency = time.monotonic() - started
+        self.sent += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def _record_failure(self, status: str) -> None:
+        self.failed += 1
+        self.failures_by_status[status] = self.failures_by_status.get(status, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de entrega"""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "failures_by_status": dict(self.failures_by_status),
+            "avg_latency_seconds": round(self.latency_sum / self.sent, 4) if self.sent else 0.0,
+            "max_latency_seconds": round(self.latency_max, 4),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "rate_per_second": self.rate,
+            "burst": self.burst
+        }
+
+
+# Instancia global del sender
+whatsapp_sender = WhatsAppSender(
+    token=os.getenv("WHATSAPP_TOKEN"),
+    phone_number_id=os.getenv("WHATSAPP_PHONE_NUMBER_ID"),
+    api_base_url=os.getenv("GRAPH_API_BASE_URL", "https://graph.facebook.com/v18.0"),
+    rate=float(os.getenv("WHATSAPP_SEND_RATE", "80")),
+    burst=float(os.getenv("WHATSAPP_SEND_BURST", "80")),
+    max_retries=int(os.getenv("WHATSAPP_SEND_MAX_RETRIES", "4")),
+    base_backoff=float(os.getenv("WHATSAPP_SEND_BACKOFF", "0.5")),
+    max_backoff=float(os.getenv("WHATSAPP_SEND_MAX_BACKOFF", "8"))
+)
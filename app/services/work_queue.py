@@ -0,0 +1,245 @@
+"""Cola de trabajo acotada con workers asyncio y carriles seriales por clave"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Políticas cuando la cola está llena
+OVERFLOW_REJECT = "reject"            # Rechazar el trabajo nuevo
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # Descartar el trabajo más antiguo
+OVERFLOW_BLOCK = "block"              # Esperar espacio hasta block_timeout, luego rechazar
+OVERFLOW_POLICIES = (OVERFLOW_REJECT, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK)
+
+
+class LaneWorkQueue:
+    """
+    Cola de trabajo con un pool fijo de workers y un carril serial por clave.
+
+    Los trabajos de una misma clave (por ejemplo, un número de WhatsApp) se
+    procesan uno a la vez y en orden de llegada; trabajos de claves distintas
+    se procesan en paralelo hasta el número de workers. Después de cada
+    trabajo el carril vuelve al final de la fila, así un usuario con muchos
+    mensajes no acapara un worker.
+
+    Es el único mecanismo de orden por clave: lo que el handler hace para
+    una clave (incluidos los envíos) no necesita locks propios.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int = 8,
+        max_size: int = 1000,
+        overflow_policy: str = OVERFLOW_REJECT,
+        block_timeout: float = 2.0,
+        name: str = "work-queue",
+        on_drop: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        """
+        Args:
+            handler: Corrutina que procesa un trabajo
+            workers: Número de workers concurrentes
+            max_size: Máximo de trabajos pendientes (sin contar los en curso)
+            overflow_policy: Qué hacer con la cola llena (reject, drop_oldest, block)
+            block_timeout: Segundos de espera con la política block
+            name: Nombre para logs y métricas
+            on_drop: Se llama con (clave, trabajo) por cada trabajo descartado
+                con la política drop_oldest, para deshacer lo registrado al encolarlo
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy inválida: {overflow_policy}")
+
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.name = name
+        self.on_drop = on_drop
+
+        self._lanes: Dict[Hashable, Deque[Tuple[float, Any]]] = {}
+        self._scheduled: Set[Hashable] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._not_full: Optional[asyncio.Condition] = None
+        self._tasks = []
+        self._size = 0
+        self._in_flight = 0
+
+        # Contadores
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        """Lanza los workers (idempotente)"""
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._not_full = asyncio.Condition()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(
+            "✅ Cola '%s' iniciada (%s workers, max_size=%s, overflow=%s)",
+            self.name, self.workers, self.max_size, self.overflow_policy
+        )
+
+    async def stop(self, drain_timeout: float = 8.0) -> None:
+        """
+        Espera a que se vacíe la cola (hasta drain_timeout) y detiene los workers.
+        """
+        if not self._tasks:
+            return
+
+        deadline = time.monotonic() + drain_timeout
+        while (self._size or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if self._size or self._in_flight:
+            logger.warning(
+                "⚠️  Cola '%s' detenida con %s pendientes y %s en curso",
+                self.name, self._size, self._in_flight
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, key: Hashable, item: Any) -> bool:
+        """
+        Encola un trabajo en el carril de ``key``.
+
+        Returns:
+            True si se aceptó, False si se rechazó por la política de overflow
+        """
+        if self._ready is None:
+            raise RuntimeError(f"Cola '{self.name}' no iniciada: falta ejecutar start()")
+
+        if self._size >= self.max_size and not await self._make_room():
+            self.rejected += 1
+            logger.warning("⚠️  Cola '%s' llena (%s), trabajo rechazado", self.name, self._size)
+            return False
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+        lane.append((time.monotonic(), item))
+        self._size += 1
+        self.submitted += 1
+
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return True
+
+    async def _make_room(self) -> bool:
+        """Aplica la política de overflow; True si quedó espacio"""
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            key = self._oldest_lane()
+            if key is None:
+                return False
+            _, item = self._lanes[key].popleft()
+            self._size -= 1
+            self.dropped += 1
+            logger.warning("⚠️  Cola '%s' llena, descartado el trabajo más antiguo de %s", self.name, key)
+            if self.on_drop is not None:
+                try:
+                    self.on_drop(key, item)
+                except Exception as e:
+                    logger.error("❌ Error en on_drop de '%s' para %s: %s", self.name, key, e, exc_info=True)
+            return True
+
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            async with self._not_full:
+                try:
+                    await asyncio.wait_for(
+                        self._not_full.wait_for(lambda: self._size < self.max_size),
+                        timeout=self.block_timeout
+                    )
+                    return True
+                except asyncio.TimeoutError:
+                    return False
+
+        return False
+
+    def _oldest_lane(self) -> Optional[Hashable]:
+        """Clave del carril cuyo primer trabajo es el más antiguo"""
+        oldest_key = None
+        oldest_at = None
+        for key, lane in self._lanes.items():
+            if lane and (oldest_at is None or lane[0][0] < oldest_at):
+                oldest_key, oldest_at = key, lane[0][0]
+        return oldest_key
+
+    async def _worker(self) -> None:
+        """Procesa un trabajo por turno y devuelve el carril a la fila"""
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes.get(key)
+
+            if not lane:
+                self._lanes.pop(key, None)
+                self._scheduled.discard(key)
+                continue
+
+            _, item = lane.popleft()
+            self._size -= 1
+            self._in_flight += 1
+            async with self._not_full:
+                self._not_full.notify()
+
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error("❌ Error procesando trabajo de %s en '%s': %s", key, self.name, e, exc_info=True)
+            finally:
+                self._in_flight -= 1
+
+            if lane:
+                # Quedan trabajos de la misma clave: vuelve al final de la fila
+                self._ready.put_nowait(key)
+            else:
+                del self._lanes[key]
+                self._scheduled.discard(key)
+
+    @property
+    def depth(self) -> int:
+        """Trabajos pendientes (sin contar los en curso)"""
+        return self._size
+
+    def oldest_age(self) -> float:
+        """Segundos que lleva esperando el trabajo pendiente más antiguo"""
+        key = self._oldest_lane()
+        if key is None:
+            return 0.0
+        return time.monotonic() - self._lanes[key][0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado actual de la cola"""
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "overflow_policy": self.overflow_policy,
+            "depth": self._size,
+            "oldest_age_seconds": round(self.oldest_age(), 3),
+            "in_flight": self._in_flight,
+            "active_lanes": len(self._lanes),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dropped": self.dropped
+        }
@@ -0,0 +1 @@
+"""Benchmark local del BFF contra dobles del Reasoning Engine, la Graph API y Speech-to-Text"""
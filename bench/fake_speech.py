@@ -0,0 +1,58 @@
+"""
+Dobles de los clientes de Speech-to-Text (síncrono y asíncrono).
+
+Responden con la forma de ``RecognizeResponse`` / ``StreamingRecognizeResponse``
+que lee SpeechService, tras ``FAKE_STT_LATENCY`` segundos. El reconocimiento
+en streaming consume todo el audio antes de responder, así la descarga
+sigue marcando el ritmo como con el servicio real.
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterable, AsyncIterator
+
+STT_LATENCY = float(os.getenv("FAKE_STT_LATENCY", "0.3"))
+STT_CONFIDENCE = float(os.getenv("FAKE_STT_CONFIDENCE", "0.92"))
+
+
+def _response() -> SimpleNamespace:
+    alternative = SimpleNamespace(transcript="hola quiero saber el estado de mi pedido", confidence=STT_CONFIDENCE)
+    return SimpleNamespace(results=[SimpleNamespace(is_final=True, alternatives=[alternative])])
+
+
+class FakeSpeechClient:
+    """Reemplazo de ``speech_v1.SpeechClient``"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        pass
+
+    def recognize(self, config: Any = None, audio: Any = None) -> SimpleNamespace:
+        time.sleep(STT_LATENCY)
+        return _response()
+
+
+class _FakeChannel:
+    async def channel_ready(self) -> None:
+        return None
+
+
+class FakeSpeechAsyncClient:
+    """Reemplazo de ``speech_v1.SpeechAsyncClient``"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.transport = SimpleNamespace(grpc_channel=_FakeChannel())
+
+    async def recognize(self, config: Any = None, audio: Any = None) -> SimpleNamespace:
+        await asyncio.sleep(STT_LATENCY)
+        return _response()
+
+    async def streaming_recognize(self, requests: AsyncIterable[Any]) -> AsyncIterator[SimpleNamespace]:
+        async def responses() -> AsyncIterator[SimpleNamespace]:
+            async for _ in requests:
+                pass
+            await asyncio.sleep(STT_LATENCY)
+            yield _response()
+
+        return responses()
@@ -0,0 +1,145 @@
+"""
+Dobles HTTP de los upstreams del BFF para el benchmark.
+
+- Reasoning Engine: ``:query`` (creación de sesiones) y ``:streamQuery``
+  (con y sin ``?alt=sse``), con latencia hasta el primer token y un ritmo
+  configurable de tokens.
+- Graph API de WhatsApp: lookup de media, descarga del audio y envío de
+  mensajes.
+
+Se configura con variables de entorno (ver ``FAKE_*`` abajo) y se levanta
+con uvicorn: ``uvicorn bench.fake_upstreams:app``.
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Segundos hasta el primer token del engine
+ENGINE_LATENCY = float(os.getenv("FAKE_ENGINE_LATENCY", "0.2"))
+# Tokens por respuesta y segundos entre tokens
+ENGINE_TOKENS = int(os.getenv("FAKE_ENGINE_TOKENS", "20"))
+ENGINE_TOKEN_INTERVAL = float(os.getenv("FAKE_ENGINE_TOKEN_INTERVAL", "0.01"))
+# Segundos que tarda crear una sesión
+SESSION_LATENCY = float(os.getenv("FAKE_SESSION_LATENCY", "0.1"))
+# Latencia de cada llamada a la Graph API
+GRAPH_LATENCY = float(os.getenv("FAKE_GRAPH_LATENCY", "0.05"))
+# Tamaño de los audios descargados
+AUDIO_BYTES = int(os.getenv("FAKE_AUDIO_BYTES", str(64 * 1024)))
+
+# Base de cada audio; el sufijo con el media_id lo hace único (sin aciertos de caché)
+_AUDIO_BASE = os.urandom(AUDIO_BYTES)
+_AUDIO_CHUNK_BYTES = 16 * 1024
+
+app = FastAPI(title="Fake upstreams")
+
+# Contadores leídos por el runner en /_stats
+stats: Dict[str, Any] = {
+    "sessions_created": 0,
+    "engine_queries": 0,
+    "media_lookups": 0,
+    "media_downloads": 0,
+    "messages_sent": 0,
+    # Mensajes con texto del engine (no fallbacks del BFF)
+    "agent_replies": 0
+}
+
+
+async def _paced_json(prefix: str, suffix: str) -> AsyncIterator[bytes]:
+    """
+    Un único objeto JSON (una línea) emitido de a un token: el BFF lo puede
+    leer con ``response.json()`` o como stream línea por línea, y el tiempo
+    total respeta el ritmo de generación.
+    """
+    await asyncio.sleep(ENGINE_LATENCY)
+    yield prefix.encode()
+    for i in range(ENGINE_TOKENS):
+        yield f"token{i} ".encode()
+        if ENGINE_TOKEN_INTERVAL:
+            await asyncio.sleep(ENGINE_TOKEN_INTERVAL)
+    yield (suffix + "\n").encode()
+
+
+@app.post("/v1/{resource:path}")
+async def reasoning_engine(resource: str, request: Request):
+    """``.../reasoningEngines/{id}:query`` y ``.../reasoningEngines/{id}:streamQuery``"""
+    payload = await request.json()
+    method = resource.rsplit(":", 1)[-1]
+
+    if method == "query":
+        stats["sessions_created"] += 1
+        await asyncio.sleep(SESSION_LATENCY)
+        user_id = payload.get("input", {}).get("user_id")
+        return {"output": {"id": uuid.uuid4().hex, "user_id": user_id}}
+
+    if method == "streamQuery":
+        stats["engine_queries"] += 1
+        if request.query_params.get("alt") == "sse":
+            # Evento del agente con el texto en content.parts
+            stream = _paced_json('{"content": {"role": "model", "parts": [{"text": "', '"}]}}')
+        else:
+            stream = _paced_json('{"output": "', '"}')
+        return StreamingResponse(stream, media_type="application/json")
+
+    return JSONResponse(status_code=404, content={"error": f"Método desconocido: {method}"})
+
+
+@app.get("/v1/{resource:path}")
+async def reasoning_engine_metadata(resource: str):
+    """Metadatos del Reasoning Engine (lo consulta el calentamiento de la app)"""
+    return {"name": resource}
+
+
+@app.get("/v18.0/{media_id}")
+async def media_lookup(media_id: str, request: Request):
+    stats["media_lookups"] += 1
+    await asyncio.sleep(GRAPH_LATENCY)
+    return {"id": media_id, "url": f"{str(request.base_url).rstrip('/')}/media/{media_id}"}
+
+
+@app.get("/media/{media_id}")
+async def media_download(media_id: str):
+    stats["media_downloads"] += 1
+    await asyncio.sleep(GRAPH_LATENCY)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for start in range(0, len(_AUDIO_BASE), _AUDIO_CHUNK_BYTES):
+            yield _AUDIO_BASE[start:start + _AUDIO_CHUNK_BYTES]
+        yield media_id.encode()
+
+    return StreamingResponse(chunks(), media_type="audio/ogg")
+
+
+@app.post("/v18.0/{phone_number_id}/messages")
+async def send_message(phone_number_id: str, request: Request):
+    payload = await request.json()
+    await asyncio.sleep(GRAPH_LATENCY)
+    stats["messages_sent"] += 1
+    if "token0" in payload.get("text", {}).get("body", ""):
+        stats["agent_replies"] += 1
+    return {
+        "messaging_product": "whatsapp",
+        "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+        "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}]
+    }
+
+
+@app.get("/_stats")
+async def get_stats():
+    return stats
+
+
+@app.get("/_config")
+async def get_config():
+    return {
+        "engine_latency": ENGINE_LATENCY,
+        "engine_tokens": ENGINE_TOKENS,
+        "engine_token_interval": ENGINE_TOKEN_INTERVAL,
+        "session_latency": SESSION_LATENCY,
+        "graph_latency": GRAPH_LATENCY,
+        "audio_bytes": AUDIO_BYTES
+    }
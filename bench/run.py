@@ -0,0 +1,442 @@
+"""
+Benchmark de throughput y latencia del BFF contra upstreams locales.
+
+Levanta ``bench.fake_upstreams`` y ``bench.serve_app`` en subprocesos y
+carga cada endpoint con N clientes concurrentes en lazo cerrado (cada
+cliente manda el siguiente request apenas recibe la respuesta). Por
+escenario (endpoint x concurrencia) reporta throughput, latencias p50, p95 y
+p99, errores y el lag del event loop del BFF. En ``webhook`` y
+``webhook_audio`` también mide el procesamiento en background hasta vaciar
+la cola. Los resultados se guardan en bench/results/ con el commit actual.
+
+Uso:
+    python -m bench.run --concurrency 1,10,50 --duration 10
+    python -m bench.run --endpoints chat,query --env QUERY_CACHE_ENABLED=true
+    python -m bench.run --baseline bench/results/20260101-120000-abc1234.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bench" / "results"
+
+# Números distintos usados en el webhook (cada uno es un carril de la cola)
+PHONE_COUNT = 1000
+# Sesiones distintas de Dialogflow
+DIALOGFLOW_SESSIONS = 1000
+# Mensajes por request en el escenario chat_batch
+CHAT_BATCH_SIZE = 10
+
+
+def chat_payload(i: int) -> Dict[str, Any]:
+    return {"message": f"Hola, necesito ayuda con mi pedido número {i}"}
+
+
+def chat_batch_payload(i: int) -> Dict[str, Any]:
+    return {"messages": [chat_payload(i * CHAT_BATCH_SIZE + j) for j in range(CHAT_BATCH_SIZE)]}
+
+
+def query_payload(i: int) -> Dict[str, Any]:
+    # Consultas distintas: sin coalescing ni aciertos de caché
+    return {"query": f"¿Cuál es el estado del pedido {i}?"}
+
+
+def _whatsapp_body(i: int, message: Dict[str, Any]) -> Dict[str, Any]:
+    message = {
+        "from": f"52155{i % PHONE_COUNT:08d}",
+        "id": f"wamid.bench.{uuid.uuid4().hex}",
+        "timestamp": str(int(time.time())),
+        **message
+    }
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "bench",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"phone_number_id": "bench"},
+                    "messages": [message]
+                }
+            }]
+        }]
+    }
+
+
+def webhook_payload(i: int) -> Dict[str, Any]:
+    return _whatsapp_body(i, {"type": "text", "text": {"body": f"Hola, ¿dónde está mi pedido {i}?"}})
+
+
+def webhook_audio_payload(i: int) -> Dict[str, Any]:
+    return _whatsapp_body(i, {
+        "type": "audio",
+        "audio": {"id": f"media-{uuid.uuid4().hex}", "mime_type": "audio/ogg; codecs=opus", "voice": True}
+    })
+
+
+def dialogflow_payload(i: int) -> Dict[str, Any]:
+    return {
+        "text": f"Quiero saber el estado de mi pedido {i}",
+        "sessionInfo": {
+            "session": f"projects/bench/locations/global/agents/bench/sessions/bench-{i % DIALOGFLOW_SESSIONS}"
+        }
+    }
+
+
+def agent_replied(body: Dict[str, Any]) -> bool:
+    """
+    La respuesta trae texto del engine doble (sus tokens son ``tokenN``) y no
+    un mensaje de fallback, que estos endpoints devuelven con status 200.
+    """
+    if "fulfillment_response" in body:
+        body = body["fulfillment_response"]["messages"][0]["text"]["text"][0]
+    elif "response" in body:
+        body = body["response"]
+    return "token0" in str(body)
+
+
+def batch_replied(body: Dict[str, Any]) -> bool:
+    return all(item["success"] and agent_replied(item) for item in body["results"])
+
+
+def webhook_accepted(body: Dict[str, Any]) -> bool:
+    return body.get("status") == "ok"
+
+
+# Endpoint -> (path, generador de payloads, validador de la respuesta, procesa en background)
+SCENARIOS: Dict[str, Tuple[str, Callable[[int], Dict[str, Any]], Callable[[Dict[str, Any]], bool], bool]] = {
+    "chat": ("/chat", chat_payload, agent_replied, False),
+    "chat_batch": ("/chat/batch", chat_batch_payload, batch_replied, False),
+    "query": ("/query", query_payload, agent_replied, False),
+    "webhook": ("/webhook", webhook_payload, webhook_accepted, True),
+    "webhook_audio": ("/webhook", webhook_audio_payload, webhook_accepted, True),
+    "dialogflow": ("/dialogflow/webhook", dialogflow_payload, agent_replied, False),
+}
+
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not ordered:
+        return None
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_info() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def start_process(module_args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *module_args], cwd=ROOT, env={**os.environ, **env})
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    async with httpx.AsyncClient() as client:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"El proceso terminó al arrancar (código {process.returncode}): {url}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Timeout esperando {url}")
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    path: str,
+    payload: Callable[[int], Dict[str, Any]],
+    validate: Callable[[Dict[str, Any]], bool],
+    concurrency: int,
+    duration: float,
+    counter: itertools.count
+) -> Tuple[List[float], int, float]:
+    """
+    Corre ``concurrency`` clientes durante ``duration`` segundos.
+
+    Returns:
+        (latencias de los requests exitosos, errores, segundos transcurridos).
+        Es error un status >= 400, una falla de red o una respuesta que no
+        pasa ``validate`` (por ejemplo un fallback con status 200).
+    """
+    latencies: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    stop_at = started + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            body = payload(next(counter))
+            request_started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code < 400 and validate(response.json())
+            except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - request_started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def drain_queue(client: httpx.AsyncClient, timeout: float) -> bool:
+    """Espera a que la cola de WhatsApp quede vacía y sin mensajes en proceso"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        queue = (await client.get("/whatsapp/queue")).json()
+        if queue["depth"] == 0 and queue["in_flight"] == 0:
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    fakes: httpx.AsyncClient,
+    endpoint: str,
+    concurrency: int,
+    args: argparse.Namespace,
+    counter: itertools.count
+) -> Dict[str, Any]:
+    path, payload, validate, background = SCENARIOS[endpoint]
+
+    # Calentamiento: conexiones, sesiones y límites adaptativos
+    if args.warmup > 0:
+        await drive(client, path, payload, validate, concurrency, args.warmup, counter)
+        if background:
+            await drain_queue(client, args.drain_timeout)
+
+    if background:
+        queue_before = (await client.get("/whatsapp/queue")).json()
+        sent_before = (await fakes.get("/_stats")).json()
+    await client.delete("/_bench/loop-lag")
+    started = time.perf_counter()
+    latencies, errors, elapsed = await drive(client, path, payload, validate, concurrency, args.duration, counter)
+    loop_lag = (await client.get("/_bench/loop-lag")).json()
+
+    latencies.sort()
+    result: Dict[str, Any] = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+        "loop_lag": loop_lag
+    }
+
+    if background:
+        drained = await drain_queue(client, args.drain_timeout)
+        background_elapsed = time.perf_counter() - started
+        queue_after = (await client.get("/whatsapp/queue")).json()
+        sent_after = (await fakes.get("/_stats")).json()
+        processed = queue_after["processed"] - queue_before["processed"]
+        result["background"] = {
+            "drained": drained,
+            "processed": processed,
+            "failed": queue_after["failed"] - queue_before["failed"],
+            "rejected": queue_after["rejected"] - queue_before["rejected"],
+            "seconds": round(background_elapsed, 3),
+            "processed_per_second": round(processed / background_elapsed, 2),
+            # Respuestas con texto del agente; el resto fueron mensajes de fallback
+            "agent_replies": sent_after["agent_replies"] - sent_before["agent_replies"],
+            "messages_sent": sent_after["messages_sent"] - sent_before["messages_sent"]
+        }
+
+    return result
+
+
+def format_row(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> str:
+    latency = result["latency_ms"]
+    row = (
+        f"{result['endpoint']:<14}{result['concurrency']:>6}{result['throughput_rps']:>11.1f}"
+        f"{latency['p50'] or 0:>10.1f}{latency['p95'] or 0:>10.1f}{latency['p99'] or 0:>10.1f}"
+        f"{result['errors']:>8}{result['loop_lag'].get('p99_ms', 0):>12.2f}"
+    )
+    if "background" in result:
+        row += f"{result['background']['processed_per_second']:>12.1f}"
+    else:
+        row += f"{'-':>12}"
+    if baseline:
+        def delta(new: Optional[float], old: Optional[float]) -> str:
+            if not new or not old:
+                return "n/a"
+            return f"{(new - old) / old * 100:+.1f}%"
+        row += (
+            f"   rps {delta(result['throughput_rps'], baseline['throughput_rps'])}"
+            f" p99 {delta(latency['p99'], baseline['latency_ms']['p99'])}"
+        )
+    return row
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"--env espera KEY=VALUE, se recibió: {pair}")
+        env[key] = value
+    return env
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_env = {
+        "FAKE_ENGINE_LATENCY": str(args.engine_latency),
+        "FAKE_ENGINE_TOKENS": str(args.engine_tokens),
+        "FAKE_ENGINE_TOKEN_INTERVAL": str(args.token_interval),
+        "FAKE_SESSION_LATENCY": str(args.session_latency),
+        "FAKE_GRAPH_LATENCY": str(args.graph_latency),
+        "FAKE_AUDIO_BYTES": str(args.audio_bytes),
+        "FAKE_STT_LATENCY": str(args.stt_latency),
+    }
+    fakes_port, app_port = free_port(), free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    app_env = {
+        **fake_env,
+        "REASONING_ENGINE_ID": "bench",
+        "GOOGLE_CLOUD_PROJECT": "bench",
+        "VERTEX_API_ENDPOINT": fakes_url,
+        "GRAPH_API_BASE_URL": f"{fakes_url}/v18.0",
+        "WHATSAPP_TOKEN": "bench",
+        "WHATSAPP_PHONE_NUMBER_ID": "bench",
+        "LOG_LEVEL": args.log_level,
+        **parse_env(args.env),
+    }
+
+    fakes = start_process(
+        ["-m", "uvicorn", "bench.fake_upstreams:app", "--port", str(fakes_port), "--log-level", "warning"],
+        fake_env
+    )
+    server = start_process(["-m", "bench.serve_app", "--port", str(app_port)], app_env)
+    try:
+        await wait_ready(f"{fakes_url}/_stats", fakes)
+        await wait_ready(f"http://127.0.0.1:{app_port}/readyz", server)
+
+        concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+        limits = httpx.Limits(max_connections=max(concurrency_levels) + 10, max_keepalive_connections=max(concurrency_levels) + 10)
+        counter = itertools.count()
+        results = []
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=args.request_timeout
+        ) as client, httpx.AsyncClient(base_url=fakes_url) as fakes_client:
+            for endpoint in args.endpoints.split(","):
+                if endpoint not in SCENARIOS:
+                    raise SystemExit(f"Endpoint desconocido: {endpoint} (opciones: {', '.join(SCENARIOS)})")
+                for concurrency in concurrency_levels:
+                    print(f"▶️  {endpoint} x{concurrency}...", file=sys.stderr)
+                    results.append(await run_scenario(client, fakes_client, endpoint, concurrency, args, counter))
+            fake_config = (await fakes_client.get("/_config")).json()
+    finally:
+        for process in (server, fakes):
+            process.terminate()
+        for process in (server, fakes):
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git": git_info(),
+        "config": {
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "upstreams": fake_config,
+            "stt_latency": args.stt_latency,
+            "env": parse_env(args.env),
+        },
+        "scenarios": results
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="chat,chat_batch,query,webhook,webhook_audio,dialogflow",
+                        help="Escenarios separados por coma")
+    parser.add_argument("--concurrency", default="1,10,50", help="Niveles de concurrencia separados por coma")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por escenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de calentamiento por escenario")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="Segundos máximos esperando que se vacíe la cola de WhatsApp")
+    parser.add_argument("--engine-latency", type=float, default=0.2, help="Segundos hasta el primer token")
+    parser.add_argument("--engine-tokens", type=int, default=20, help="Tokens por respuesta del engine")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Segundos entre tokens")
+    parser.add_argument("--session-latency", type=float, default=0.1, help="Segundos para crear una sesión")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="Latencia de la Graph API")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="Latencia de Speech-to-Text")
+    parser.add_argument("--audio-bytes", type=int, default=64 * 1024, help="Tamaño de cada audio")
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL del BFF durante el benchmark")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variable de entorno extra para el BFF (repetible)")
+    parser.add_argument("--baseline", help="Resultado previo (JSON) contra el que comparar")
+    parser.add_argument("--output", help="Archivo de salida (default: bench/results/<fecha>-<commit>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    baseline = {}
+    if args.baseline:
+        previous = json.loads(Path(args.baseline).read_text())
+        baseline = {(s["endpoint"], s["concurrency"]): s for s in previous["scenarios"]}
+
+    print(
+        f"{'endpoint':<14}{'conc':>6}{'rps':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'errors':>8}{'lag p99 ms':>12}{'bg msg/s':>12}"
+    )
+    for result in report["scenarios"]:
+        print(format_row(result, baseline.get((result["endpoint"], result["concurrency"]))))
+
+    if args.output:
+        output = Path(args.output)
+    else:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{report['git']['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\n💾 Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
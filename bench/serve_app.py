@@ -0,0 +1,117 @@
+"""
+Levanta el BFF para el benchmark, sin GCP.
+
+Reemplaza las credenciales y los clientes de Speech-to-Text por dobles
+locales (ambos se resuelven en el primer uso, así que basta con fijarlos
+después de importar ``app.main``); el Reasoning Engine y la Graph API se
+apuntan a ``bench.fake_upstreams`` con VERTEX_API_ENDPOINT y
+GRAPH_API_BASE_URL. Agrega un monitor de lag del event loop expuesto en
+``/_bench/loop-lag``.
+
+Uso: ``python -m bench.serve_app --port 8080``
+"""
+
+import argparse
+import asyncio
+import datetime
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict
+
+from bench.fake_speech import FakeSpeechAsyncClient, FakeSpeechClient
+
+
+class FakeCredentials:
+    """Credenciales que se renuevan sin red, con un token de una hora"""
+
+    token = None
+    expiry = None
+
+    def refresh(self, request: Any) -> None:
+        self.token = "bench-token"
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        self.expiry = now + datetime.timedelta(hours=1)
+
+
+class LoopLagMonitor:
+    """
+    Mide cuánto se atrasa el event loop: duerme ``interval`` segundos y
+    registra el exceso sobre lo pedido.
+    """
+
+    def __init__(self, interval: float = 0.01, max_samples: int = 200_000):
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0}
+
+        def percentile(p: float) -> float:
+            return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+        return {
+            "samples": len(ordered),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1] * 1000, 3)
+        }
+
+
+def build_app() -> Any:
+    from app.main import app
+    from app.services.auth import credential_refresher
+    from app.services.speech_service import speech_service
+
+    # Sin import de google.auth ni de speech_v1: el arranque medido es el real
+    credential_refresher._credentials = FakeCredentials()
+    speech_service._client = FakeSpeechClient()
+    speech_service._async_client = FakeSpeechAsyncClient()
+
+    monitor = LoopLagMonitor()
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_: Any):
+        async with app_lifespan(app_):
+            task = asyncio.create_task(monitor.run(), name="loop-lag-monitor")
+            try:
+                yield
+            finally:
+                task.cancel()
+
+    app.router.lifespan_context = lifespan
+
+    async def loop_lag() -> Dict[str, Any]:
+        return monitor.summary()
+
+    async def reset_loop_lag() -> Dict[str, Any]:
+        monitor.samples.clear()
+        return {"status": "ok"}
+
+    app.add_api_route("/_bench/loop-lag", loop_lag, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/_bench/loop-lag", reset_loop_lag, methods=["DELETE"], include_in_schema=False)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(build_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
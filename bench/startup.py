@@ -0,0 +1,174 @@
+"""
+Reporte de cold start del BFF.
+
+1. Import: corre ``python -X importtime -c "import app.main"`` en
+   intérpretes nuevos y reporta la mediana, los imports directos más
+   pesados y si se cargó algún módulo que debería importarse recién en el
+   primer uso (google.auth, Speech-to-Text, gRPC, api_core).
+2. Arranque: levanta ``bench.serve_app`` contra los upstreams dobles, mide
+   cuánto tarda en responder /healthz (proceso arriba) y /readyz con 200
+   (calentamiento terminado) y agrega el reporte de /startup.
+
+Los resultados se guardan en bench/results/startup-<fecha>-<commit>.json.
+
+Uso:
+    python -m bench.startup --runs 5
+    python -m bench.startup --baseline bench/results/startup-20260101-120000-abc1234.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench.run import RESULTS_DIR, ROOT, free_port, git_info, start_process, wait_ready
+
+# Módulos que no deben cargarse al importar la app
+LAZY_MODULES = ("google.auth", "google.cloud.speech_v1", "google.api_core", "grpc", "google.cloud.aiplatform")
+
+# Entorno mínimo: la app debe poder importarse sin credenciales de GCP
+IMPORT_ENV = {"REASONING_ENGINE_ID": "bench", "LOG_LEVEL": "WARNING"}
+
+
+def measure_import() -> Dict[str, Any]:
+    """Un import de app.main en un intérprete nuevo, con -X importtime"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith("GOOGLE_")}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env={**env, **IMPORT_ENV}, capture_output=True, text=True, check=True
+    )
+
+    total_us = 0
+    direct: List[Dict[str, Any]] = []
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        loaded.add(module)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if module == "app.main":
+            total_us = int(cumulative)
+        elif depth == 1:
+            direct.append({"module": module, "ms": round(int(cumulative) / 1000, 1)})
+
+    direct.sort(key=lambda item: item["ms"], reverse=True)
+    return {
+        "seconds": total_us / 1e6,
+        "heaviest": direct[:10],
+        "lazy_modules_loaded": sorted(
+            {watched for watched in LAZY_MODULES for module in loaded if module == watched or module.startswith(watched + ".")}
+        )
+    }
+
+
+async def measure_startup() -> Dict[str, Any]:
+    """Arranca la app y mide el tiempo hasta el primer /healthz y el primer /readyz exitosos"""
+    fakes_port, app_port = free_port(), free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    fakes = start_process(
+        ["-m", "uvicorn", "bench.fake_upstreams:app", "--port", str(fakes_port), "--log-level", "warning"], {}
+    )
+    try:
+        await wait_ready(f"{fakes_url}/_stats", fakes)
+        started = time.perf_counter()
+        server = start_process(["-m", "bench.serve_app", "--port", str(app_port)], {
+            **IMPORT_ENV,
+            "VERTEX_API_ENDPOINT": fakes_url,
+            "GRAPH_API_BASE_URL": f"{fakes_url}/v18.0",
+            "WHATSAPP_TOKEN": "bench",
+            "WHATSAPP_PHONE_NUMBER_ID": "bench",
+        })
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}") as client:
+                seconds = {}
+                for path in ("/healthz", "/readyz"):
+                    while True:
+                        if server.poll() is not None:
+                            raise RuntimeError(f"La app terminó al arrancar (código {server.returncode})")
+                        try:
+                            if (await client.get(path)).status_code == 200:
+                                break
+                        except httpx.TransportError:
+                            pass
+                        await asyncio.sleep(0.01)
+                    seconds[path] = time.perf_counter() - started
+                report = (await client.get("/startup")).json()
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=15)
+    return {"seconds_to_healthz": seconds["/healthz"], "seconds_to_readyz": seconds["/readyz"], "app_report": report}
+
+
+def delta(new: float, old: Optional[float]) -> str:
+    if not old:
+        return ""
+    return f" ({(new - old) / old * 100:+.1f}%)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Mediciones de cada tipo")
+    parser.add_argument("--baseline", help="Reporte previo (JSON) contra el que comparar")
+    parser.add_argument("--output", help="Archivo de salida (default: bench/results/startup-<fecha>-<commit>.json)")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    startups = [asyncio.run(measure_startup()) for _ in range(args.runs)]
+
+    import_median = statistics.median(run["seconds"] for run in imports)
+    ready_median = statistics.median(run["seconds_to_healthz"] for run in startups)
+    warm_median = statistics.median(run["seconds_to_readyz"] for run in startups)
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git": git_info(),
+        "runs": args.runs,
+        "import_seconds_median": round(import_median, 4),
+        "import_seconds": [round(run["seconds"], 4) for run in imports],
+        "heaviest_imports_ms": imports[-1]["heaviest"],
+        "lazy_modules_loaded": imports[-1]["lazy_modules_loaded"],
+        "ready_seconds_median": round(ready_median, 4),
+        "ready_seconds": [round(run["seconds_to_healthz"], 4) for run in startups],
+        "warm_seconds_median": round(warm_median, 4),
+        "warm_seconds": [round(run["seconds_to_readyz"], 4) for run in startups],
+        "app_report": startups[-1]["app_report"]
+    }
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+    print(f"Import de app.main (mediana de {args.runs}): "
+          f"{import_median * 1000:.0f} ms{delta(import_median, baseline.get('import_seconds_median'))}")
+    for item in report["heaviest_imports_ms"]:
+        print(f"  {item['ms']:>8.1f} ms  {item['module']}")
+    if report["lazy_modules_loaded"]:
+        print(f"⚠️  Módulos que deberían ser perezosos cargados al importar: {', '.join(report['lazy_modules_loaded'])}")
+    print(f"Arranque hasta /healthz (mediana de {args.runs}): "
+          f"{ready_median * 1000:.0f} ms{delta(ready_median, baseline.get('ready_seconds_median'))}")
+    print(f"Arranque hasta /readyz (mediana de {args.runs}): "
+          f"{warm_median * 1000:.0f} ms{delta(warm_median, baseline.get('warm_seconds_median'))}")
+    print(f"Reporte de la app: {json.dumps(report['app_report'])}")
+
+    if args.output:
+        output = Path(args.output)
+    else:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"startup-{stamp}-{report['git']['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\n💾 Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,13 @@ resource "google_cloud_run_v2_service" "service" {
 
     scaling {
       min_instance_count = 0
-      max_instance_count = 1
+      # Más de una instancia requiere session_store_backend = "redis"
+      max_instance_count = var.max_instance_count
     }
 
+    # Mantener a cada cliente en la misma instancia mientras sea posible
+    session_affinity = true
+
     containers {
       image = var.container_image
 
@@ -52,15 +56,39 @@ resource "google_cloud_run_v2_service" "service" {
         value = "mi_token_secreto_12345"
       }
 
+      env {
+        name  = "SESSION_STORE_BACKEND"
+        value = var.session_store_backend
+      }
+
+      env {
+        name  = "REDIS_URL"
+        value = var.redis_url
+      }
+
       resources {
         limits = {
           cpu    = "1"
           memory = "512Mi"
         }
+        # Los mensajes de WhatsApp se procesan en background después de
+        # responder el webhook: la CPU debe seguir asignada fuera del request
+        cpu_idle = false
       }
       ports {
         container_port = 8080
       }
+
+      # Enrutar tráfico solo cuando terminó el calentamiento de upstreams
+      # (token, conexiones, canal gRPC): /readyz responde 503 hasta entonces
+      startup_probe {
+        http_get {
+          path = "/readyz"
+        }
+        period_seconds    = 1
+        timeout_seconds   = 1
+        failure_threshold = 30
+      }
     }
   }
 
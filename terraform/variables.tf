@@ -37,3 +37,21 @@ variable "github_branches" {
   type        = list(string)
   default     = ["main", "master"]
 }
+
+variable "max_instance_count" {
+  description = "Máximo de instancias de Cloud Run (más de 1 requiere session_store_backend = \"redis\")"
+  type        = number
+  default     = 1
+}
+
+variable "session_store_backend" {
+  description = "Backend de sesiones del agente: memory o redis"
+  type        = string
+  default     = "memory"
+}
+
+variable "redis_url" {
+  description = "URL de Redis/Memorystore cuando session_store_backend = \"redis\""
+  type        = string
+  default     = ""
+}
@@ -0,0 +1,118 @@
+"""Tests de CredentialRefresher: un solo refresh y sin bloquear el event loop"""
+
+import asyncio
+import datetime
+import threading
+import time
+
+from app.services.auth import CredentialRefresher
+
+
+class SlowCredentials:
+    """Credenciales cuyo refresh tarda ``delay`` segundos (como una llamada al metadata server)"""
+
+    def __init__(self, delay: float = 0.2, lifetime: float = 3600):
+        self.delay = delay
+        self.lifetime = lifetime
+        self.calls = 0
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request) -> None:
+        self.calls += 1
+        time.sleep(self.delay)
+        self.token = f"token-{self.calls}"
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        self.expiry = now + datetime.timedelta(seconds=self.lifetime)
+
+
+def test_get_headers_waits_for_in_flight_refresh_without_blocking_loop():
+    credentials = SlowCredentials(delay=0.2)
+    refresher = CredentialRefresher(credentials=credentials)
+
+    async def scenario():
+        lags = []
+
+        async def ticker():
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - started - 0.01)
+
+        tick = asyncio.create_task(ticker())
+        background = asyncio.create_task(refresher.refresh())
+        await asyncio.sleep(0.02)
+        headers = await asyncio.gather(*(refresher.get_headers() for _ in range(5)))
+        await background
+        tick.cancel()
+        return headers, max(lags)
+
+    headers, max_lag = asyncio.run(scenario())
+    assert credentials.calls == 1
+    assert all(h["Authorization"] == "Bearer token-1" for h in headers)
+    assert max_lag < 0.1
+
+
+def test_get_headers_refreshes_once_when_no_token():
+    credentials = SlowCredentials(delay=0.05)
+    refresher = CredentialRefresher(credentials=credentials)
+
+    async def scenario():
+        return await asyncio.gather(*(refresher.get_headers() for _ in range(10)))
+
+    headers = asyncio.run(scenario())
+    assert credentials.calls == 1
+    assert len({h["Authorization"] for h in headers}) == 1
+    assert refresher.stats()["refresh_waits"] == 10
+
+
+def test_sync_headers_recheck_after_lock():
+    """El fallback síncrono no repite un refresh que otro thread acaba de hacer"""
+    credentials = SlowCredentials(delay=0.2)
+    refresher = CredentialRefresher(credentials=credentials)
+
+    thread = threading.Thread(target=refresher._refresh_blocking)
+    thread.start()
+    time.sleep(0.05)
+    headers = refresher.headers
+    thread.join()
+
+    assert credentials.calls == 1
+    assert headers["Authorization"] == "Bearer token-1"
+
+
+def test_valid_token_is_served_without_refresh():
+    credentials = SlowCredentials(delay=0)
+    refresher = CredentialRefresher(credentials=credentials)
+    asyncio.run(refresher.refresh())
+
+    async def scenario():
+        return await refresher.get_headers()
+
+    assert asyncio.run(scenario())["Authorization"] == "Bearer token-1"
+    assert refresher.headers["Authorization"] == "Bearer token-1"
+    assert credentials.calls == 1
+    assert refresher.stats()["refresh_waits"] == 0
+
+
+def test_short_lived_token_caps_margin_to_half_its_lifetime():
+    refresher = CredentialRefresher(
+        credentials=SlowCredentials(delay=0, lifetime=10), refresh_margin=300, retry_interval=1
+    )
+    asyncio.run(refresher.refresh())
+    assert 4.5 < refresher._refresh_at - time.monotonic() <= 5
+
+
+def test_expired_or_short_tokens_do_not_refresh_in_a_tight_loop():
+    for lifetime in (0.2, -5):
+        credentials = SlowCredentials(delay=0, lifetime=lifetime)
+        refresher = CredentialRefresher(credentials=credentials, refresh_margin=300, retry_interval=0.05)
+
+        async def scenario():
+            await refresher.start()
+            await asyncio.sleep(0.5)
+            await refresher.stop()
+
+        asyncio.run(scenario())
+        # Un refresh cada ~0.1s (mitad de la vida) o cada retry_interval, no cientos
+        assert 2 <= credentials.calls <= 12
@@ -0,0 +1,63 @@
+"""Tests de los dobles de upstreams y de las utilidades del benchmark"""
+
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from bench import fake_upstreams
+from bench.run import SCENARIOS, agent_replied, parse_env, percentile
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    for name in ("ENGINE_LATENCY", "ENGINE_TOKEN_INTERVAL", "SESSION_LATENCY", "GRAPH_LATENCY"):
+        monkeypatch.setattr(fake_upstreams, name, 0)
+    monkeypatch.setattr(fake_upstreams, "stats", dict.fromkeys(fake_upstreams.stats, 0))
+
+    def call(method, path, **kwargs):
+        async def request():
+            transport = httpx.ASGITransport(app=fake_upstreams.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://upstreams") as client:
+                return await client.request(method, path, **kwargs)
+        return asyncio.run(request())
+
+    return call
+
+
+def test_fake_engine_stream_is_one_json_document(upstreams):
+    path = "/v1/projects/p/locations/l/reasoningEngines/1:streamQuery"
+    plain = upstreams("POST", path, json={"input": {}})
+    sse = upstreams("POST", path, params={"alt": "sse"}, json={"input": {}})
+
+    assert agent_replied(orjson.loads(plain.content))
+    assert orjson.loads(sse.content)["content"]["parts"][0]["text"].startswith("token0 ")
+    assert fake_upstreams.stats["engine_queries"] == 2
+
+
+def test_fake_graph_api_serves_unique_audio_and_counts_replies(upstreams):
+    url = upstreams("GET", "/v18.0/media-1").json()["url"]
+    audio = upstreams("GET", httpx.URL(url).path)
+    sent = upstreams("POST", "/v18.0/phone/messages", json={"to": "549", "text": {"body": "token0 token1"}})
+
+    assert audio.content.endswith(b"media-1")
+    assert len(audio.content) == fake_upstreams.AUDIO_BYTES + len(b"media-1")
+    assert sent.json()["messages"][0]["id"].startswith("wamid.")
+    assert fake_upstreams.stats["agent_replies"] == 1
+
+
+def test_percentile_and_env_parsing():
+    ordered = [float(i) for i in range(1, 101)]
+    assert percentile([], 0.5) is None
+    assert percentile(ordered, 0.5) == 51.0
+    assert percentile(ordered, 0.99) == 100.0
+    assert parse_env(["A=1", "B=x=y"]) == {"A": "1", "B": "x=y"}
+    with pytest.raises(SystemExit):
+        parse_env(["A"])
+
+
+def test_scenario_payloads_are_serializable():
+    for path, payload, _, _ in SCENARIOS.values():
+        assert path.startswith("/")
+        orjson.dumps(payload(1))
@@ -0,0 +1,127 @@
+"""Tests de /chat/batch con run_chat_turn simulado"""
+
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+import app.main as main
+from app.services.deadline import current_deadline
+from app.services.resilience import EngineUnavailable
+
+
+def patch_chat_turn(monkeypatch, delays=None):
+    state = {"active": 0, "max_active": 0, "deadlines": []}
+
+    async def run_chat_turn(message, user_id="default_user"):
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        state["deadlines"].append(current_deadline())
+        try:
+            await asyncio.sleep((delays or {}).get(message.message, 0.01))
+            if message.message == "caído":
+                raise EngineUnavailable("circuito abierto", retry_after=5)
+            return {"response": message.message.upper(), "session_id": message.session_id or "s-new"}
+        finally:
+            state["active"] -= 1
+
+    monkeypatch.setattr(main, "run_chat_turn", run_chat_turn)
+    return state
+
+
+def batch(*texts, parallelism=None):
+    return main.ChatBatchRequest(
+        messages=[main.ChatMessage(message=text, session_id=f"s-{i}") for i, text in enumerate(texts)],
+        parallelism=parallelism
+    )
+
+
+def request(accept=""):
+    return SimpleNamespace(headers={"accept": accept})
+
+
+def test_results_keep_input_order_and_isolate_failures(monkeypatch):
+    patch_chat_turn(monkeypatch, delays={"a": 0.05})
+
+    response = asyncio.run(main.chat_batch(batch("a", "caído", "c"), request()))
+    body = orjson.loads(response.body)
+
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+    assert body["results"][0]["response"] == "A"
+    assert body["results"][1] == {
+        "index": 1, "success": False, "status_code": 503, "error": body["results"][1]["error"],
+        "session_id": "s-1", "retry_after": 5
+    }
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+
+
+def test_parallelism_is_capped_and_each_item_has_its_own_deadline(monkeypatch):
+    state = patch_chat_turn(monkeypatch)
+    monkeypatch.setattr(main, "CHAT_BATCH_MAX_PARALLELISM", 3)
+
+    asyncio.run(main.chat_batch(batch(*"abcdefgh", parallelism=50), request()))
+
+    assert state["max_active"] == 3
+    assert len({id(d) for d in state["deadlines"]}) == 8
+
+
+def test_ndjson_streams_results_in_completion_order(monkeypatch):
+    patch_chat_turn(monkeypatch, delays={"lento": 0.05, "rápido": 0})
+
+    async def scenario():
+        response = await main.chat_batch(batch("lento", "rápido"), request(main.NDJSON_MEDIA_TYPE))
+        return [orjson.loads(line) async for line in response.body_iterator]
+
+    lines = asyncio.run(scenario())
+    assert [line["index"] for line in lines] == [1, 0]
+
+
+def test_abandoned_iteration_cancels_pending_items(monkeypatch):
+    state = patch_chat_turn(monkeypatch, delays={"lento": 1})
+
+    async def scenario():
+        items = main.iter_chat_batch(batch("rápido", "lento").messages, parallelism=2)
+        first = await items.__anext__()
+        await items.aclose()
+        return first
+
+    assert asyncio.run(scenario())["index"] == 0
+    assert state["active"] == 0
+
+
+def test_oversized_batch_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "CHAT_BATCH_MAX_ITEMS", 2)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(main.chat_batch(batch("a", "b", "c"), request()))
+    assert exc.value.status_code == 413
+
+
+def test_items_of_one_session_run_in_input_order_one_at_a_time(monkeypatch):
+    started = []
+    active = {}
+
+    async def run_chat_turn(message, user_id="default_user"):
+        session = message.session_id
+        assert not active.get(session), "dos turnos de la misma sesión a la vez"
+        active[session] = True
+        started.append(message.message)
+        # El primer turno es el más lento: en paralelo terminaría último
+        await asyncio.sleep(0.05 if message.message.endswith("1") else 0.01)
+        active[session] = False
+        return {"response": message.message, "session_id": session}
+
+    monkeypatch.setattr(main, "run_chat_turn", run_chat_turn)
+    messages = [
+        main.ChatMessage(message=text, session_id=session)
+        for text, session in [("a1", "A"), ("b1", "B"), ("a2", "A"), ("a3", "A"), ("b2", "B")]
+    ]
+
+    response = asyncio.run(main.chat_batch(main.ChatBatchRequest(messages=messages, parallelism=8), request()))
+
+    assert orjson.loads(response.body)["succeeded"] == 5
+    assert [text for text in started if text.startswith("a")] == ["a1", "a2", "a3"]
+    assert [text for text in started if text.startswith("b")] == ["b1", "b2"]
+    # Las sesiones distintas sí corrieron en paralelo
+    assert started[:2] == ["a1", "b1"]
@@ -0,0 +1,38 @@
+"""Tests de la inicialización diferida de los clientes de GCP"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services.auth import CredentialRefresher
+from app.services.speech_service import SpeechService
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Módulos que deben cargarse recién en el primer uso
+LAZY_MODULES = ("google.auth", "google.cloud.speech_v1", "google.api_core", "grpc")
+
+
+def test_importing_the_app_does_not_load_gcp_clients():
+    env = {key: value for key, value in os.environ.items() if not key.startswith("GOOGLE_")}
+    code = "import json, sys, app.main; print(json.dumps(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, env={**env, "REASONING_ENGINE_ID": "test", "LOG_LEVEL": "WARNING"},
+        capture_output=True, text=True, check=True
+    )
+    loaded = json.loads(completed.stdout.splitlines()[-1])
+    assert [m for m in loaded if m.startswith(LAZY_MODULES)] == []
+
+
+def test_clients_are_created_on_first_use():
+    service = SpeechService()
+    assert service._client is None and service._async_client is None
+
+    refresher = CredentialRefresher()
+    assert refresher._credentials is None
+    sentinel = object()
+    refresher._credentials = sentinel
+    assert refresher.credentials is sentinel
@@ -0,0 +1,108 @@
+"""Tests de los presupuestos de tiempo por request"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    channel_deadline,
+    current_deadline,
+    deadline_scope,
+    deadline_stage,
+    deadline_stats,
+    stage_timeout,
+    within_deadline,
+)
+
+
+def test_scope_sets_and_restores_current_deadline():
+    outer, inner = Deadline(10), Deadline(5)
+    assert current_deadline() is None
+    with deadline_scope(outer):
+        with deadline_scope(inner):
+            assert current_deadline() is inner
+        with deadline_scope(None):
+            assert current_deadline() is None
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_stage_timeout_is_min_of_cap_and_remaining():
+    assert stage_timeout("engine", cap=3) == 3
+    assert stage_timeout("engine") is None
+    with deadline_scope(Deadline(1)):
+        assert stage_timeout("engine", cap=3) <= 1
+        assert stage_timeout("engine", cap=0.5) == 0.5
+
+
+def test_expired_deadline_is_counted_once_at_first_stage():
+    deadline = Deadline(-1)
+    before = deadline_stats()["exceeded_by_stage"].get("stt-test", 0)
+    with deadline_scope(deadline):
+        with pytest.raises(DeadlineExceeded) as exc:
+            stage_timeout("stt-test")
+        with pytest.raises(DeadlineExceeded):
+            stage_timeout("engine-test")
+    assert exc.value.stage == "stt-test"
+    assert deadline.exceeded_in == "stt-test"
+    stats = deadline_stats()["exceeded_by_stage"]
+    assert stats["stt-test"] == before + 1
+    assert "engine-test" not in stats
+
+
+def test_within_deadline_times_out_with_remaining_budget():
+    async def scenario():
+        with deadline_scope(Deadline(0.02)):
+            await within_deadline("slow", asyncio.sleep(1))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+
+def test_within_deadline_cap_timeout_is_not_a_deadline_error():
+    async def scenario():
+        with deadline_scope(Deadline(10)):
+            await within_deadline("slow", asyncio.sleep(1), cap=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_within_deadline_closes_coroutine_when_already_expired():
+    async def work():
+        return "never"
+
+    async def scenario():
+        coroutine = work()
+        with deadline_scope(Deadline(-1)):
+            with pytest.raises(DeadlineExceeded):
+                await within_deadline("late", coroutine)
+        return coroutine.cr_frame
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_deadline_stage_translates_only_budget_timeouts():
+    with deadline_scope(Deadline(-1)):
+        with pytest.raises(DeadlineExceeded):
+            with deadline_stage("engine"):
+                raise httpx.ReadTimeout("timeout")
+    with deadline_scope(Deadline(10)):
+        with pytest.raises(httpx.ReadTimeout):
+            with deadline_stage("engine"):
+                raise httpx.ReadTimeout("timeout")
+
+
+def test_channel_deadline_gives_each_call_a_fresh_budget():
+    @channel_deadline("whatsapp")
+    async def handler():
+        return current_deadline()
+
+    first, second = asyncio.run(handler()), asyncio.run(handler())
+    assert first is not second
+    assert first.channel == "whatsapp"
+    assert first.budget == deadline_stats()["budgets_seconds"]["whatsapp"]
+    assert current_deadline() is None
@@ -0,0 +1,109 @@
+"""Tests de la deduplicación de mensajes de WhatsApp"""
+
+import asyncio
+
+import app.main as main
+from app.services.dedup_cache import MessageDeduplicator
+from app.services.work_queue import OVERFLOW_REJECT, LaneWorkQueue
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.body = body
+
+    async def json(self):
+        return self.body
+
+
+def webhook_body(*message_ids: str) -> dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"changes": [{"value": {"messages": [
+            {"id": message_id, "from": "5491100000000", "type": "text", "text": {"body": "hola"}}
+            for message_id in message_ids
+        ]}}]}]
+    }
+
+
+def test_check_and_add_detects_duplicates():
+    dedup = MessageDeduplicator()
+    assert dedup.check_and_add("wamid.1") is False
+    assert dedup.check_and_add("wamid.1") is True
+    assert dedup.check_and_add("wamid.2") is False
+    assert dedup.stats()["hits"] == 1
+    assert dedup.stats()["misses"] == 2
+
+
+def test_ids_expire_after_ttl():
+    dedup = MessageDeduplicator(ttl=-1)
+    dedup.check_and_add("wamid.1")
+    assert dedup.check_and_add("wamid.1") is False
+
+
+def test_oldest_id_is_evicted_at_max_size():
+    dedup = MessageDeduplicator(max_size=2)
+    for message_id in ("a", "b", "c"):
+        dedup.check_and_add(message_id)
+    assert len(dedup) == 2
+    assert dedup.stats()["evicted"] == 1
+    assert dedup.check_and_add("a") is False
+
+
+def test_discard_forgets_id():
+    dedup = MessageDeduplicator()
+    dedup.check_and_add("wamid.1")
+    dedup.discard("wamid.1")
+    dedup.discard("unknown")
+    assert dedup.check_and_add("wamid.1") is False
+
+
+def test_webhook_ignores_redelivered_messages(monkeypatch):
+    dedup = MessageDeduplicator()
+    monkeypatch.setattr(main, "whatsapp_deduplicator", dedup)
+    handled = []
+
+    async def scenario():
+        async def handler(item):
+            handled.append(item[0]["id"])
+
+        queue = LaneWorkQueue(handler, workers=1)
+        monkeypatch.setattr(main, "whatsapp_queue", queue)
+        await queue.start()
+        first = await main.whatsapp_webhook(FakeRequest(webhook_body("wamid.1")))
+        retry = await main.whatsapp_webhook(FakeRequest(webhook_body("wamid.1", "wamid.2")))
+        await queue.stop()
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+    assert first == retry == {"status": "ok"}
+    assert handled == ["wamid.1", "wamid.2"]
+
+
+def test_webhook_forgets_rejected_messages(monkeypatch):
+    dedup = MessageDeduplicator()
+    monkeypatch.setattr(main, "whatsapp_deduplicator", dedup)
+
+    async def scenario():
+        async def handler(item):
+            await asyncio.sleep(1)
+
+        queue = LaneWorkQueue(handler, workers=1, max_size=0, overflow_policy=OVERFLOW_REJECT)
+        monkeypatch.setattr(main, "whatsapp_queue", queue)
+        await queue.start()
+        response = await main.whatsapp_webhook(FakeRequest(webhook_body("wamid.1")))
+        await queue.stop(drain_timeout=0)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 503
+    # El reintento de Meta se procesará
+    assert dedup.check_and_add("wamid.1") is False
+
+
+def test_dropped_message_is_forgotten(monkeypatch):
+    dedup = MessageDeduplicator()
+    monkeypatch.setattr(main, "whatsapp_deduplicator", dedup)
+    dedup.check_and_add("wamid.1")
+
+    main.forget_dropped_whatsapp_message("5491100000000", ({"id": "wamid.1"}, None))
+    assert dedup.check_and_add("wamid.1") is False
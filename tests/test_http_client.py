@@ -0,0 +1,68 @@
+"""Tests del cliente HTTP compartido y de su uso desde ReasoningEngineClient"""
+
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from app.services.http_client import HTTPClientPool
+from app.services.reasoning_engine import ReasoningEngineClient
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker, EngineGuard
+
+
+class StaticCredentials:
+    async def get_headers(self):
+        return {"Authorization": "Bearer test", "Content-Type": "application/json"}
+
+
+def test_client_requires_start_and_start_is_idempotent():
+    pool = HTTPClientPool(http2=False)
+    with pytest.raises(RuntimeError):
+        pool.client
+
+    async def scenario():
+        await pool.start()
+        first = pool.client
+        await pool.start()
+        same = pool.client is first
+        await pool.close()
+        return same
+
+    assert asyncio.run(scenario()) is True
+    with pytest.raises(RuntimeError):
+        pool.client
+
+
+def test_pool_limits_come_from_constructor():
+    pool = HTTPClientPool(max_connections=7, max_keepalive_connections=3, keepalive_expiry=5)
+    assert pool.limits.max_connections == 7
+    assert pool.limits.max_keepalive_connections == 3
+    assert pool.limits.keepalive_expiry == 5
+
+
+def test_engine_calls_reuse_the_shared_client():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=orjson.dumps({"output": {"id": f"session-{len(requests)}"}}))
+
+    pool = HTTPClientPool(http2=False)
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    engine = ReasoningEngineClient(
+        "https://engine/reasoningEngines/1",
+        http_pool=pool,
+        credentials=StaticCredentials(),
+        guard=EngineGuard(AdaptiveLimiter(), CircuitBreaker())
+    )
+
+    async def scenario():
+        ids = [await engine.create_session("u1"), await engine.create_session("u2")]
+        await pool.close()
+        return ids
+
+    assert asyncio.run(scenario()) == ["session-1", "session-2"]
+    assert [r.url.path for r in requests] == ["/reasoningEngines/1:query"] * 2
+    assert orjson.loads(requests[0].content) == {"class_method": "async_create_session", "input": {"user_id": "u1"}}
+    assert requests[0].headers["Authorization"] == "Bearer test"
@@ -0,0 +1,87 @@
+"""Tests del logging diferido: snapshot de argumentos, muestreo y resumen de payloads"""
+
+import logging
+import queue
+
+from app.services.logging_config import DeferredQueueHandler, SamplingFilter, parse_sampling, summarize
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_prepare_snapshots_mutable_args():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    phases = {"imports": 0.5}
+    items = [1]
+    record = handler.prepare(make_record("fases %s, items %s, n %d", phases, items, 3))
+
+    phases["warmup"] = 2.0
+    items.append(2)
+    assert record.getMessage() == "fases {'imports': 0.5}, items [1], n 3"
+
+
+def test_prepare_snapshots_mapping_args():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    values = {"a": 1}
+    record = handler.prepare(make_record("a=%(a)s", values))
+
+    values["a"] = 2
+    assert record.getMessage() == "a=1"
+
+
+def test_prepare_keeps_immutable_args_and_lazy_summaries():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    summary = summarize({"k": "v"})
+    record = handler.prepare(make_record("%s %s", "texto", summary))
+
+    assert record.args[1] is summary
+    assert record.getMessage() == "texto {'k': 'v'}"
+
+
+def test_summarize_is_bounded():
+    text = str(summarize({"body": "x" * 10_000, "items": list(range(10_000))}, max_chars=100))
+    assert len(text) <= 101
+    assert text.endswith("…")
+
+
+def test_sampling_keeps_warnings_and_uses_longest_prefix():
+    sampling = SamplingFilter(parse_sampling("app=1, app.main=0"))
+
+    def record(name: str, level: int) -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 1, "m", (), None)
+
+    assert not sampling.filter(record("app.main", logging.INFO))
+    assert sampling.filter(record("app.main", logging.WARNING))
+    assert sampling.filter(record("app.services", logging.INFO))
+
+
+def test_disabled_debug_log_does_not_format_hot_path_args():
+    """Los mensajes del camino caliente no se formatean si el nivel está desactivado"""
+    import asyncio
+
+    from app.services.single_flight import SingleFlight
+
+    class Key:
+        formatted = 0
+
+        def __str__(self):
+            Key.formatted += 1
+            return "key"
+
+    async def work():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        flight = SingleFlight()
+        key = Key()
+        await asyncio.gather(*(flight.do(key, work) for _ in range(3)))
+
+    logger = logging.getLogger("app.services.single_flight")
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        asyncio.run(scenario())
+    finally:
+        logger.setLevel(level)
+    assert Key.formatted == 0
@@ -0,0 +1,59 @@
+"""Tests del registro de métricas y de las etapas de Speech-to-Text"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.metrics import MetricsRegistry
+from app.services.speech_service import STT_STAGE, STT_WAIT_STAGE, SpeechService
+
+
+class SlowRecognizeClient:
+    """SpeechAsyncClient mínimo cuyo recognize tarda ``delay`` segundos"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def recognize(self, config, audio):
+        await asyncio.sleep(self.delay)
+        alternative = SimpleNamespace(transcript="hola", confidence=0.9)
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])])
+
+
+def test_registry_renders_counters_and_callback_gauges():
+    registry = MetricsRegistry()
+    requests = registry.counter("t_requests_total", "Requests", ("status",))
+    requests.labels("200").inc()
+    requests.labels("200").inc()
+    registry.gauge_callback("t_depth", "Depth", lambda: 7)
+
+    text = registry.render()
+    assert 't_requests_total{status="200"} 2' in text
+    assert "t_depth 7" in text
+
+
+def test_stt_wait_is_measured_apart_from_recognition():
+    """Con un solo cupo, la espera del segundo audio va a stt_wait y no a stt"""
+    service = SpeechService(max_concurrency=1)
+    service._async_client = SlowRecognizeClient(delay=0.1)
+    wait_before, stt_before = STT_WAIT_STAGE.seconds.sum, STT_STAGE.seconds.sum
+    wait_count_before = sum(STT_WAIT_STAGE.seconds.counts)
+
+    async def scenario():
+        return await asyncio.gather(
+            service.atranscribe_audio(b"audio-1", encoding="LINEAR16"),
+            service.atranscribe_audio(b"audio-2", encoding="LINEAR16")
+        )
+
+    results = asyncio.run(scenario())
+    assert all(r["success"] for r in results)
+    assert sum(STT_WAIT_STAGE.seconds.counts) - wait_count_before == 2
+    assert STT_WAIT_STAGE.seconds.sum - wait_before == pytest.approx(0.1, abs=0.05)
+    assert STT_STAGE.seconds.sum - stt_before == pytest.approx(0.2, abs=0.05)
+
+
+def test_whatsapp_queue_age_is_exported():
+    from app.main import metrics_registry
+
+    assert "bff_whatsapp_queue_oldest_age_seconds 0" in metrics_registry.render()
@@ -0,0 +1,103 @@
+"""Tests de la lectura y partición de OGG/Opus con páginas armadas en el test"""
+
+import struct
+
+import pytest
+
+from app.services.ogg_opus import OPUS_GRANULE_RATE, ogg_crc, opus_duration, parse_pages, split_opus
+
+SERIAL = 0x1234
+PRE_SKIP = 312
+SECOND = OPUS_GRANULE_RATE
+
+
+def make_page(sequence: int, granule: int, body: bytes, header_type: int = 0, lacing_tail: bool = True) -> bytes:
+    """
+    Página Ogg válida con ``body`` como contenido. Con ``lacing_tail=False``
+    el paquete no termina en esta página (sigue en la próxima).
+    """
+    lacing = [255] * (len(body) // 255)
+    if lacing_tail:
+        lacing.append(len(body) % 255)
+    page = bytearray(
+        struct.pack("<4sBBqIIIB", b"OggS", 0, header_type, granule, SERIAL, sequence, 0, len(lacing))
+        + bytes(lacing)
+        + body
+    )
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def opus_head() -> bytes:
+    return b"OpusHead" + struct.pack("<BBHIhB", 1, 1, PRE_SKIP, 16000, 0, 0)
+
+
+def build_stream(audio_seconds: int) -> bytes:
+    """OpusHead + OpusTags + una página de audio por segundo; la página 3 continúa en la 4"""
+    pages = [
+        make_page(0, 0, opus_head(), header_type=0x02),
+        make_page(1, 0, b"OpusTags" + b"\x00" * 8),
+    ]
+    for i in range(audio_seconds):
+        sequence = 2 + i
+        if i == 2:
+            # Paquete que sigue en la página siguiente: granule -1
+            pages.append(make_page(sequence, -1, b"\x01" * 255, lacing_tail=False))
+            continue
+        header_type = 0x01 if i == 3 else 0
+        if i == audio_seconds - 1:
+            header_type |= 0x04
+        pages.append(make_page(sequence, PRE_SKIP + (i + 1) * SECOND, b"\x02" * 40, header_type=header_type))
+    return b"".join(pages)
+
+
+def crc_is_valid(page_bytes: bytes) -> bool:
+    zeroed = bytearray(page_bytes)
+    struct.pack_into("<I", zeroed, 22, 0)
+    return struct.unpack_from("<I", page_bytes, 22)[0] == ogg_crc(zeroed)
+
+
+def test_opus_duration_subtracts_pre_skip():
+    assert opus_duration(build_stream(12)) == pytest.approx(12.0)
+
+
+def test_parse_pages_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_pages(b"not an ogg stream at all, definitely not")
+
+
+def test_split_rewrites_sequence_granule_eos_and_crc():
+    segments = split_opus(build_stream(12), max_segment_seconds=5)
+
+    assert len(segments) > 1
+    assert sum(duration for _, duration in segments) == pytest.approx(12.0, abs=PRE_SKIP / SECOND)
+
+    for segment, duration in segments:
+        pages = parse_pages(segment)
+        # Cabeceras originales y secuencia consecutiva desde 0
+        assert pages[0].data.startswith(b"OggS") and b"OpusHead" in pages[0].data
+        assert [p.sequence for p in pages] == list(range(len(pages)))
+        assert all(crc_is_valid(p.data) for p in pages)
+        # Solo la última página lleva EOS
+        assert [bool(p.header_type & 0x04) for p in pages] == [False] * (len(pages) - 1) + [True]
+        # Granules renumerados: empiezan cerca de cero en cada segmento
+        audio_granules = [p.granule for p in pages[2:] if p.granule > 0]
+        assert audio_granules == sorted(audio_granules)
+        assert audio_granules[-1] <= PRE_SKIP + 6 * SECOND
+        assert duration > 0
+
+
+def test_split_never_starts_segment_on_continued_page():
+    segments = split_opus(build_stream(12), max_segment_seconds=3)
+
+    for segment, _ in segments:
+        first_audio = parse_pages(segment)[2]
+        assert not first_audio.continued
+
+
+def test_short_audio_stays_in_one_segment():
+    data = build_stream(4)
+    segments = split_opus(data, max_segment_seconds=50)
+
+    assert len(segments) == 1
+    assert segments[0][1] == pytest.approx(4.0)
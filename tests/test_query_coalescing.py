@@ -0,0 +1,85 @@
+"""Tests de la coalescencia de consultas idénticas a /query"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import app.main as main
+from app.services.single_flight import SingleFlight
+
+
+def patch_engine(monkeypatch, result=None, error=None):
+    calls = []
+
+    async def run_agent_query(request):
+        calls.append(request.query)
+        await asyncio.sleep(0.05)
+        if error is not None:
+            raise error
+        return result
+
+    monkeypatch.setattr(main, "QUERY_CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "query_flight", SingleFlight("query"))
+    monkeypatch.setattr(main, "run_agent_query", run_agent_query)
+    return calls
+
+
+def query(text, context=None):
+    return main.query_agent(main.QueryRequest(query=text, context=context), SimpleNamespace(headers={}))
+
+
+def test_identical_concurrent_queries_share_one_engine_call(monkeypatch):
+    calls = patch_engine(monkeypatch, result=b'{"success":true}')
+
+    async def scenario():
+        return await asyncio.gather(
+            query("Hola", {"a": 1, "b": 2}),
+            query("  hola ", {"b": 2, "a": 1}),
+            query("HOLA", {"a": 1, "b": 2})
+        )
+
+    responses = asyncio.run(scenario())
+    assert [r.body for r in responses] == [b'{"success":true}'] * 3
+    assert len(calls) == 1
+    assert main.query_flight.stats()["coalesced"] == 2
+
+
+def test_different_context_is_not_coalesced(monkeypatch):
+    calls = patch_engine(monkeypatch, result=b"{}")
+
+    async def scenario():
+        await asyncio.gather(query("hola", {"a": 1}), query("hola", {"a": 2}))
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_coalesced_callers_share_the_engine_error(monkeypatch):
+    response = httpx.Response(502, text="bad gateway", request=httpx.Request("POST", "https://engine"))
+    patch_engine(monkeypatch, error=httpx.HTTPStatusError("502", request=response.request, response=response))
+
+    async def scenario():
+        return await asyncio.gather(query("hola"), query("hola"), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, HTTPException) and e.status_code == 502 for e in errors)
+    assert main.query_flight.stats()["executed"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_query(monkeypatch):
+    calls = patch_engine(monkeypatch, result=b"{}")
+
+    async def scenario():
+        first = asyncio.create_task(query("hola"))
+        second = asyncio.create_task(query("hola"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()).body == b"{}"
+    assert len(calls) == 1
@@ -0,0 +1,43 @@
+"""Tests de los payloads precompilados y de la lectura de respuestas del agente"""
+
+import orjson
+import pytest
+
+from app.services.reasoning_engine import CREATE_SESSION, STREAM_QUERY, PayloadTemplate, agent_text
+
+
+@pytest.mark.parametrize("message", [
+    "hola",
+    'comillas " y barra \\ y salto\nde línea',
+    "emoji 🎤 y acentos ñáé",
+    "",
+])
+def test_render_matches_orjson_of_equivalent_dict(message):
+    body = STREAM_QUERY.render("whatsapp_549", "session-1", message)
+    expected = orjson.dumps({
+        "class_method": "async_stream_query",
+        "input": {"user_id": "whatsapp_549", "session_id": "session-1", "message": message}
+    })
+    assert body == expected
+
+
+def test_render_single_field_and_no_fields():
+    assert CREATE_SESSION.render("u") == orjson.dumps({"class_method": "async_create_session", "input": {"user_id": "u"}})
+    assert PayloadTemplate("ping").render() == orjson.dumps({"class_method": "ping", "input": {}})
+
+
+def test_render_input_matches_orjson():
+    data = {"message": "hola", "user_id": "u", "extra": [1, 2.5, None]}
+    assert STREAM_QUERY.render_input(data) == orjson.dumps({"class_method": "async_stream_query", "input": data})
+
+
+@pytest.mark.parametrize("values", [("u", "s"), ("u", "s", "m", "extra")])
+def test_render_rejects_wrong_number_of_values(values):
+    with pytest.raises(ValueError):
+        STREAM_QUERY.render(*values)
+
+
+def test_agent_text():
+    assert agent_text({"content": {"parts": [{"text": "hola"}]}}) == "hola"
+    assert agent_text({"content": {"parts": []}}, "default") == "default"
+    assert agent_text("not a dict", "default") == "default"
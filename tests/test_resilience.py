@@ -0,0 +1,202 @@
+"""Tests del guard del Reasoning Engine: límite adaptativo y circuit breaker"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.deadline import Deadline, DeadlineExceeded, deadline_scope, within_deadline
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker, EngineGuard, EngineUnavailable, is_engine_failure
+
+
+def make_guard(hung_call_seconds: float = 20.0) -> EngineGuard:
+    return EngineGuard(
+        limiter=AdaptiveLimiter(initial_limit=20, min_limit=2, max_limit=200),
+        breaker=CircuitBreaker(failure_threshold=0.5, window_size=10, min_calls=5, reset_timeout=30.0),
+        hung_call_seconds=hung_call_seconds
+    )
+
+
+async def guarded_call(guard: EngineGuard, seconds: float, budget: float, kind: str = "query") -> None:
+    """Llamada al "engine" que tarda ``seconds`` bajo un deadline de ``budget``"""
+    with deadline_scope(Deadline(budget)):
+        async with guard.call(kind):
+            await within_deadline("agent", asyncio.sleep(seconds))
+
+
+def test_hung_calls_cut_by_deadline_open_breaker():
+    """Un engine colgado abre el circuito aunque el deadline corte antes que su timeout"""
+    guard = make_guard(hung_call_seconds=0.02)
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(DeadlineExceeded):
+                await guarded_call(guard, seconds=10, budget=0.03)
+
+    asyncio.run(scenario())
+    assert guard.breaker.stats()["state"] == CircuitBreaker.OPEN
+    assert guard.limiter.in_flight == 0
+    assert "query" in guard.limiter.stats()["latency_seconds"]
+    assert guard.limiter.limit < 20
+
+
+def test_deadline_cut_slower_than_baseline_counts_as_failure():
+    """Con latencia de referencia, una llamada cortada que ya tardaba más de lo normal es falla"""
+    guard = make_guard()
+
+    async def scenario():
+        for _ in range(3):
+            await guarded_call(guard, seconds=0.005, budget=5)
+        with pytest.raises(DeadlineExceeded):
+            await guarded_call(guard, seconds=10, budget=0.05)
+
+    asyncio.run(scenario())
+    stats = guard.breaker.stats()
+    assert stats["window_calls"] == 4
+    assert stats["window_failures"] == 1
+
+
+def test_deadline_cut_within_normal_latency_is_neutral():
+    """Si el presupuesto ya casi no alcanzaba, cortar la llamada no culpa al engine"""
+    guard = make_guard()
+
+    async def scenario():
+        for _ in range(3):
+            await guarded_call(guard, seconds=0.2, budget=5)
+        with pytest.raises(DeadlineExceeded):
+            await guarded_call(guard, seconds=10, budget=0.01)
+
+    asyncio.run(scenario())
+    stats = guard.breaker.stats()
+    assert stats["window_calls"] == 3
+    assert stats["window_failures"] == 0
+    assert guard.limiter.in_flight == 0
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.record(breaker.allow(), True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_opens_on_failure_rate_and_short_circuits():
+    breaker = CircuitBreaker(failure_threshold=0.5, window_size=4, min_calls=4, reset_timeout=30)
+    for failed in (False, True, False):
+        breaker.record(breaker.allow(), failed)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(breaker.allow(), True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is None
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_half_open_probe_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker(window_size=4, min_calls=4, reset_timeout=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+
+    probe = breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is None  # una sola prueba a la vez
+    breaker.record(probe, True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.02)
+    breaker.record(breaker.allow(), False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_late_call_admitted_before_opening_does_not_close_half_open():
+    breaker = CircuitBreaker(window_size=4, min_calls=4, reset_timeout=0.01)
+    late = breaker.allow()
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(late, False)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # La prueba sigue disponible y es la que decide
+    probe = breaker.allow()
+    assert probe is not None
+    breaker.record(probe, False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_frees_the_slot():
+    breaker = CircuitBreaker(window_size=4, min_calls=4, reset_timeout=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+
+    breaker.cancel(breaker.allow())
+    assert breaker.allow() is not None
+
+
+def test_limiter_rejects_at_limit_and_backs_off_on_failure():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=10)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.stats()["rejected"] == 1
+
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=1, max_limit=10, backoff_ratio=0.5)
+    limiter.try_acquire()
+    limiter.release(None, failed=True)
+    assert limiter.limit == 5
+
+
+def test_limiter_grows_under_load_with_stable_latency_and_shrinks_when_slow():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, max_limit=100, smoothing=0.5)
+    for _ in range(20):
+        for _ in range(limiter.limit):
+            limiter.try_acquire()
+        while limiter.in_flight:
+            limiter.release(0.1, kind="query")
+    grown = limiter.limit
+    assert grown > 10
+
+    for _ in range(10):
+        limiter.try_acquire()
+        limiter.release(1.0, kind="query")
+    assert limiter.limit < grown
+
+
+def test_paused_time_is_not_engine_latency():
+    """El tiempo del consumidor de un stream no cuenta como latencia del engine"""
+    guard = make_guard()
+
+    async def scenario():
+        async with guard.call("stream") as call:
+            await asyncio.sleep(0.01)
+            with call.paused():
+                await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    assert guard.limiter.stats()["latency_seconds"]["stream"]["recent"] < 0.1
+
+
+def test_guard_rejects_when_circuit_open():
+    guard = make_guard()
+    open_breaker(guard.breaker)
+
+    async def scenario():
+        async with guard.call():
+            pass
+
+    with pytest.raises(EngineUnavailable) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.reason == "circuit_open"
+
+
+def test_only_429_5xx_and_transport_errors_are_engine_failures():
+    request = httpx.Request("POST", "https://engine")
+
+    def status_error(status: int) -> httpx.HTTPStatusError:
+        return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+    assert is_engine_failure(status_error(503))
+    assert is_engine_failure(status_error(429))
+    assert not is_engine_failure(status_error(400))
+    assert is_engine_failure(httpx.ConnectTimeout("timeout"))
+    assert not is_engine_failure(ValueError())
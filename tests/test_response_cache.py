@@ -0,0 +1,67 @@
+"""Tests de la caché de respuestas de /query"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import app.main as main
+from app.services.response_cache import CacheControl, ResponseCache, canonical_query_key
+
+
+def test_canonical_key_ignores_trivial_variations():
+    key = canonical_query_key("Hola   Mundo", {"a": 1, "b": 2})
+    assert canonical_query_key("  hola mundo ", {"b": 2, "a": 1}) == key
+    assert canonical_query_key("hola mundo", {"a": 2, "b": 2}) != key
+    assert canonical_query_key("hola") == canonical_query_key("hola", {})
+
+
+def test_cache_control_parsing():
+    assert CacheControl.parse(None) == CacheControl()
+    assert CacheControl.parse("No-Cache, max-age=30") == CacheControl(no_cache=True, max_age=30.0)
+    assert CacheControl.parse("no-store").no_store is True
+    assert CacheControl.parse("max-age=abc").max_age is None
+
+
+def test_entries_expire_and_respect_max_age():
+    cache = ResponseCache()
+    cache.put("short", b"1", ttl=-1)
+    cache.put("fresh", b"2")
+    assert cache.get("short") is None
+    assert cache.get("fresh") == b"2"
+    time.sleep(0.02)
+    assert cache.get("fresh", max_age=0.01) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evicted"] == 1
+
+
+def test_query_endpoint_caches_responses(monkeypatch):
+    calls = []
+
+    async def run_agent_query(request):
+        calls.append(request.query)
+        return b'{"success":true}'
+
+    monkeypatch.setattr(main, "QUERY_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "query_cache", ResponseCache())
+    monkeypatch.setattr(main, "run_agent_query", run_agent_query)
+
+    def query(text, cache_control=None):
+        headers = {"cache-control": cache_control} if cache_control else {}
+        response = asyncio.run(main.query_agent(main.QueryRequest(query=text), SimpleNamespace(headers=headers)))
+        return response.headers["X-Cache"], response.body
+
+    assert query("Hola") == ("MISS", b'{"success":true}')
+    assert query(" hola ") == ("HIT", b'{"success":true}')
+    assert query("hola", "no-cache")[0] == "MISS"
+    assert query("hola", "no-store")[0] == "BYPASS"
+    assert calls == ["Hola", "hola", "hola"]
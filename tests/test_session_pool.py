@@ -0,0 +1,87 @@
+"""Tests del pool de sesiones pre-creadas"""
+
+import asyncio
+
+from app.services.session_pool import SessionPool
+
+
+class Creator:
+    """create_session que numera las sesiones y puede fallar las primeras veces"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.created = 0
+
+    async def __call__(self, user_id: str) -> str:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("engine caído")
+        self.created += 1
+        return f"{user_id}-{self.created}"
+
+
+def test_disabled_pool_does_nothing():
+    pool = SessionPool(Creator(), ["u"], target_size=0)
+
+    async def scenario():
+        await pool.start()
+        return pool.take("u")
+
+    assert asyncio.run(scenario()) is None
+    assert pool.enabled is False
+
+
+def test_pool_fills_to_target_and_serves_fifo():
+    creator = Creator()
+    pool = SessionPool(creator, ["u"], target_size=2, refill_rate=1000)
+
+    async def scenario():
+        await pool.start()
+        await asyncio.sleep(0.05)
+        ready = pool.stats()["pools"]["u"]["ready"]
+        taken = [pool.take("u"), pool.take("u")]
+        await asyncio.sleep(0.05)
+        refilled = pool.stats()["pools"]["u"]["ready"]
+        await pool.stop()
+        return ready, taken, refilled
+
+    ready, taken, refilled = asyncio.run(scenario())
+    assert ready == 2
+    assert taken == ["u-1", "u-2"]
+    assert refilled == 2
+    assert pool.stats()["pools"]["u"]["hits"] == 2
+
+
+def test_empty_pool_is_a_miss_and_unknown_user_is_none():
+    pool = SessionPool(Creator(), ["u"], target_size=1, refill_rate=1000)
+    assert pool.take("u") is None
+    assert pool.take("other") is None
+    assert pool.stats()["pools"]["u"]["misses"] == 1
+
+
+def test_expired_sessions_are_not_served():
+    pool = SessionPool(Creator(), ["u"], target_size=1, refill_rate=1000, max_age=0.02)
+
+    async def scenario():
+        await pool.start()
+        await asyncio.sleep(0.01)
+        await pool.stop()
+        await asyncio.sleep(0.03)
+        return pool.take("u")
+
+    assert asyncio.run(scenario()) is None
+    assert pool.stats()["pools"]["u"]["expired"] == 1
+
+
+def test_creation_errors_back_off_and_recover():
+    creator = Creator(failures=1)
+    pool = SessionPool(creator, ["u"], target_size=1, refill_rate=1000, error_backoff=0.01)
+
+    async def scenario():
+        await pool.start()
+        await asyncio.sleep(0.1)
+        await pool.stop()
+        return pool.take("u")
+
+    assert asyncio.run(scenario()) == "u-1"
+    assert pool.stats()["pools"]["u"]["failures"] == 1
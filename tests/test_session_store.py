@@ -0,0 +1,88 @@
+"""Tests de los stores de sesiones (memoria y Redis con fakeredis)"""
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.session_store import InMemorySessionStore, RedisSessionStore, create_session_store
+
+
+def redis_store(ttl: float = 100) -> RedisSessionStore:
+    return RedisSessionStore(
+        ttl=ttl,
+        prefix="test:session:",
+        client=fakeredis.aioredis.FakeRedis(decode_responses=True)
+    )
+
+
+def test_redis_get_set_delete():
+    store = redis_store()
+
+    async def scenario():
+        assert await store.get("5491100000000") is None
+        await store.set("5491100000000", "session-1")
+        found = await store.get("5491100000000")
+        deleted = await store.delete("5491100000000")
+        return found, deleted, await store.get("5491100000000"), await store.delete("5491100000000")
+
+    assert asyncio.run(scenario()) == ("session-1", True, None, False)
+
+
+def test_redis_get_refreshes_ttl():
+    store = redis_store(ttl=100)
+
+    async def scenario():
+        await store.set("user", "session-1")
+        await store._client.expire("test:session:user", 5)
+        await store.get("user")
+        return await store._client.ttl("test:session:user")
+
+    assert asyncio.run(scenario()) > 5
+
+
+def test_redis_items_lists_only_prefixed_keys():
+    store = redis_store()
+
+    async def scenario():
+        await store.set("a", "session-a")
+        await store.set("df_b", "session-b")
+        await store._client.set("other:key", "ignored")
+        return sorted(await store.items())
+
+    assert asyncio.run(scenario()) == [("a", "session-a"), ("df_b", "session-b")]
+
+
+def test_redis_items_empty():
+    assert asyncio.run(redis_store().items()) == []
+
+
+def test_memory_store_lru_eviction_and_ttl():
+    store = InMemorySessionStore(ttl=100, max_entries=2)
+
+    async def scenario():
+        await store.set("a", "1")
+        await store.set("b", "2")
+        await store.get("a")
+        await store.set("c", "3")
+        return await store.get("a"), await store.get("b"), await store.get("c")
+
+    assert asyncio.run(scenario()) == ("1", None, "3")
+    assert store.stats()["evicted"] == 1
+
+
+def test_memory_store_expired_entries_are_forgotten():
+    store = InMemorySessionStore(ttl=-1)
+
+    async def scenario():
+        await store.set("a", "1")
+        return await store.get("a"), await store.items()
+
+    assert asyncio.run(scenario()) == (None, [])
+    assert store.stats()["expired"] == 1
+
+
+def test_create_session_store_rejects_unknown_backend(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE_BACKEND", "dynamo")
+    with pytest.raises(ValueError):
+        create_session_store()
@@ -0,0 +1,87 @@
+"""Tests de SingleFlight y de la creación única de sesiones de WhatsApp"""
+
+import asyncio
+
+import pytest
+
+import app.main as main
+from app.services.session_store import InMemorySessionStore
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["result"] * 10
+    assert calls == 1
+    assert flight.stats() == {"name": "single-flight", "in_flight": 0, "executed": 1, "coalesced": 9}
+
+
+def test_errors_are_shared_and_key_is_released():
+    flight = SingleFlight()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        # Terminada la operación, la clave se puede ejecutar de nuevo
+        with pytest.raises(ValueError):
+            await flight.do("key", failing)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == 2
+
+
+def test_cancelling_one_caller_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_concurrent_whatsapp_messages_create_one_session(monkeypatch):
+    store = InMemorySessionStore()
+    created = []
+
+    async def create_agent_session(user_id):
+        created.append(user_id)
+        await asyncio.sleep(0.05)
+        return f"session-{len(created)}"
+
+    monkeypatch.setattr(main, "session_store", store)
+    monkeypatch.setattr(main, "create_agent_session", create_agent_session)
+    monkeypatch.setattr(main, "session_creation_flight", SingleFlight("session-creation"))
+
+    async def scenario():
+        return await asyncio.gather(*(main.get_or_create_whatsapp_session("549") for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["session-1"] * 5
+    assert created == ["whatsapp_549"]
+    assert asyncio.run(store.get("549")) == "session-1"
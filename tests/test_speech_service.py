@@ -0,0 +1,162 @@
+"""Tests de SpeechService con un cliente de Speech-to-Text simulado"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.services.speech_service import SpeechService
+
+
+def recognize_response(transcript: str = "hola", confidence: float = 0.9) -> SimpleNamespace:
+    alternative = SimpleNamespace(transcript=transcript, confidence=confidence)
+    return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])])
+
+
+class FakeAsyncClient:
+    """SpeechAsyncClient mínimo que registra la concurrencia de recognize"""
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.active = 0
+        self.max_active = 0
+
+    async def recognize(self, config, audio):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return recognize_response()
+        finally:
+            self.active -= 1
+
+
+def test_async_transcriptions_do_not_block_loop_and_respect_max_concurrency():
+    service = SpeechService(max_concurrency=2)
+    client = service._async_client = FakeAsyncClient(delay=0.05)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        tick = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(
+            service.atranscribe_audio(f"audio-{i}".encode(), encoding="LINEAR16") for i in range(6)
+        ))
+        tick.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    assert all(r["success"] and r["transcript"] == "hola" for r in results)
+    assert client.max_active == 2
+    # 3 tandas de 50ms: el event loop siguió atendiendo al ticker
+    assert ticks >= 15
+
+
+def test_empty_audio_is_an_error_result():
+    service = SpeechService()
+    result = asyncio.run(service.atranscribe_audio(b""))
+    assert result == {"success": False, "transcript": "", "confidence": 0.0, "error": "Audio vacío"}
+
+
+def test_api_errors_become_error_results():
+    service = SpeechService()
+    service._async_client = FakeAsyncClient(delay=0, error=RuntimeError("unavailable"))
+    result = asyncio.run(service.atranscribe_audio(b"audio", encoding="LINEAR16"))
+    assert result["success"] is False
+    assert "unavailable" in result["error"]
+
+
+def test_silence_is_an_error_result():
+    service = SpeechService()
+
+    class SilentClient:
+        async def recognize(self, config, audio):
+            return SimpleNamespace(results=[])
+
+    service._async_client = SilentClient()
+    result = asyncio.run(service.atranscribe_audio(b"audio", encoding="LINEAR16"))
+    assert result["success"] is False
+
+
+class RecordingStreamingClient:
+    """streaming_recognize que guarda los requests recibidos"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def streaming_recognize(self, requests):
+        async for request in requests:
+            self.requests.append(request)
+        alternative = SimpleNamespace(transcript=" hola ", confidence=0.8)
+        result = SimpleNamespace(is_final=True, alternatives=[alternative])
+
+        async def responses():
+            yield SimpleNamespace(results=[result])
+
+        return responses()
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_streaming_sends_config_first_and_splits_large_chunks():
+    service = SpeechService()
+    client = service._async_client = RecordingStreamingClient()
+
+    result = asyncio.run(service.atranscribe_stream(chunks(b"a" * 40_000, b"b" * 10)))
+
+    assert result["success"] is True
+    assert result["transcript"] == "hola"
+    assert result["audio_bytes"] == 40_010
+    first, *audio = client.requests
+    assert first.streaming_config.config.language_code == "es-US"
+    assert [len(r.audio_content) for r in audio] == [16 * 1024, 16 * 1024, 40_000 - 32 * 1024, 10]
+
+
+def test_streaming_empty_audio_is_an_error_result():
+    service = SpeechService()
+    service._async_client = RecordingStreamingClient()
+    result = asyncio.run(service.atranscribe_stream(chunks()))
+    assert result["success"] is False
+    assert result["error"] == "Audio vacío"
+
+
+def test_whatsapp_falls_back_to_full_download_when_streaming_fails(monkeypatch):
+    import app.main as main
+
+    service = SpeechService()
+    calls = []
+
+    async def failing_stream(*args, **kwargs):
+        calls.append("stream")
+        raise RuntimeError("stream reset")
+
+    async def transcribe(audio_content, **kwargs):
+        calls.append(("audio", audio_content, kwargs["source_id"]))
+        return {"success": True, "transcript": "hola", "confidence": 0.9}
+
+    async def media_url(media_id):
+        return "https://media/1"
+
+    async def download(audio_id):
+        return b"ogg"
+
+    monkeypatch.setattr(main, "speech_service", service)
+    monkeypatch.setattr(service, "atranscribe_stream", failing_stream)
+    monkeypatch.setattr(service, "atranscribe_audio", transcribe)
+    monkeypatch.setattr(main, "WHATSAPP_STREAMING_STT", True)
+    monkeypatch.setattr(main, "get_whatsapp_media_url", media_url)
+    monkeypatch.setattr(main, "download_whatsapp_audio", download)
+
+    result = asyncio.run(main.transcribe_whatsapp_audio("media-1", "sha-1"))
+    assert result["transcript"] == "hola"
+    assert calls == ["stream", ("audio", b"ogg", "sha-1")]
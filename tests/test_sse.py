@@ -0,0 +1,70 @@
+"""Tests de la decodificación y emisión de Server-Sent Events"""
+
+import asyncio
+from typing import Any, AsyncIterator, Iterable, List
+
+import orjson
+
+from app.services.sse import extract_text, format_sse, iter_sse_events, iter_text_deltas
+
+
+async def aiter(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+def collect(iterator: AsyncIterator[Any]) -> List[Any]:
+    async def run():
+        return [item async for item in iterator]
+    return asyncio.run(run())
+
+
+def test_sse_events_with_comments_fields_and_multiline_data():
+    lines = [
+        ": keep-alive",
+        "event: message",
+        "id: 1",
+        'data: {"a":',
+        "data: 1}",
+        "",
+        'data: {"b": 2}\r',
+        "",
+    ]
+    assert collect(iter_sse_events(aiter(lines))) == [{"a": 1}, {"b": 2}]
+
+
+def test_newline_delimited_json_and_trailing_event():
+    lines = ['{"a": 1}', '[1, 2]', 'data: {"last": true}']
+    assert collect(iter_sse_events(aiter(lines))) == [{"a": 1}, {"data": [1, 2]}, {"last": True}]
+
+
+def test_invalid_json_is_skipped():
+    lines = ["data: {not json", "", 'data: {"ok": 1}', ""]
+    assert collect(iter_sse_events(aiter(lines))) == [{"ok": 1}]
+
+
+def test_text_deltas_skip_aggregated_final_event():
+    def event(text, partial=False):
+        return {"content": {"parts": [{"text": text}]}, "partial": partial}
+
+    events = [
+        event("Hola ", partial=True),
+        event("mundo", partial=True),
+        event("Hola mundo"),
+        {"content": {"parts": [{"function_call": {}}]}},
+        event("Otro turno"),
+    ]
+    assert collect(iter_text_deltas(aiter(events))) == ["Hola ", "mundo", "Otro turno"]
+
+
+def test_extract_text_joins_parts_and_ignores_non_text():
+    assert extract_text({"content": {"parts": [{"text": "a"}, {"function_call": {}}, {"text": "b"}]}}) == "ab"
+    assert extract_text({}) == ""
+
+
+def test_format_sse_round_trips():
+    text = format_sse({"delta": "hola\nmundo"}, event="delta")
+    assert text.startswith("event: delta\n")
+    assert text.endswith("\n\n")
+    assert collect(iter_sse_events(aiter(text.split("\n")))) == [{"delta": "hola\nmundo"}]
+    assert orjson.loads(format_sse({"a": 1})[len("data: "):]) == {"a": 1}
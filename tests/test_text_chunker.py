@@ -0,0 +1,55 @@
+"""Tests del corte incremental de texto para respuestas progresivas"""
+
+import pytest
+
+from app.services.text_chunker import SentenceChunker
+
+
+def feed_all(chunker: SentenceChunker, pieces):
+    chunks = []
+    for piece in pieces:
+        chunks.extend(chunker.feed(piece))
+    return chunks + chunker.flush()
+
+
+def test_cuts_at_sentence_end_after_min_length():
+    chunker = SentenceChunker(min_length=10)
+    chunks = feed_all(chunker, ["Primera oración larga. Seg", "unda oración larga! Final"])
+    assert chunks == ["Primera oración larga.", "Segunda oración larga!", "Final"]
+
+
+def test_waits_for_space_after_period():
+    """Un punto sin espacio detrás (3.5, o una oración a medio llegar) no corta"""
+    chunker = SentenceChunker(min_length=1)
+    assert chunker.feed("El valor es 3.5") == []
+    assert chunker.feed(" unidades. ") == ["El valor es 3.5 unidades."]
+
+
+def test_short_sentences_are_grouped_until_min_length():
+    chunker = SentenceChunker(min_length=20)
+    assert chunker.feed("Hola. Sí. ") == []
+    assert chunker.feed("Claro que sí, te ayudo. ") == ["Hola. Sí. Claro que sí, te ayudo."]
+
+
+def test_paragraph_break_is_a_boundary():
+    chunker = SentenceChunker(min_length=5)
+    assert chunker.feed("Un párrafo sin punto\n\nOtro") == ["Un párrafo sin punto"]
+    assert chunker.flush() == ["Otro"]
+
+
+def test_no_chunk_exceeds_max_length():
+    chunker = SentenceChunker(max_length=20, min_length=5)
+    text = "palabra " * 30
+    chunks = feed_all(chunker, [text[i:i + 7] for i in range(0, len(text), 7)])
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_hard_cut_without_spaces():
+    chunker = SentenceChunker(max_length=10, min_length=5)
+    assert feed_all(chunker, ["x" * 25]) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_invalid_max_length():
+    with pytest.raises(ValueError):
+        SentenceChunker(max_length=0)
@@ -0,0 +1,157 @@
+"""Tests de la caché de transcripciones y su consulta antes del streaming"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app.services.speech_service import SpeechService
+from app.services.transcription_cache import TranscriptionCache
+
+OK = {"success": True, "transcript": "hola", "confidence": 0.9, "language": "es-US"}
+
+
+class FakeStreamingClient:
+    """SpeechAsyncClient mínimo: consume los requests y devuelve una transcripción"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def streaming_recognize(self, requests):
+        self.calls += 1
+        async for _ in requests:
+            pass
+        alternative = SimpleNamespace(transcript="hola mundo", confidence=0.8)
+        result = SimpleNamespace(is_final=True, alternatives=[alternative])
+
+        async def responses():
+            yield SimpleNamespace(results=[result])
+
+        return responses()
+
+
+def test_put_get_and_failed_results_are_not_cached():
+    cache = TranscriptionCache()
+    cache.put("a", OK)
+    cache.put("b", {**OK, "success": False})
+
+    assert cache.get("a") == OK
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = TranscriptionCache(ttl=-1)
+    cache.put("a", OK)
+    assert cache.get("a") is None
+
+
+def test_lru_eviction_by_bytes():
+    probe = TranscriptionCache()
+    probe.put("a", OK)
+    cache = TranscriptionCache(max_bytes=probe.stats()["approx_bytes"] * 3)
+    for key in ("a", "b", "c"):
+        cache.put(key, OK)
+    cache.get("a")
+    cache.put("d", OK)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evicted"] == 1
+
+
+def test_persisted_entries_survive_new_instance(tmp_path):
+    TranscriptionCache(persist_dir=str(tmp_path)).put("a", OK)
+    cache = TranscriptionCache(persist_dir=str(tmp_path))
+
+    assert cache.get("a") == OK
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_keys_depend_on_recognition_params():
+    assert TranscriptionCache.key(b"x", "es-US", 6, 16000) != TranscriptionCache.key(b"x", "en-US", 6, 16000)
+    assert TranscriptionCache.source_key("sha", "es-US", 6, 16000) != TranscriptionCache.key(b"sha", "es-US", 6, 16000)
+
+
+def test_whatsapp_note_is_looked_up_once_per_transcription(monkeypatch):
+    """Un audio ya transcrito no se descarga; cada nota cuenta un solo hit o miss"""
+    import app.main as main
+
+    cache = TranscriptionCache()
+    service = SpeechService(cache=cache)
+    client = FakeStreamingClient()
+    service._async_client = client
+    consumed = []
+
+    async def media_url(media_id):
+        return "https://media/1"
+
+    async def chunks(audio_url):
+        consumed.append(audio_url)
+        yield b"ogg-bytes"
+
+    monkeypatch.setattr(main, "speech_service", service)
+    monkeypatch.setattr(main, "WHATSAPP_STREAMING_STT", True)
+    monkeypatch.setattr(main, "get_whatsapp_media_url", media_url)
+    monkeypatch.setattr(main, "stream_whatsapp_audio", chunks)
+
+    first = asyncio.run(main.transcribe_whatsapp_audio("media-1", "media-sha"))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+    second = asyncio.run(main.transcribe_whatsapp_audio("media-2", "media-sha"))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["transcript"] == "hola mundo"
+    assert client.calls == 1
+    assert len(consumed) == 1
+
+
+def test_download_fallback_does_not_count_a_second_miss(monkeypatch):
+    import app.main as main
+
+    cache = TranscriptionCache()
+    service = SpeechService(cache=cache)
+
+    class Client:
+        async def recognize(self, config, audio):
+            alternative = SimpleNamespace(transcript="hola", confidence=0.9)
+            return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])])
+
+    async def download(audio_id):
+        return b"audio"
+
+    service._async_client = Client()
+    monkeypatch.setattr(main, "speech_service", service)
+    monkeypatch.setattr(main, "WHATSAPP_STREAMING_STT", False)
+    monkeypatch.setattr(main, "download_whatsapp_audio", download)
+
+    assert asyncio.run(main.transcribe_whatsapp_audio("media-1", "media-sha"))["success"] is True
+    assert cache.stats()["misses"] == 1
+
+
+def test_async_access_does_disk_io_off_the_event_loop(tmp_path, monkeypatch):
+    cache = TranscriptionCache(persist_dir=str(tmp_path))
+    threads = []
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+
+    def record(fn):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(cache, "_read_disk", record(read_disk))
+    monkeypatch.setattr(cache, "_write_disk", record(write_disk))
+
+    async def scenario():
+        await cache.aput("a", OK)
+        fresh = TranscriptionCache(persist_dir=str(tmp_path))
+        monkeypatch.setattr(fresh, "_read_disk", record(fresh._read_disk))
+        return await fresh.aget("a"), await fresh.aget("missing"), fresh.stats()
+
+    loaded, missing, stats = asyncio.run(scenario())
+    assert loaded == OK and missing is None
+    assert (stats["disk_hits"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
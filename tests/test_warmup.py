@@ -0,0 +1,100 @@
+"""Tests del calentamiento de upstreams al arrancar"""
+
+import asyncio
+
+from app.services.warmup import WarmUp, warmup_config
+
+
+def run_warmup(warmup: WarmUp) -> list:
+    readies = []
+
+    async def scenario():
+        warmup.start(on_ready=lambda: readies.append(warmup.ready))
+        await warmup._task
+
+    asyncio.run(scenario())
+    return readies
+
+
+def test_steps_run_in_order_declared_by_after():
+    order = []
+    warmup = WarmUp()
+
+    def step(name, delay):
+        async def fn():
+            await asyncio.sleep(delay)
+            order.append(name)
+            return name
+        return fn
+
+    warmup.add("vertex", step("vertex", 0), after="credentials")
+    warmup.add("credentials", step("credentials", 0.03), required=True)
+    warmup.add("graph", step("graph", 0))
+
+    assert run_warmup(warmup) == [True]
+    assert order == ["graph", "credentials", "vertex"]
+    assert warmup.stats()["steps"]["vertex"] == {"status": "ok", "seconds": warmup.steps["vertex"].seconds, "detail": "vertex"}
+
+
+def test_disabled_steps_are_skipped_but_required_ones_run():
+    ran = []
+    warmup = WarmUp(enabled_steps=["graph"])
+
+    async def credentials():
+        ran.append("credentials")
+
+    warmup.add("credentials", credentials, required=True)
+    warmup.add("speech", credentials)
+
+    run_warmup(warmup)
+    assert ran == ["credentials"]
+    assert warmup.steps["speech"].status == "skipped"
+
+
+def test_failures_and_timeouts_do_not_block_readiness():
+    warmup = WarmUp(timeout=0.01)
+
+    async def failing():
+        raise RuntimeError("graph caído")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def after_failure():
+        return "ok"
+
+    warmup.add("graph", failing)
+    warmup.add("speech", slow)
+    warmup.add("vertex", after_failure, after="graph")
+
+    run_warmup(warmup)
+    steps = warmup.stats()["steps"]
+    assert warmup.ready is True
+    assert steps["graph"]["status"] == "failed" and steps["graph"]["detail"] == "graph caído"
+    assert steps["speech"]["status"] == "timeout"
+    assert steps["vertex"]["status"] == "ok"
+
+
+def test_stop_cancels_pending_warmup():
+    warmup = WarmUp()
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    warmup.add("vertex", slow)
+
+    async def scenario():
+        warmup.start()
+        await asyncio.sleep(0.01)
+        await warmup.stop()
+
+    asyncio.run(scenario())
+    assert warmup.ready is False
+
+
+def test_config_from_environment(monkeypatch):
+    monkeypatch.setenv("WARMUP_UPSTREAMS", "vertex, graph,")
+    monkeypatch.setenv("WARMUP_TIMEOUT", "3")
+    assert warmup_config() == {"enabled_steps": ["vertex", "graph"], "timeout": 3.0}
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    assert warmup_config()["enabled_steps"] == []
@@ -0,0 +1,99 @@
+"""Tests del envío de mensajes de WhatsApp: rate limiting y reintentos"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.http_client import HTTPClientPool
+from app.services.whatsapp_sender import TokenBucket, WhatsAppSender
+
+
+def make_sender(handler, **kwargs) -> WhatsAppSender:
+    pool = HTTPClientPool(http2=False)
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    kwargs.setdefault("base_backoff", 0.001)
+    return WhatsAppSender("token", "phone-1", http_pool=pool, api_base_url="https://graph", **kwargs)
+
+
+def responses(*statuses, headers=None):
+    """Handler que responde los status indicados en orden y registra los requests"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        status = statuses[min(len(requests), len(statuses)) - 1]
+        return httpx.Response(status, json={"messages": [{"id": "wamid.out"}]}, headers=headers)
+
+    return handler, requests
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=50, burst=2)
+
+    async def scenario():
+        started = time.monotonic()
+        waits = [await bucket.acquire() for _ in range(4)]
+        return waits, time.monotonic() - started
+
+    waits, elapsed = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    assert elapsed >= 0.035
+
+
+def test_send_text_posts_payload_to_sender_number():
+    handler, requests = responses(200)
+    sender = make_sender(handler)
+
+    result = asyncio.run(sender.send_text("549", "hola"))
+
+    assert result["messages"][0]["id"] == "wamid.out"
+    assert str(requests[0].url) == "https://graph/phone-1/messages"
+    assert requests[0].headers["Authorization"] == "Bearer token"
+    assert sender.stats()["sent"] == 1
+
+
+def test_transient_errors_are_retried():
+    handler, requests = responses(503, 429, 200)
+    sender = make_sender(handler)
+
+    asyncio.run(sender.send_text("549", "hola"))
+
+    assert len(requests) == 3
+    assert sender.stats()["retries"] == 2
+    assert sender.stats()["failed"] == 0
+
+
+def test_retry_after_header_sets_the_delay():
+    handler, requests = responses(429, 200, headers={"Retry-After": "0.05"})
+    sender = make_sender(handler, base_backoff=10)
+
+    started = time.monotonic()
+    asyncio.run(sender.send_text("549", "hola"))
+
+    assert len(requests) == 2
+    assert 0.05 <= time.monotonic() - started < 1
+
+
+def test_client_errors_are_not_retried():
+    handler, requests = responses(400)
+    sender = make_sender(handler)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(sender.send_text("549", "hola"))
+
+    assert len(requests) == 1
+    assert sender.stats()["failures_by_status"] == {"400": 1}
+
+
+def test_gives_up_after_max_retries():
+    handler, requests = responses(500)
+    sender = make_sender(handler, max_retries=2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(sender.send_text("549", "hola"))
+
+    assert len(requests) == 3
+    assert sender.stats()["failed"] == 1
@@ -0,0 +1,174 @@
+"""Tests de LaneWorkQueue: orden por carril, paralelismo y políticas de overflow"""
+
+import asyncio
+
+import pytest
+
+from app.services.work_queue import OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, LaneWorkQueue
+
+
+def test_items_of_same_key_run_in_order_one_at_a_time():
+    processed = []
+    running = {}
+
+    async def handler(item):
+        key, n = item
+        running[key] = running.get(key, 0) + 1
+        assert running[key] == 1
+        await asyncio.sleep(0.001 * (5 - n))
+        processed.append(item)
+        running[key] -= 1
+
+    async def scenario():
+        queue = LaneWorkQueue(handler, workers=4)
+        await queue.start()
+        for n in range(5):
+            for key in ("a", "b"):
+                await queue.submit(key, (key, n))
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert [n for key, n in processed if key == "a"] == list(range(5))
+    assert [n for key, n in processed if key == "b"] == list(range(5))
+    assert queue.stats()["processed"] == 10
+
+
+def test_different_keys_run_in_parallel():
+    async def handler(_):
+        await asyncio.sleep(0.1)
+
+    async def scenario():
+        queue = LaneWorkQueue(handler, workers=4)
+        await queue.start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for key in range(4):
+            await queue.submit(key, key)
+        await queue.stop()
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) < 0.3
+
+
+def test_reject_when_full():
+    release = None
+
+    async def handler(_):
+        await release.wait()
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        queue = LaneWorkQueue(handler, workers=1, max_size=1)
+        await queue.start()
+        assert await queue.submit("a", 1)
+        await asyncio.sleep(0.01)  # el worker toma el primero
+        assert await queue.submit("a", 2)
+        accepted = await queue.submit("a", 3)
+        release.set()
+        await queue.stop()
+        return accepted, queue.stats()
+
+    accepted, stats = asyncio.run(scenario())
+    assert accepted is False
+    assert stats["rejected"] == 1
+
+
+def test_drop_oldest_reports_dropped_item():
+    dropped = []
+    processed = []
+    release = None
+
+    async def handler(item):
+        await release.wait()
+        processed.append(item)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        queue = LaneWorkQueue(
+            handler, workers=1, max_size=2,
+            overflow_policy=OVERFLOW_DROP_OLDEST,
+            on_drop=lambda key, item: dropped.append((key, item))
+        )
+        await queue.start()
+        await queue.submit("a", "in-flight")
+        await asyncio.sleep(0.01)
+        await queue.submit("a", "oldest")
+        await queue.submit("b", "second")
+        assert await queue.submit("c", "newest")
+        release.set()
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert dropped == [("a", "oldest")]
+    assert "oldest" not in processed
+    assert stats["dropped"] == 1
+
+
+def test_failing_on_drop_does_not_break_submit():
+    async def handler(_):
+        await asyncio.sleep(1)
+
+    def on_drop(key, item):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = LaneWorkQueue(handler, workers=1, max_size=1, overflow_policy=OVERFLOW_DROP_OLDEST, on_drop=on_drop)
+        await queue.start()
+        await queue.submit("a", 1)
+        await asyncio.sleep(0.01)
+        await queue.submit("a", 2)
+        accepted = await queue.submit("a", 3)
+        await queue.stop(drain_timeout=0)
+        return accepted
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_block_waits_for_room():
+    async def handler(_):
+        await asyncio.sleep(0.05)
+
+    async def scenario():
+        queue = LaneWorkQueue(handler, workers=1, max_size=1, overflow_policy=OVERFLOW_BLOCK, block_timeout=1)
+        await queue.start()
+        results = [await queue.submit("a", n) for n in range(3)]
+        await queue.stop()
+        return results
+
+    assert asyncio.run(scenario()) == [True, True, True]
+
+
+def test_handler_errors_are_counted_and_lane_continues():
+    processed = []
+
+    async def handler(item):
+        if item == "bad":
+            raise ValueError(item)
+        processed.append(item)
+
+    async def scenario():
+        queue = LaneWorkQueue(handler, workers=1)
+        await queue.start()
+        for item in ("bad", "good"):
+            await queue.submit("a", item)
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert processed == ["good"]
+    assert stats["failed"] == 1
+
+
+def test_submit_before_start_raises():
+    queue = LaneWorkQueue(lambda _: asyncio.sleep(0))
+    with pytest.raises(RuntimeError):
+        asyncio.run(queue.submit("a", 1))
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        LaneWorkQueue(lambda _: asyncio.sleep(0), overflow_policy="spill")